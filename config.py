@@ -4,6 +4,9 @@
 import os
 import sys
 
+# Версія програми: входить у відбиток кешу результатів пошуку (utils.cache_manager)
+APP_VERSION = '2.1'
+
 
 def get_base_path():
     """Отримати базовий шлях (для EXE і Python)"""
@@ -34,6 +37,12 @@ MAGISTRAL_CSV_PATH = os.path.join(CACHE_DIR, 'magistral.csv')
 
 # Кеш magistral зберігається локально (біля EXE)
 MAGISTRAL_CACHE_PATH = os.path.join(CACHE_DIR, 'normalized_magistral.pkl')
+# Бінарне сховище для mmap, по файлу на область: при старті читається лише
+# каталог, шард області - при першому зверненні (pickle - запасний варіант)
+MAGISTRAL_STORE_DIR = os.path.join(CACHE_DIR, 'magistral_store')
+MAGISTRAL_STORE_ENABLED = True
+# Після відкриття Excel файлу наперед відкривати шарди областей з його колонки області
+MAGISTRAL_REGION_WARMUP = True
 STREET_ALIASES_PATH = os.path.join(DATA_DIR, 'street_aliases.csv')
 
 # Індекси UkrPoshta (для каскадної форми)
@@ -73,11 +82,19 @@ HIGH_CONFIDENCE_THRESHOLD = 0.80  # Висока впевненість
 # Кількість результатів
 MAX_SEARCH_RESULTS = 20
 MAX_CANDIDATES = 5000  # Попереднє фільтрування
+SCORE_TOP_K = 200  # Скільки найкращих оцінених кандидатів тримати (не менше MAX_SEARCH_RESULTS)
+FUZZY_CITY_CANDIDATES = 5  # Скільки схожих міст перевіряти, якщо назву міста введено з помилкою
+FUZZY_STREET_MAX_DISTANCE = 2  # Максимальна кількість опечаток у назві вулиці
+FUZZY_STREET_CITY_CACHE_SIZE = 64  # Скільки міст тримати з побудованим нечітким індексом вулиць
+SIMILARITY_CACHE_SIZE = 100000  # Скільки пар рядків пам'ятає кеш token_similarity (0 - вимкнено)
+SIMILARITY_BACKEND = "auto"  # auto | python | rapidfuzz (auto - rapidfuzz, якщо встановлено)
 
 # Кешування
 ENABLE_SEARCH_CACHE = True
-SEARCH_CACHE_PATH = os.path.join(CACHE_DIR, 'search_cache.json')
+SEARCH_CACHE_PATH = os.path.join(CACHE_DIR, 'search_cache.sqlite')
 CACHE_EXPIRY_DAYS = 30
+SEARCH_CACHE_BATCH_SIZE = 200  # Скільки нових результатів накопичувати перед записом на диск
+SEARCH_CACHE_SWEEP_INTERVAL = 3600  # Як часто (с) видаляти застарілі записи
 
 # UI
 WINDOW_TITLE = "PrintTo Address Matcher v2.1"
@@ -92,6 +109,7 @@ COLOR_LOW_CONFIDENCE = "#FFCDD2"  # Червоний
 # Автозбереження
 AUTOSAVE_ENABLED = True
 AUTOSAVE_INTERVAL = 100  # секунд (5 хвилин)
+AUTOSAVE_DIR = os.path.join(CACHE_DIR, 'autosave')  # Незбережені зміни для відновлення після збою
 
 # Логування
 LOG_FILE = os.path.join(LOGS_DIR, 'app.log')
@@ -104,7 +122,16 @@ STREET_PREFIXES = ['вул.', 'вулиця', 'пров.', 'провулок', '
 CITY_PREFIXES = ['м.', 'місто', 'с.', 'село', 'смт.', 'с-ще', 'селище']
 
 # Багатопоточність
-MAX_WORKERS = 8  # Кількість потоків для batch обробки
+# Кількість процесів для паралельної автообробки (1 - без пулу).
+# Процеси стартують через spawn; у зібраному EXE їх запускає freeze_support() у main.py
+MAX_WORKERS = 8
+PARALLEL_MIN_ROWS = 200  # Менше рядків - послідовний пошук (старт пулу дорожчий)
+PARALLEL_CHUNK_SIZE = 100  # Рядків в одному завданні процесу
+REBUILD_WORKERS = min(MAX_WORKERS, os.cpu_count() or 1)  # Процесів для нормалізації при перебудові кешу magistral (1 - послідовно)
+REBUILD_PARALLEL_MIN_VALUES = 20000  # Менше унікальних значень - нормалізація без пулу
+REBUILD_CHUNK_SIZE = 2000  # Унікальних значень в одному завданні процесу
+DEDUP_MAX_ENTRIES = 10000  # Скільки різних адрес пам'ятає послідовна обробка для повторів
+PROCESSING_UI_UPDATE_MS = 100  # Як часто фонова обробка оновлює таблицю та прогрес
 
 # Undo/Redo
 MAX_UNDO_STACK = 20  # Максимум кроків
@@ -136,3 +163,4 @@ SCORE_BUILDING_PENALTY = 0.05     # Штраф за відсутність бу
 
 SCORE_PERFECT_MATCH_BONUS = 0.15  # Бонус за ідеальне співпадіння всіх полів (збільшено з 0.10)
 SCORE_CAPITAL_BONUS = 0.10        # Бонус для столиці (м. Київ)
+VECTORIZED_SCORING = False        # Оцінювати кандидатів пакетно через NumPy (якщо numpy встановлено)
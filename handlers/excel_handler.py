@@ -2,11 +2,70 @@
 Обробник Excel файлів
 """
 import os
+from typing import Callable, Dict, List, Sequence, Tuple
+
 import pandas as pd
 from openpyxl import load_workbook
+from handlers.xlsx_cell_patch import UnsupportedWorkbookLayout, patch_first_sheet
 from models.address import Address
 from utils.logger import Logger
 
+SERVICE_COLUMNS = ("_original_row_index", "_processed_by_us")
+OLD_INDEX_COLUMN = "Старий індекс"
+
+
+def _join_cell_values(values) -> str:
+    """Непорожні значення колонок одного поля через пробіл"""
+    return " ".join(str(value).strip() for value in values if pd.notna(value) and str(value).strip())
+
+
+def _build_address(get_value: Callable[[str], str]) -> Address:
+    return Address(
+        city=get_value('city'),
+        street=get_value('street'),
+        building=get_value('building'),
+        region=get_value('region'),
+        district=get_value('district'),
+        index=get_value('index'),
+        old_index=get_value('old_index'),
+        client_id=get_value('client_id'),
+        name=get_value('name')
+    )
+
+
+class RowSnapshot:
+    """
+    Копія значень колонок mapping для рядків [start_row, end_row)
+
+    Знімається одним векторним зверненням до DataFrame у GUI-потоці, а адреси
+    з неї будуються у фоновому потоці, який DataFrame не читає.
+    """
+
+    def __init__(self, df: pd.DataFrame, column_mapping: dict, start_row: int, end_row: int,
+                 extra_columns: Sequence[int] = ()):
+        columns = list(dict.fromkeys(
+            [col_idx for col_indices in column_mapping.values() for col_idx in col_indices] + list(extra_columns)
+        ))
+        self.start_row = start_row
+        self.end_row = end_row
+        self._position = {col_idx: i for i, col_idx in enumerate(columns)}
+        self._fields = {
+            field_id: [self._position[col_idx] for col_idx in col_indices]
+            for field_id, col_indices in column_mapping.items()
+        }
+        self._rows = df.iloc[start_row:end_row, columns].to_numpy(dtype=object).tolist()
+
+    def value(self, row_index: int, col_idx: int):
+        """Значення клітинки (колонка має бути в mapping або extra_columns)"""
+        return self._rows[row_index - self.start_row][self._position[col_idx]]
+
+    def address(self, row_index: int) -> Address:
+        """Address рядка - як ExcelHandler.get_address_from_row на момент знімка"""
+        values = self._rows[row_index - self.start_row]
+        return _build_address(
+            lambda field_id: _join_cell_values(values[i] for i in self._fields.get(field_id, ()))
+        )
+
 
 class ExcelHandler:
     """Клас для роботи з Excel файлами"""
@@ -22,6 +81,12 @@ class ExcelHandler:
         self.original_df = None
         self.field_to_col_name = {}  # {field: original_col_name}
 
+        # Журнал змін з моменту завантаження/збереження:
+        # {(рядок у вихідному файлі, назва колонки): нове значення}
+        self.dirty_cells: Dict[Tuple[int, str], object] = {}
+        self._clean_values: Dict[Tuple[int, str], object] = {}
+        self.change_count = 0  # Лічильник правок (для автозбереження)
+
     @staticmethod
     def _read_engine_for(file_path: str):
         """Return an explicit engine when pandas needs one."""
@@ -72,7 +137,11 @@ class ExcelHandler:
     @classmethod
     def _looks_headerless(cls, header_df: pd.DataFrame) -> bool:
         """Detect files where the first data row was accidentally read as headers."""
-        labels = [cls._to_text_value(label).strip() for label in header_df.columns]
+        return cls._labels_look_like_data([cls._to_text_value(label) for label in header_df.columns])
+
+    @classmethod
+    def _labels_look_like_data(cls, labels) -> bool:
+        labels = [label.strip() for label in labels]
         if cls._is_sequence_header(labels):
             return False
 
@@ -92,8 +161,83 @@ class ExcelHandler:
 
         return data_like >= max(1, len(labels) // 3)
 
+    @staticmethod
+    def _header_labels(values) -> list:
+        """Column names the way pandas builds them: 'Unnamed: N' for blanks, 'name.1' for repeats."""
+        labels = []
+        seen = {}
+        for idx, value in enumerate(values):
+            label = value if value else f"Unnamed: {idx}"
+            base = label
+            while label in seen:
+                seen[base] += 1
+                label = f"{base}.{seen[base]}"
+            seen[label] = 0
+            labels.append(label)
+        return labels
+
+    @classmethod
+    def _read_xlsx_streaming(cls, file_path: str):
+        """
+        Single pass over an XLSX sheet: cells become text while reading, the header is
+        decided from the first row. Repeated values share one string object.
+        """
+        workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+        try:
+            worksheet = workbook.worksheets[0]
+            worksheet.reset_dimensions()
+
+            to_text = cls._to_text_value
+            texts = {}
+            columns = []
+            row_count = 0
+            last_filled_row = 0
+            first_row = None
+
+            for values in worksheet.iter_rows(values_only=True):
+                row = [value if value.__class__ is str else to_text(value) for value in values]
+                while row and not row[-1]:
+                    row.pop()
+
+                if first_row is None:
+                    first_row = row
+                    continue
+
+                if len(row) > len(columns):
+                    columns.extend([""] * row_count for _ in range(len(row) - len(columns)))
+                filled = bool(row)
+                row.extend([""] * (len(columns) - len(row)))
+                for column, text in zip(columns, row):
+                    column.append(texts.setdefault(text, text))
+
+                row_count += 1
+                if filled:
+                    last_filled_row = row_count
+        finally:
+            workbook.close()
+
+        first_row = first_row or []
+        width = max(len(columns), len(first_row))
+        columns.extend([""] * row_count for _ in range(width - len(columns)))
+        columns = [column[:last_filled_row] for column in columns]
+        first_row = first_row + [""] * (width - len(first_row))
+
+        header_labels = cls._header_labels(first_row)
+        if not cls._labels_look_like_data(header_labels):
+            return pd.DataFrame(dict(zip(header_labels, columns)), columns=header_labels, dtype=str), True
+
+        if last_filled_row or any(first_row):
+            columns = [[first_value] + column for first_value, column in zip(first_row, columns)]
+        labels = [str(idx + 1) for idx in range(width)]
+        return pd.DataFrame(dict(zip(labels, columns)), columns=labels, dtype=str), False
+
     @classmethod
     def _read_excel_text(cls, file_path: str):
+        """Read the first sheet as text. Returns (DataFrame, has_header)."""
+        _, ext = os.path.splitext(file_path)
+        if ext.lower() in (".xlsx", ".xlsm"):
+            return cls._read_xlsx_streaming(file_path)
+
         read_kwargs = {
             "dtype": str,
             "keep_default_na": False,
@@ -105,11 +249,11 @@ class ExcelHandler:
 
         header_df = pd.read_excel(file_path, **read_kwargs)
         if not cls._looks_headerless(header_df):
-            return header_df, True
+            return cls.normalize_text_dataframe(header_df), True
 
         raw_df = pd.read_excel(file_path, header=None, **read_kwargs)
         raw_df.columns = [str(idx + 1) for idx in range(len(raw_df.columns))]
-        return raw_df, False
+        return cls.normalize_text_dataframe(raw_df), False
 
     @classmethod
     def _write_xlsx_as_text(cls, df: pd.DataFrame, file_path: str, include_header: bool = True):
@@ -154,10 +298,11 @@ class ExcelHandler:
         file_path: str,
         save_old_index: bool = False,
     ) -> str:
-        """Save by editing the original workbook so widths, styles, dates and sheet names survive."""
-        if self.original_df is None:
-            raise ValueError("Original DataFrame is required for preserve-workbook save")
+        """
+        Save by editing the original workbook so widths, styles, dates and sheet names survive.
 
+        Only cells from the change journal (and the old-index column when requested) are written.
+        """
         source_path = self.file_path
         if not source_path or not os.path.exists(source_path):
             raise ValueError("Original workbook file is not available")
@@ -167,67 +312,130 @@ class ExcelHandler:
         if source_ext.lower() not in (".xlsx", ".xlsm") or target_ext.lower() not in (".xlsx", ".xlsm"):
             raise ValueError("Preserve-workbook save supports only XLSX/XLSM files")
 
-        workbook = load_workbook(source_path)
-        worksheet = workbook.worksheets[0]
-
-        original_columns = [
-            col for col in self.original_df.columns
-            if col not in ("_original_row_index", "_processed_by_us")
-        ]
+        reference_df = self.original_df if self.original_df is not None else filtered_df
+        original_columns = [col for col in reference_df.columns if col not in SERVICE_COLUMNS]
         column_positions = {col: idx + 1 for idx, col in enumerate(original_columns)}
+        row_offset = 2 if self.has_header else 1
 
-        extra_column_positions = {}
-        old_index_column_name = "Старий індекс"
-        if save_old_index and old_index_column_name in filtered_df.columns and old_index_column_name not in column_positions:
-            new_col = worksheet.max_column + 1
-            extra_column_positions[old_index_column_name] = new_col
-            if self.has_header:
-                worksheet.cell(1, new_col).value = old_index_column_name
-                worksheet.cell(1, new_col).number_format = "@"
+        cells = {}
+        for (original_idx, col_name), value in self.dirty_cells.items():
+            if col_name == OLD_INDEX_COLUMN and not save_old_index:
+                continue
+            excel_col = column_positions.get(col_name)
+            if excel_col:
+                cells[(original_idx + row_offset, excel_col)] = self._to_text_value(value)
+
+        if save_old_index and OLD_INDEX_COLUMN in filtered_df.columns:
+            old_index_col = column_positions.get(OLD_INDEX_COLUMN)
+            if not old_index_col:
+                old_index_col = len(original_columns) + 1
+                if self.has_header:
+                    cells[(1, old_index_col)] = OLD_INDEX_COLUMN
+            original_rows = self.original_row_numbers(filtered_df)
+            for original_idx, value in zip(original_rows, filtered_df[OLD_INDEX_COLUMN].tolist()):
+                if original_idx is not None:
+                    cells[(original_idx + row_offset, old_index_col)] = self._to_text_value(value)
 
-        row_offset = 2 if self.has_header else 1
-        service_columns = {"_original_row_index", "_processed_by_us"}
+        try:
+            patch_first_sheet(source_path, file_path, cells)
+        except UnsupportedWorkbookLayout as e:
+            self.logger.info(f"Точкове збереження недоступне ({e}), зберігаємо через openpyxl")
+            self._save_cells_with_openpyxl(source_path, file_path, cells)
 
-        if "_original_row_index" in filtered_df.columns:
-            row_iter = filtered_df.iterrows()
-        else:
-            row_iter = ((idx, row) for idx, row in filtered_df.iterrows())
+        self.file_path = file_path
+        self._commit_changes()
+        return file_path
 
-        for fallback_idx, row in row_iter:
-            if "_original_row_index" in filtered_df.columns:
-                try:
-                    original_idx = int(row["_original_row_index"])
-                except (TypeError, ValueError):
-                    continue
-            else:
-                original_idx = int(fallback_idx)
+    @staticmethod
+    def original_row_numbers(df: pd.DataFrame) -> list:
+        """Original file row (0-based, without header) for every row of df."""
+        if "_original_row_index" not in df.columns:
+            return [int(idx) for idx in df.index]
 
-            excel_row = original_idx + row_offset
+        rows = []
+        for value in df["_original_row_index"].tolist():
+            try:
+                rows.append(int(value))
+            except (TypeError, ValueError):
+                rows.append(None)
+        return rows
 
-            for col_name in filtered_df.columns:
-                if col_name in service_columns:
-                    continue
-                if col_name == old_index_column_name and not save_old_index:
-                    continue
+    @staticmethod
+    def _save_cells_with_openpyxl(source_path: str, file_path: str, cells: dict):
+        workbook = load_workbook(source_path)
+        worksheet = workbook.worksheets[0]
+        for (excel_row, excel_col), value in cells.items():
+            cell = worksheet.cell(excel_row, excel_col)
+            cell.value = value
+            cell.number_format = "@"
+        workbook.save(file_path)
 
-                excel_col = column_positions.get(col_name) or extra_column_positions.get(col_name)
-                if not excel_col:
-                    continue
+    def original_row(self, row_index: int) -> int:
+        """Номер рядка у вихідному файлі для позиції row_index у self.df"""
+        if "_original_row_index" in self.df.columns:
+            return int(self.df["_original_row_index"].iat[row_index])
+        return int(self.df.index[row_index])
 
-                new_value = self._to_text_value(row[col_name])
-                cell = worksheet.cell(excel_row, excel_col)
+    def set_cell(self, row_index: int, col_idx: int, value):
+        """
+        Записує значення в self.df і журнал змін
 
-                # Do not touch cells whose displayed value did not change. This keeps
-                # dates, numeric types, styles and formulas from the original workbook.
-                if self._cell_text_value(cell.value) == new_value:
-                    continue
+        Args:
+            row_index: Позиція рядка в self.df
+            col_idx: Позиція колонки в self.df
+            value: Нове значення
+        """
+        col_name = self.df.columns[col_idx]
+        key = (self.original_row(row_index), col_name)
+        if key not in self._clean_values:
+            self._clean_values[key] = self.df.iat[row_index, col_idx]
 
-                cell.value = new_value
-                cell.number_format = "@"
+        self.df.iloc[row_index, col_idx] = value
 
-        workbook.save(file_path)
-        self.file_path = file_path
-        return file_path
+        if col_name in SERVICE_COLUMNS:
+            return
+        self.change_count += 1
+        if value == self._clean_values[key]:
+            self.dirty_cells.pop(key, None)
+            del self._clean_values[key]
+        else:
+            self.dirty_cells[key] = value
+
+    def dirty_snapshot(self) -> list:
+        """Копія журналу змін: [[рядок у вихідному файлі, колонка, значення], ...]"""
+        return [
+            [original_idx, col_name, self._to_text_value(value)]
+            for (original_idx, col_name), value in self.dirty_cells.items()
+        ]
+
+    def restore_changes(self, changes: list) -> int:
+        """
+        Повторно застосовує зміни зі знімка dirty_snapshot()
+
+        Returns:
+            Кількість відновлених клітинок
+        """
+        if self.df is None:
+            return 0
+
+        positions = {row: pos for pos, row in enumerate(self.original_row_numbers(self.df))}
+        restored = 0
+        for original_idx, col_name, value in changes:
+            row_pos = positions.get(original_idx)
+            if row_pos is None or col_name not in self.df.columns:
+                continue
+            self.set_cell(row_pos, self.df.columns.get_loc(col_name), value)
+            restored += 1
+        return restored
+
+    def _commit_changes(self):
+        """Файл на диску тепер містить усі зміни - переносимо їх в original_df і очищаємо журнал"""
+        if self.original_df is not None:
+            for (original_idx, col_name), value in self.dirty_cells.items():
+                if col_name in self.original_df.columns and original_idx in self.original_df.index:
+                    self.original_df.at[original_idx, col_name] = value
+        self.dirty_cells.clear()
+        self._clean_values.clear()
     
     def load_file(self, file_path: str) -> pd.DataFrame:
         """Завантажує Excel файл з ЗБЕРЕЖЕННЯМ НУЛІВ"""
@@ -235,9 +443,7 @@ class ExcelHandler:
             previous_columns = list(self.df.columns) if self.df is not None else None
             previous_mapping = self.column_mapping
 
-            loaded_df, self.has_header = self._read_excel_text(file_path)
-            self.df = loaded_df
-            self.df = self.normalize_text_dataframe(self.df)
+            self.df, self.has_header = self._read_excel_text(file_path)
 
             # A new file may have a different column order. Keep mapping only when
             # the structure is identical, otherwise force the user to remap.
@@ -248,6 +454,8 @@ class ExcelHandler:
                 self.column_mapping = previous_mapping
 
             self.original_df = None
+            self.dirty_cells.clear()
+            self._clean_values.clear()
             
             self.file_path = file_path
             self.logger.info(f"✓ Завантажено файл: {file_path}")
@@ -255,7 +463,7 @@ class ExcelHandler:
             self.logger.info(f"✓ Колон: {len(self.df.columns)}")
             if not self.has_header:
                 self.logger.info("✓ Файл розпізнано як таблицю без рядка заголовків")
-            empty_rows = self.df.apply(lambda row: not any(str(value).strip() for value in row), axis=1).sum()
+            empty_rows = int(self.df.apply(lambda col: col.str.strip().eq("")).all(axis=1).sum())
             if empty_rows:
                 self.logger.info(f"✓ Порожні рядки збережено у таблиці: {empty_rows}")
             
@@ -286,6 +494,7 @@ class ExcelHandler:
         try:
             actual_path = self.write_dataframe(self.df, save_path, include_header=self.has_header)
             self.file_path = actual_path
+            self._commit_changes()
             self.logger.info(f"Файл збережено: {actual_path}")
         except Exception as e:
             self.logger.error(f"Помилка збереження файлу {save_path}: {e}")
@@ -409,34 +618,35 @@ class ExcelHandler:
             raise ValueError("Файл не завантажено або mapping не налаштовано")
         
         def get_value(field_id):
-            """Витягує значення з УСІХ колонок цього поля"""
-            if field_id not in self.column_mapping:
-                return ""
-            
-            col_indices = self.column_mapping[field_id]
-            if not col_indices:
-                return ""
-            
-            # ⬇️ ВИПРАВЛЕНО: Об'єднуємо значення з УСІХ колонок
-            values = []
-            for col_idx in col_indices:
-                value = self.df.iloc[row_index, col_idx]
-                if pd.notna(value) and str(value).strip():
-                    values.append(str(value).strip())
-            
-            return " ".join(values)  # Об'єднуємо через пробіл
+            """Витягує значення з УСІХ колонок цього поля (через пробіл)"""
+            col_indices = self.column_mapping.get(field_id) or []
+            return _join_cell_values(self.df.iloc[row_index, col_idx] for col_idx in col_indices)
         
-        return Address(
-            city=get_value('city'),
-            street=get_value('street'),
-            building=get_value('building'),
-            region=get_value('region'),
-            district=get_value('district'),
-            index=get_value('index'),
-            old_index=get_value('old_index'),
-            client_id=get_value('client_id'),
-            name=get_value('name')
-        )
+        return _build_address(get_value)
+
+    def snapshot_rows(self, start_row: int, end_row: int, extra_columns: Sequence[int] = ()) -> RowSnapshot:
+        """
+        Знімок колонок mapping (і extra_columns) для рядків [start_row, end_row)
+
+        Для фонової обробки: один векторний зріз замість get_address_from_row
+        по рядку, а адреси будуються вже з копії у фоновому потоці.
+        """
+        if self.df is None or self.column_mapping is None:
+            raise ValueError("Файл не завантажено або mapping не налаштовано")
+        return RowSnapshot(self.df, self.column_mapping, start_row, end_row, extra_columns)
+
+    def get_unique_field_values(self, field_id: str) -> List[str]:
+        """Різні непорожні значення поля (напр. областей) у всіх рядках, у порядку появи"""
+        if self.df is None or not self.column_mapping or not self.column_mapping.get(field_id):
+            return []
+
+        values = self.df.iloc[:, self.column_mapping[field_id]].fillna('').astype(str)
+        if len(values.columns) == 1:
+            joined = values.iloc[:, 0].str.strip()
+        else:
+            # Як get_address_from_row: непорожні значення всіх колонок поля через пробіл
+            joined = values.apply(lambda row: " ".join(v.strip() for v in row if v.strip()), axis=1)
+        return [value for value in joined.unique() if value]
 
     
     def update_row(self, row_index: int, updates: dict):
@@ -455,7 +665,7 @@ class ExcelHandler:
             
             col_indices = self.column_mapping[field_id]
             for col_idx in col_indices:
-                self.df.iloc[row_index, col_idx] = value
+                self.set_cell(row_index, col_idx, value)
         
         self.logger.debug(f"Оновлено рядок {row_index}: {updates}")
     
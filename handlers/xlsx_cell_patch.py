@@ -0,0 +1,272 @@
+"""
+Точкове оновлення клітинок XLSX без openpyxl
+
+Переписує лише змінені рядки першого аркуша прямо в XML всередині архіву:
+решта рядків, стилі, ширини колонок, формули й інші аркуші копіюються байт у
+байт. Змінені клітинки стають текстовими (inlineStr, формат "@"), як і при
+збереженні через openpyxl. Якщо структура файлу незвична (рядки без атрибута
+r, формули в змінюваних клітинках, префікси простору імен) - піднімається
+UnsupportedWorkbookLayout, і викликач зберігає через openpyxl.
+"""
+import os
+import posixpath
+import re
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+TEXT_NUM_FMT_ID = "49"  # Вбудований формат "@"
+
+_ROW_OPEN_RE = re.compile(rb'<row\b([^>]*?)(/?)>')
+_CELL_RE = re.compile(rb'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_ATTR_R_RE = re.compile(rb'\br="([^"]*)"')
+_ATTR_S_RE = re.compile(rb'\bs="(\d+)"')
+_ROW_SPANS_RE = re.compile(rb'\sspans="[^"]*"')
+_CELL_REF_RE = re.compile(rb'^([A-Z]+)(\d+)$')
+_XF_RE = re.compile(rb'<xf\b[^>]*?(?:/>|>.*?</xf>)', re.S)
+_ILLEGAL_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class UnsupportedWorkbookLayout(ValueError):
+    """Файл не можна безпечно оновити точково"""
+
+
+def column_letter(col: int) -> str:
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _column_number(letters: bytes) -> int:
+    number = 0
+    for ch in letters:
+        number = number * 26 + (ch - 64)
+    return number
+
+
+def _first_sheet_path(archive: zipfile.ZipFile) -> str:
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    sheet = workbook.find(f"{{{MAIN_NS}}}sheets/{{{MAIN_NS}}}sheet")
+    if sheet is None:
+        raise UnsupportedWorkbookLayout("Workbook has no sheets")
+    rel_id = sheet.get(f"{{{REL_NS}}}id")
+
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.findall(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target", "")
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    raise UnsupportedWorkbookLayout("First sheet relationship not found")
+
+
+class _TextStyles:
+    """Стилі з форматом "@" на основі наявних стилів клітинок (cellXfs у styles.xml)"""
+
+    def __init__(self, styles_xml: bytes):
+        self.xml = styles_xml
+        start = styles_xml.find(b"<cellXfs")
+        end = styles_xml.find(b"</cellXfs>")
+        if start < 0 or end < 0:
+            raise UnsupportedWorkbookLayout("styles.xml has no cellXfs")
+        self._body_start = styles_xml.index(b">", start) + 1
+        self._end = end
+        self._xfs = _XF_RE.findall(styles_xml, self._body_start, end)
+        self._added: List[bytes] = []
+        self._text_style: Dict[int, int] = {}
+
+    def text_style(self, style: int) -> int:
+        if style in self._text_style:
+            return self._text_style[style]
+        if style >= len(self._xfs):
+            raise UnsupportedWorkbookLayout(f"Unknown cell style {style}")
+
+        xf = self._xfs[style]
+        if re.search(rb'\bnumFmtId="' + TEXT_NUM_FMT_ID.encode() + rb'"', xf):
+            result = style
+        else:
+            text_xf = re.sub(rb'\snumFmtId="[^"]*"', b"", xf)
+            text_xf = re.sub(rb'\sapplyNumberFormat="[^"]*"', b"", text_xf)
+            text_xf = text_xf.replace(
+                b"<xf", b'<xf numFmtId="' + TEXT_NUM_FMT_ID.encode() + b'" applyNumberFormat="1"', 1
+            )
+            result = len(self._xfs) + len(self._added)
+            self._added.append(text_xf)
+
+        self._text_style[style] = result
+        return result
+
+    def updated_xml(self) -> bytes:
+        if not self._added:
+            return self.xml
+        total = len(self._xfs) + len(self._added)
+        head = re.sub(rb'(<cellXfs\b[^>]*?)\scount="\d+"', rb'\1', self.xml[:self._body_start - 1])
+        head += b' count="' + str(total).encode() + b'">'
+        return head + self.xml[self._body_start:self._end] + b"".join(self._added) + self.xml[self._end:]
+
+
+def _text_cell(ref: bytes, style: int, value: str) -> bytes:
+    style_attr = b' s="' + str(style).encode() + b'"' if style else b""
+    if value == "":
+        return b'<c r="' + ref + b'"' + style_attr + b"/>"
+    if _ILLEGAL_XML_RE.search(value):
+        raise UnsupportedWorkbookLayout("Value contains characters not allowed in XML")
+    text = escape(value).encode("utf-8")
+    return (
+        b'<c r="' + ref + b'"' + style_attr + b' t="inlineStr"><is><t xml:space="preserve">'
+        + text + b"</t></is></c>"
+    )
+
+
+def _patch_row(row_number: int, row_attrs: bytes, body: bytes, values: Dict[int, str], styles: _TextStyles) -> bytes:
+    row_style = _ATTR_S_RE.search(row_attrs)
+    default_style = int(row_style.group(1)) if row_style and b'customFormat="1"' in row_attrs else 0
+    pending = sorted(values, reverse=True)
+    parts = []
+    position = 0
+
+    def new_cell(col: int, style: int) -> bytes:
+        ref = column_letter(col).encode() + str(row_number).encode()
+        return _text_cell(ref, styles.text_style(style), str(values[col]))
+
+    for match in _CELL_RE.finditer(body):
+        ref_match = _ATTR_R_RE.search(match.group(1))
+        cell_ref = _CELL_REF_RE.match(ref_match.group(1)) if ref_match else None
+        if cell_ref is None:
+            raise UnsupportedWorkbookLayout("Cell without reference")
+        col = _column_number(cell_ref.group(1))
+
+        while pending and pending[-1] < col:
+            parts.append(body[position:match.start()])
+            position = match.start()
+            parts.append(new_cell(pending.pop(), default_style))
+
+        if pending and pending[-1] == col:
+            pending.pop()
+            if match.group(2) and b"<f" in match.group(2):
+                raise UnsupportedWorkbookLayout("Formula cell would be overwritten")
+            style_match = _ATTR_S_RE.search(match.group(1))
+            parts.append(body[position:match.start()])
+            parts.append(new_cell(col, int(style_match.group(1)) if style_match else 0))
+            position = match.end()
+
+    parts.append(body[position:])
+    parts.extend(new_cell(col, default_style) for col in reversed(pending))
+    return b"".join(parts)
+
+
+def _patch_sheet(sheet_xml: bytes, cells: Dict[int, Dict[int, str]], styles: _TextStyles) -> bytes:
+    if b"<sheetData/>" in sheet_xml:
+        sheet_xml = sheet_xml.replace(b"<sheetData/>", b"<sheetData></sheetData>", 1)
+    data_end = sheet_xml.find(b"</sheetData>")
+    if data_end < 0:
+        raise UnsupportedWorkbookLayout("Sheet has no sheetData")
+
+    pending_rows = sorted(cells, reverse=True)
+    parts = []
+    position = 0
+
+    def new_row(row_number: int) -> bytes:
+        return (
+            b'<row r="' + str(row_number).encode() + b'">'
+            + _patch_row(row_number, b"", b"", cells[row_number], styles) + b"</row>"
+        )
+
+    for match in _ROW_OPEN_RE.finditer(sheet_xml, 0, data_end):
+        ref_match = _ATTR_R_RE.search(match.group(1))
+        if ref_match is None:
+            raise UnsupportedWorkbookLayout("Row without number")
+        row_number = int(ref_match.group(1))
+
+        while pending_rows and pending_rows[-1] < row_number:
+            parts.append(sheet_xml[position:match.start()])
+            position = match.start()
+            parts.append(new_row(pending_rows.pop()))
+
+        if not pending_rows or pending_rows[-1] != row_number:
+            continue
+        pending_rows.pop()
+
+        if match.group(2):
+            body_start = body_end = row_end = match.end()
+        else:
+            body_start = match.end()
+            body_end = sheet_xml.index(b"</row>", body_start)
+            row_end = body_end + len(b"</row>")
+
+        parts.append(sheet_xml[position:match.start()])
+        parts.append(b"<row" + _ROW_SPANS_RE.sub(b"", match.group(1)) + b">")
+        parts.append(_patch_row(row_number, match.group(1), sheet_xml[body_start:body_end], cells[row_number], styles))
+        parts.append(b"</row>")
+        position = row_end
+
+    parts.append(sheet_xml[position:data_end])
+    parts.extend(new_row(row_number) for row_number in reversed(pending_rows))
+    parts.append(sheet_xml[data_end:])
+    return _expand_dimension(b"".join(parts), cells)
+
+
+def _expand_dimension(sheet_xml: bytes, cells: Dict[int, Dict[int, str]]) -> bytes:
+    match = re.search(rb'<dimension ref="([A-Z]+)(\d+):([A-Z]+)(\d+)"', sheet_xml)
+    if match is None:
+        return sheet_xml
+
+    max_row = max(int(match.group(4)), max(cells))
+    max_col = max(_column_number(match.group(3)), max(max(row) for row in cells.values()))
+    ref = match.group(1) + match.group(2) + b":" + column_letter(max_col).encode() + str(max_row).encode()
+    return sheet_xml[:match.start(1)] + ref + sheet_xml[match.end(4):]
+
+
+def patch_first_sheet(source_path: str, target_path: str, cells: Dict[Tuple[int, int], str]):
+    """
+    Записує значення в клітинки першого аркуша
+
+    Args:
+        source_path: Вихідний XLSX/XLSM
+        target_path: Куди зберегти (може збігатися з source_path)
+        cells: {(номер рядка Excel, номер колонки Excel): текст}, нумерація з 1
+
+    Raises:
+        UnsupportedWorkbookLayout: файл треба зберігати через openpyxl
+    """
+    by_row: Dict[int, Dict[int, str]] = {}
+    for (row, col), value in cells.items():
+        by_row.setdefault(row, {})[col] = value
+
+    with zipfile.ZipFile(source_path) as archive:
+        sheet_path = _first_sheet_path(archive)
+        if "xl/styles.xml" not in archive.namelist():
+            raise UnsupportedWorkbookLayout("Workbook has no styles.xml")
+
+        styles = _TextStyles(archive.read("xl/styles.xml"))
+        sheet_xml = archive.read(sheet_path)
+        if not by_row:
+            patched_sheet = sheet_xml
+        elif b"<sheetData" not in sheet_xml:
+            raise UnsupportedWorkbookLayout("Unexpected sheet XML namespace prefix")
+        else:
+            patched_sheet = _patch_sheet(sheet_xml, by_row, styles)
+        replacements = {sheet_path: patched_sheet, "xl/styles.xml": styles.updated_xml()}
+
+        target_dir = os.path.dirname(os.path.abspath(target_path))
+        fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=target_dir)
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as output:
+                for info in archive.infolist():
+                    data = replacements.get(info.filename)
+                    output.writestr(info, data if data is not None else archive.read(info.filename))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    os.replace(tmp_path, target_path)
@@ -7,6 +7,7 @@ import sys
 import os
 from datetime import datetime
 import faulthandler
+import multiprocessing
 import threading
 import traceback
 
@@ -219,6 +220,9 @@ def main():
 
 
 if __name__ == '__main__':
+    # У зібраному EXE процес пулу (spawn) запускає той самий EXE - без цього
+    # виклику він відкрив би ще одну копію програми замість роботи воркера
+    multiprocessing.freeze_support()
     try:
         main()
     except Exception:
@@ -39,6 +39,13 @@ class Address:
         """Перевіряє чи адреса порожня"""
         return not any([self.city, self.street, self.building, self.region])
     
+    def search_key(self):
+        """Канонічний ключ полів, що впливають на пошук (однакові адреси - однаковий ключ)"""
+        return tuple(
+            " ".join(str(value or "").split()).lower()
+            for value in (self.region, self.district, self.city, self.street, self.building, self.index)
+        )
+    
     def get_full_address(self):
         """Повертає повну адресу як рядок"""
         parts = []
@@ -1,33 +1,100 @@
 """
 Модель запису з magistral.csv
+
+Записів сотні тисяч, тому клас без __dict__ (__slots__), а однакові рядки
+й набори будинків спільні між записами (див. MagistralLoader). Слоти
+оголошені вручну: dataclass(slots=True) потребує Python 3.10.
 """
-from dataclasses import dataclass
-from typing import List
+from typing import FrozenSet, List
 
 
-@dataclass
 class MagistralRecord:
     """Запис з magistral.csv"""
     
-    region: str = ""                    # Область
-    old_district: str = ""              # Старий адм. район
-    new_district: str = ""              # Новий адм. район
-    otg: str = ""                       # ОТГ
-    city: str = ""                      # Населений пункт
-    city_index: str = ""                # Індекс НП
-    street: str = ""                    # Вулиця
-    buildings: str = ""                 # Будинки (через кому)
-    sort_center_1: str = ""             # Сорт. центр 1
-    sort_center_2: str = ""             # Сорт. центр 2
-    delivery_district: str = ""         # Адм. район доставки
-    tech_index: str = ""                # Тех. індекс
-    features: str = ""                  # Особливості
-    not_working: str = ""               # Тимчасово не функціонує
+    # Порядок полів - порядок аргументів конструктора
+    __slots__ = (
+        'region',                 # Область
+        'old_district',           # Старий адм. район
+        'new_district',           # Новий адм. район
+        'otg',                    # ОТГ
+        'city',                   # Населений пункт
+        'city_index',             # Індекс НП
+        'street',                 # Вулиця
+        'buildings',              # Будинки (через кому)
+        'sort_center_1',          # Сорт. центр 1
+        'sort_center_2',          # Сорт. центр 2
+        'delivery_district',      # Адм. район доставки
+        'tech_index',             # Тех. індекс
+        'features',               # Особливості
+        'not_working',            # Тимчасово не функціонує
+        
+        # Додаткові обчислювані поля
+        'normalized_city',
+        'normalized_street',
+        'normalized_region',
+        'normalized_buildings',   # Будинки для точного порівняння
+        'building_bases',         # Номери будинків без літер
+        'classifier_old_street',  # Стара назва вулиці (записи з класифікатора Укрпошти)
+    )
+    
+    def __init__(
+        self,
+        region: str = "",
+        old_district: str = "",
+        new_district: str = "",
+        otg: str = "",
+        city: str = "",
+        city_index: str = "",
+        street: str = "",
+        buildings: str = "",
+        sort_center_1: str = "",
+        sort_center_2: str = "",
+        delivery_district: str = "",
+        tech_index: str = "",
+        features: str = "",
+        not_working: str = "",
+        normalized_city: str = "",
+        normalized_street: str = "",
+        normalized_region: str = "",
+        normalized_buildings: FrozenSet[str] = frozenset(),
+        building_bases: FrozenSet[str] = frozenset(),
+        classifier_old_street: str = "",
+    ):
+        self.region = region
+        self.old_district = old_district
+        self.new_district = new_district
+        self.otg = otg
+        self.city = city
+        self.city_index = city_index
+        self.street = street
+        self.buildings = buildings
+        self.sort_center_1 = sort_center_1
+        self.sort_center_2 = sort_center_2
+        self.delivery_district = delivery_district
+        self.tech_index = tech_index
+        self.features = features
+        self.not_working = not_working
+        self.normalized_city = normalized_city
+        self.normalized_street = normalized_street
+        self.normalized_region = normalized_region
+        self.normalized_buildings = normalized_buildings
+        self.building_bases = building_bases
+        self.classifier_old_street = classifier_old_street
+    
+    def _values(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.__slots__)
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._values() == other._values()
+    
+    # Записи змінювані, тому не хешуються
+    __hash__ = None
     
-    # Додаткові обчислювані поля
-    normalized_city: str = ""
-    normalized_street: str = ""
-    normalized_region: str = ""
+    def __repr__(self):
+        fields = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{self.__class__.__name__}({fields})"
     
     def __str__(self):
         return f"{self.region} → {self.city} → {self.street} ({self.city_index})"
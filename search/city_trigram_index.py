@@ -0,0 +1,70 @@
+"""
+Триграмний індекс назв населених пунктів для нечіткого пошуку міста
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from search.similarity import SimilarityCalculator
+
+
+class CityTrigramIndex:
+    """
+    Індекс по триграмах унікальних нормалізованих назв міст
+
+    Кандидати відбираються за кількістю спільних триграм; назви з
+    коефіцієнтом Жаккара нижче min_jaccard відкидаються ще до
+    Jaro-Winkler, який рахується тільки для обмеженої кількості найкращих.
+    """
+
+    def __init__(self, names: Iterable[str], min_jaccard: float = 0.2, max_checks: int = 50):
+        self.min_jaccard = min_jaccard
+        self.max_checks = max_checks
+        self.names: List[str] = sorted(set(name for name in names if name))
+        self._sizes: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+
+        for name_id, name in enumerate(self.names):
+            grams = self.trigrams(name)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                if gram not in self._postings:
+                    self._postings[gram] = []
+                self._postings[gram].append(name_id)
+
+    @staticmethod
+    def trigrams(text: str) -> set:
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def find(self, query: str, limit: int = 5, min_similarity: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        Повертає до limit назв, найбільш схожих на query
+
+        Returns:
+            Список (назва, схожість) за спаданням схожості
+        """
+        if not query:
+            return []
+
+        query_grams = self.trigrams(query)
+        overlaps = Counter()
+        for gram in query_grams:
+            overlaps.update(self._postings.get(gram, ()))
+
+        ranked = []
+        query_size = len(query_grams)
+        for name_id, overlap in overlaps.items():
+            jaccard = overlap / (query_size + self._sizes[name_id] - overlap)
+            if jaccard >= self.min_jaccard:
+                ranked.append((jaccard, name_id))
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+
+        results = []
+        for _, name_id in ranked[:self.max_checks]:
+            name = self.names[name_id]
+            similarity = SimilarityCalculator.token_similarity(query, name)
+            if similarity >= min_similarity:
+                results.append((name, similarity))
+
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:limit]
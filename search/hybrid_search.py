@@ -2,13 +2,17 @@
 Гібридний пошук адрес v3.0 - з рівнями впевненості
 Комбінує Jaro-Winkler, Levenshtein, Fuzzy matching, N-grams
 """
+import heapq
 import re
-from typing import List, Dict, Optional
+import sys
+from typing import List, Dict, Optional, Tuple
 from models.address import Address
 from models.magistral_record import MagistralRecord
 from search.normalizer import TextNormalizer
 from search.similarity import SimilarityCalculator
 from search.magistral_loader import MagistralLoader
+from search.query_profile import QueryProfile
+from search.vectorized_scoring import VectorizedScorer
 from search.ukrposhta_classifier import UkrposhtaClassifierClient
 from search.ukrposhta_offline_cache import UkrposhtaOfflineCacheClient
 from utils.logger import Logger
@@ -17,6 +21,9 @@ import config
 
 class HybridSearch:
     """Гібридний пошук з автоматичною та ручною підстановкою"""
+
+    # Столиця + обласні центри, для яких нараховується SCORE_CAPITAL_BONUS
+    MAJOR_CITIES_BONUS = ('київ', 'донецьк', 'харків', 'одеса', 'дніпро', 'львів', 'запоріжжя')
     
     def __init__(self, lazy_load: bool = True):
         """
@@ -28,6 +35,7 @@ class HybridSearch:
         self.normalizer = TextNormalizer()
         self.similarity = SimilarityCalculator()
         self.loader = MagistralLoader()
+        self.vectorized_scorer = VectorizedScorer(self.normalizer, self.similarity, self.MAJOR_CITIES_BONUS)
         offline_classifier = UkrposhtaOfflineCacheClient()
         if offline_classifier.enabled:
             self.classifier = offline_classifier
@@ -39,6 +47,8 @@ class HybridSearch:
         
         self.magistral_records = []
         self._is_loaded = False
+        # Кандидати та загальні результати міста, спільні для рядків однієї групи search_many
+        self._group_cache: Optional[Dict] = None
         
         # Завантажуємо тільки якщо НЕ lazy
         if not lazy_load:
@@ -50,12 +60,30 @@ class HybridSearch:
             self.logger.info("=" * 80)
             self.logger.info("📂 ЗАВАНТАЖЕННЯ ДАНИХ З magistral.csv")
             self.magistral_records = self.loader.load()
+            self.similarity.clear_cache()
             self._is_loaded = True
             self.logger.info(f"✓ Завантажено записів: {len(self.magistral_records)}")
             self.logger.info(f"✓ Проіндексовано міст: {len(self.loader.index_by_city_prefix)}")
             self.logger.info(f"✓ Проіндексовано областей: {len(self.loader.index_by_region)}")
             self.logger.info("=" * 80 + "\n")
     
+    def preload_regions(self, regions: List[str]) -> int:
+        """
+        Наперед відкриває дані областей (шарди сховища magistral)
+
+        Без цього шард області відкривається при першому пошуку в ній;
+        виклик до завантаження довідника нічого не робить.
+
+        Args:
+            regions: Назви областей як у файлі
+
+        Returns:
+            Кількість відкритих областей
+        """
+        if not self._is_loaded:
+            return 0
+        return self.loader.load_regions(regions)
+    
     def search(self, address: Address, max_results: int = None) -> List[Dict]:
         """
         LEGACY метод - для зворотної сумісності
@@ -64,24 +92,57 @@ class HybridSearch:
         result = self.search_with_confidence(address, max_results)
         return result['manual']
     
-    def search_with_confidence(self, address: Address, max_results: int = None) -> Dict:
+    def search_many(self, addresses: List[Address], max_results: int = None) -> List[Dict]:
         """
-        НОВИЙ метод - пошук з рівнями впевненості
-        
-        Args:
-            address: Адреса для пошуку
-            max_results: Максимум результатів для ручного вибору
-            
+        Пакетний пошук для багатьох адрес
+
+        Адреси обробляються групами за нормалізованими містом та областю, тож
+        кандидати міста і загальні індекси рахуються один раз на групу.
+        Як і search_with_confidence, попередня обробка змінює передані адреси.
+
         Returns:
-            {
-                'auto': Dict or None,     # Результат для автопідстановки
-                'manual': List[Dict],     # Результати для ручного вибору
-                'total_found': int,       # Загальна кількість знайдених
-                'search_mode': str        # 'auto' або 'manual'
-            }
+            Результати search_with_confidence у порядку addresses
         """
         self._ensure_loaded()
 
+        group_keys = [
+            (
+                self.normalizer.normalize_city(address.city),
+                self.normalizer.normalize_region(address.region) if address.region else "",
+            )
+            for address in addresses
+        ]
+        results: List[Optional[Dict]] = [None] * len(addresses)
+        current_group = None
+        self._group_cache = {}
+        try:
+            for position in sorted(range(len(addresses)), key=group_keys.__getitem__):
+                if group_keys[position] != current_group:
+                    # Тримаємо в пам'яті тільки поточну групу
+                    current_group = group_keys[position]
+                    self._group_cache.clear()
+                results[position] = self.search_with_confidence(addresses[position], max_results)
+        finally:
+            self._group_cache = None
+
+        return results
+
+    def _group_cached(self, key: tuple, compute):
+        """Значення compute() з кешу поточної групи search_many (поза пакетом - без кешу)"""
+        if self._group_cache is None:
+            return compute()
+        if key not in self._group_cache:
+            self._group_cache[key] = compute()
+        return self._group_cache[key]
+
+    def preprocess_address(self, address: Address) -> None:
+        """
+        Попередня обробка адреси на місці, з якої починається search_with_confidence
+
+        Розбирає повну адресу у полі вулиці, виправляє переплутані область і
+        район, витягує місто та будинок з вулиці. Повторний виклик адресу не
+        змінює, тож SearchManager викликає її перед пошуком у кеші результатів.
+        """
         if address.street and address.building:
             street_norm = self.normalizer.normalize_text(address.street)
             building_norm = self.normalizer.normalize_text(address.building)
@@ -91,7 +152,6 @@ class HybridSearch:
         self._preprocess_region_district(address)
         self._preprocess_full_address(address)
         
-        # ============ 0. ПОПЕРЕДНЯ ОБРОБКА ============
         # Спроба витягнути місто з вулиці, якщо місто не вказано
         if not address.city and address.street:
             extracted_city, cleaned_street = self.normalizer.try_extract_city(address.street)
@@ -107,6 +167,27 @@ class HybridSearch:
                 self.logger.info(f"💡 Витягнуто будинок з вулиці: '{extracted_building}' (вулиця: '{cleaned_street_b}')")
                 address.building = extracted_building
                 address.street = cleaned_street_b
+
+    def search_with_confidence(self, address: Address, max_results: int = None) -> Dict:
+        """
+        НОВИЙ метод - пошук з рівнями впевненості
+        
+        Args:
+            address: Адреса для пошуку
+            max_results: Максимум результатів для ручного вибору
+            
+        Returns:
+            {
+                'auto': Dict or None,     # Результат для автопідстановки
+                'manual': List[Dict],     # Результати для ручного вибору
+                'total_found': int,       # Загальна кількість знайдених
+                'search_mode': str        # 'auto' або 'manual'
+            }
+        """
+        self._ensure_loaded()
+
+        # ============ 0. ПОПЕРЕДНЯ ОБРОБКА ============
+        self.preprocess_address(address)
         
         # ============ СПЕЦІАЛЬНА ОБРОБКА: абонентська скринька ============
         if address.street and ('а/с' in address.street.lower() or 'п/с' in address.street.lower() or 'абонент' in address.street.lower()):
@@ -158,19 +239,20 @@ class HybridSearch:
         self.logger.info(f"   Область:  '{address.region or ''}'")
         self.logger.info("-" * 80)
         
+        # Нормалізуємо запит один раз для всіх кандидатів
+        query = self._compile_query(address)
+        
         # 1. Отримуємо кандидатів
-        candidates = self._get_candidates(address)
+        candidates = self._get_candidates(address, query)
         
-        # 2. Обчислюємо ЖОРСТКИЙ score
-        scored_results = []
-        for candidate in candidates:
-            score = self._calculate_score_strict(address, candidate)
-            
-            if score >= config.SIMILARITY_THRESHOLD:
-                result = self._create_result(candidate, score, address)
-                scored_results.append(result)
-
-        classifier_results = self._get_classifier_results(address)
+        # 2. Обчислюємо ЖОРСТКИЙ score, тримаючи тільки найкращих кандидатів
+        top_k = max(config.SCORE_TOP_K, max_results)
+        scored_results = [
+            self._create_result(candidate, score, address, query)
+            for candidate, score in self._top_scored_candidates(address, candidates, query, top_k)
+        ]
+
+        classifier_results = self._get_classifier_results(address, query)
         if classifier_results:
             self.logger.info(f"💡 Класифікатор Укрпошти додав результатів: {len(classifier_results)}")
             scored_results.extend(classifier_results)
@@ -185,13 +267,13 @@ class HybridSearch:
         scored_results = self._deduplicate_equivalent_results(scored_results)
         
         # 4. Визначаємо можливість автопідстановки
-        auto_result = self._find_auto_result(address, scored_results)
+        auto_result = self._find_auto_result(address, scored_results, query=query)
         
         # ============ 5. ЛОГІКА "ЗАГАЛЬНОГО ІНДЕКСУ" (для не-Києва) ============
         # ============ 5. ЛОГІКА "ЗАГАЛЬНОГО ІНДЕКСУ" (для не-Києва) ============
         # Якщо автопідстановка не знайдена, і це не Київ - шукаємо загальний індекс
-        # Нормалізуємо місто запиту
-        query_city_norm = self.normalizer.normalize_city(address.city) if address.city else ""
+        # Нормалізоване місто запиту
+        query_city_norm = query.city
         
         # Великі міста, для яких ми НЕ хочемо "загальний індекс" (бо там багато відділень)
         # і для яких ми хочемо пріоритет "м. Місто" над "с. Місто"
@@ -201,7 +283,7 @@ class HybridSearch:
         # Якщо це запит на велике місто - ми НЕ шукаємо загальні індекси
         if not auto_result and not is_major_city_query and address.city:
             # Шукаємо загальні результати (по місту)
-            general_results = self._find_general_city_results(address)
+            general_results = self._find_general_city_results(address, query)
             
             if general_results:
                 self.logger.info(f"💡 Знайдено {len(general_results)} загальних індексів для '{address.city}'")
@@ -226,7 +308,7 @@ class HybridSearch:
                 
                 # Оновлюємо auto_result якщо він з'явився (або якщо ми вирішили що загальний підходить)
                 if not auto_result:
-                    auto_result = self._find_auto_result(address, scored_results, allow_general=True)
+                    auto_result = self._find_auto_result(address, scored_results, allow_general=True, query=query)
 
         post_office_recommendation = self._find_post_office_recommendation(address, auto_result, scored_results)
         if post_office_recommendation:
@@ -264,6 +346,30 @@ class HybridSearch:
             'search_mode': search_mode
         }
     
+    def _compile_query(self, address: Address) -> QueryProfile:
+        """Нормалізує поля запиту один раз перед оцінкою кандидатів"""
+        # Інтерновані рядки - ті самі об'єкти, що й у записах magistral (ключі кешу схожості)
+        query_city = sys.intern(self.normalizer.normalize_city(address.city))
+        query_building = str(address.building or "").strip()
+        return QueryProfile(
+            city=query_city,
+            street_options=[
+                sys.intern(option)
+                for option in self.normalizer.normalize_street_aliases(address.street, address.city)
+            ],
+            street_type=self.normalizer.detect_street_type(address.street),
+            building=query_building,
+            building_clean=self._normalize_building_for_match(query_building),
+            building_base=self._building_base(query_building),
+            building_has_letter_suffix=self._has_letter_suffix(query_building),
+            index=self._normalize_query_index(address.index),
+            region=sys.intern(self.normalizer.normalize_region(address.region)) if address.region else "",
+            is_major_city=(
+                query_city in self.MAJOR_CITIES_BONUS
+                or query_city in ['м.' + c for c in self.MAJOR_CITIES_BONUS]
+            ),
+        )
+
     def _empty_result(self) -> Dict:
         """Порожній результат"""
         return {
@@ -394,7 +500,7 @@ class HybridSearch:
 
         return ""
     
-    def _find_general_city_results(self, address: Address) -> List[Dict]:
+    def _find_general_city_results(self, address: Address, query: Optional[QueryProfile] = None) -> List[Dict]:
         """
         Шукає "загальні" результати для міста (найнижчий індекс),
         коли точна вулиця не знайдена.
@@ -402,25 +508,24 @@ class HybridSearch:
         """
         if not address.city:
             return []
-            
-        candidates = self.loader.get_candidates_by_city_prefix(address.city)
+        query = query or self._compile_query(address)
+        general_results = self._group_cached(
+            ('general_results', query.city, query.region),
+            lambda: self._build_general_city_results(query),
+        )
+        # Копії - викликач доповнює і повертає ці словники як результати
+        return [dict(result) for result in general_results]
+
+    def _build_general_city_results(self, query: QueryProfile) -> List[Dict]:
+        # Записи саме цього міста (і області, якщо задана)
+        candidates = self.loader.get_candidates_by_normalized_city(query.city, query.region)
         if not candidates:
             return []
-            
-        norm_city = self.normalizer.normalize_city(address.city)
-        norm_region = self.normalizer.normalize_region(address.region) if address.region else None
         
         # Групуємо по унікальних населених пунктах (Область + Район + Місто)
         unique_cities = {}
         
         for record in candidates:
-            if record.normalized_city != norm_city:
-                continue
-                
-            # Якщо задана область - фільтруємо
-            if norm_region and record.normalized_region != norm_region:
-                continue
-                
             # Ключ для групування: Область + Район
             key = (record.region, record.new_district or record.old_district)
             
@@ -502,7 +607,13 @@ class HybridSearch:
             reverse=True,
         )
 
-    def _find_auto_result(self, address: Address, results: List[Dict], allow_general: bool = False) -> Optional[Dict]:
+    def _find_auto_result(
+        self,
+        address: Address,
+        results: List[Dict],
+        allow_general: bool = False,
+        query: Optional[QueryProfile] = None,
+    ) -> Optional[Dict]:
         """
         Визначає чи можлива автопідстановка
         
@@ -518,6 +629,7 @@ class HybridSearch:
         """
         if not results:
             return None
+        query = query or self._compile_query(address)
         
         # Фільтруємо результати ≥ AUTO_MATCH_CONFIDENCE
         # АБО якщо це загальний індекс і дозволено (score >= 0.85)
@@ -528,7 +640,7 @@ class HybridSearch:
             elif allow_general and r.get('is_general') and r['score'] >= 0.85:
                 perfect_results.append(r)
 
-        query_index = self._normalize_query_index(address.index)
+        query_index = query.index
         if query_index:
             index_matched_results = [
                 r for r in perfect_results
@@ -593,17 +705,12 @@ class HybridSearch:
                 )
         
         # Перевіряємо ТОЧНЕ співпадіння будинку (ТІЛЬКИ для НЕ загальних результатів)
-        if not result.get('is_general') and address.building and address.building.strip():
-            query_building = self._normalize_building_for_match(address.building)
-            raw_buildings_list = [b.strip() for b in result['buildings'].split(',')]
-            buildings_list = [
-                self._normalize_building_for_match(b)
-                for b in raw_buildings_list
-            ]
+        if not result.get('is_general') and query.building:
+            query_building = query.building_clean
+            buildings_list, base_buildings = self.normalizer.building_sets(result['buildings'])
             
-            query_building_base = self._building_base(address.building)
-            base_buildings = [self._building_base(b) for b in raw_buildings_list]
-            base_match_allowed = self._has_letter_suffix(address.building)
+            query_building_base = query.building_base
+            base_match_allowed = query.building_has_letter_suffix
             if query_building not in buildings_list and (
                 not base_match_allowed
                 or not query_building_base
@@ -611,27 +718,43 @@ class HybridSearch:
             ):
                 self.logger.debug(
                     f"Автопідстановка неможлива: будинок '{query_building}' "
-                    f"відсутній в списку {buildings_list}"
+                    f"відсутній в списку {sorted(buildings_list)}"
                 )
                 return None
         
         self.logger.debug("✓ Автопідстановка можлива - всі критерії виконані")
         return result
     
-    def _get_candidates(self, address: Address) -> List[MagistralRecord]:
+    def _get_candidates(self, address: Address, query: Optional[QueryProfile] = None) -> List[MagistralRecord]:
         """
         Швидке фільтрування кандидатів
         Використовує індекси для швидкості
         """
-        candidates = []
+        query = query or self._compile_query(address)
         
-        # Стратегія 1: Пошук по префіксу міста
+        # Стратегія 0: Вулиці міста зі спільними словами, а якщо таких немає -
+        # вулиці з кількома опечатками. Для назви міста з помилкою - те саме в
+        # кожному зі схожих міст, бо всі їхні записи не вміщаються в MAX_CANDIDATES
+        candidates = self._get_street_candidates(query.city, query)
+        if not candidates and query.city and not self.loader.has_city(query.city):
+            for similar_city in self._find_similar_cities(query):
+                candidates.extend(self._get_street_candidates(similar_city, query))
+        if candidates:
+            self._add_postcode_candidates(address, candidates)
+            return candidates[:config.MAX_CANDIDATES]
+        
+        # Стратегія 1: Точне місто, для неточних назв - кілька найсхожіших міст,
+        # і тільки в крайньому разі - весь префікс
         if address.city and len(address.city) >= 2:
-            city_candidates = self.loader.get_candidates_by_city_prefix(address.city)
+            city_candidates = self._group_cached(
+                ('city_candidates', query.city),
+                lambda: self._get_city_candidates(address, query),
+            )
             candidates.extend(city_candidates)
         
-        # Стратегія 2: Пошук по області
-        if address.region:
+        # Стратегія 2: Пошук по області - тільки якщо місто не знайдено,
+        # бо записи інших міст області однаково не проходять фільтр міста
+        if address.region and not candidates:
             region_candidates = self.loader.get_candidates_by_region(address.region)
             
             # Додаємо тільки унікальні
@@ -641,6 +764,47 @@ class HybridSearch:
                     candidates.append(rc)
         
         # Стратегія 3: Пошук по індексу якщо заданий
+        self._add_postcode_candidates(address, candidates)
+        
+        # Обмежуємо кількість кандидатів
+        if len(candidates) > config.MAX_CANDIDATES:
+            candidates = candidates[:config.MAX_CANDIDATES]
+        
+        return candidates
+
+    def _get_city_candidates(self, address: Address, query: QueryProfile) -> List[MagistralRecord]:
+        """Записи міста запиту; для неточної назви - найсхожіші міста, далі префікс"""
+        city_candidates = self.loader.get_candidates_by_normalized_city(query.city)
+        if not city_candidates:
+            city_candidates = [
+                record
+                for similar_city in self._find_similar_cities(query)
+                for record in self.loader.get_candidates_by_normalized_city(similar_city)
+            ]
+        if not city_candidates:
+            city_candidates = self.loader.get_candidates_by_city_prefix(address.city)
+        return city_candidates
+
+    def _get_street_candidates(self, normalized_city: str, query: QueryProfile) -> List[MagistralRecord]:
+        """Записи міста на вулицях зі спільними словами, інакше - на вулицях з опечатками"""
+        candidates = self.loader.get_candidates_by_street_tokens(normalized_city, query.street_options)
+        if not candidates:
+            candidates = self.loader.get_candidates_by_similar_streets(normalized_city, query.street_options)
+        return candidates
+
+    def _find_similar_cities(self, query: QueryProfile) -> List[str]:
+        """До FUZZY_CITY_CANDIDATES найсхожіших на місто запиту міст (один раз на групу search_many)"""
+        return self._group_cached(
+            ('similar_cities', query.city),
+            lambda: self.loader.find_similar_cities(
+                query.city,
+                limit=config.FUZZY_CITY_CANDIDATES,
+                min_similarity=config.SCORE_CITY_THRESHOLD,
+            ),
+        )
+
+    def _add_postcode_candidates(self, address: Address, candidates: List[MagistralRecord]) -> None:
+        """Додає записи з точним поштовим індексом запиту (якщо заданий)"""
         if address.index and len(address.index) >= 4:
             postcode_candidates = self.loader.get_candidates_by_postcode(address.index)
             existing_ids = {id(c) for c in candidates}
@@ -648,14 +812,56 @@ class HybridSearch:
                 if id(pc) not in existing_ids:
                     candidates.append(pc)
                     existing_ids.add(id(pc))
-        
-        # Обмежуємо кількість кандидатів
-        if len(candidates) > config.MAX_CANDIDATES:
-            candidates = candidates[:config.MAX_CANDIDATES]
-        
-        return candidates
     
-    def _calculate_score_strict(self, address: Address, record: MagistralRecord) -> float:
+    def _top_scored_candidates(
+        self,
+        address: Address,
+        candidates: List[MagistralRecord],
+        query: QueryProfile,
+        limit: int,
+    ) -> List[Tuple[MagistralRecord, float]]:
+        """
+        До limit найкращих кандидатів зі score >= SIMILARITY_THRESHOLD
+
+        Кандидати тримаються в обмеженій купі; поки вона заповнена, поріг для
+        решти записів - найгірший score у купі, тож для записів, які не можуть
+        його перевищити, вулиця не рахується. Пакетна оцінка (VECTORIZED_SCORING)
+        рахує всі score одразу і використовує ту саму купу.
+
+        Returns:
+            Пари (кандидат, score) у порядку кандидатів
+        """
+        scores = None
+        if config.VECTORIZED_SCORING and self.vectorized_scorer.available():
+            scores = self.vectorized_scorer.score(query, candidates)
+
+        heap = []
+        for position, candidate in enumerate(candidates):
+            if scores is not None:
+                score = scores[position]
+            else:
+                min_score = heap[0][0] if len(heap) >= limit else config.SIMILARITY_THRESHOLD
+                score = self._calculate_score_strict(address, candidate, query, min_score)
+
+            if score < config.SIMILARITY_THRESHOLD:
+                continue
+            # При рівному score перевагу має раніший кандидат (як у стабільному сортуванні)
+            item = (score, -position, candidate)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+        heap.sort(key=lambda item: -item[1])
+        return [(candidate, score) for score, _, candidate in heap]
+
+    def _calculate_score_strict(
+        self,
+        address: Address,
+        record: MagistralRecord,
+        query: Optional[QueryProfile] = None,
+        min_score: float = 0.0,
+    ) -> float:
         """
         ЖОРСТКИЙ розрахунок score для високої точності
         
@@ -666,17 +872,22 @@ class HybridSearch:
         - Індекс: 5%
         
         З жорсткими фільтрами та штрафами
+
+        query - скомпільований запит; якщо не переданий, будується з address
+        min_score - якщо запис гарантовано не досягне цього score, вулиця не
+        рахується і повертається верхня межа (менша за min_score)
         """
         total_score = 0.0
         
-        # Нормалізуємо запит
-        query_city = self.normalizer.normalize_city(address.city)
-        query_street_options = self.normalizer.normalize_street_aliases(address.street, address.city)
-        query_street = query_street_options[0] if query_street_options else ""
-        query_street_type = self.normalizer.detect_street_type(address.street)
-        query_building = str(address.building or "").strip()
-        query_index = self._normalize_query_index(address.index)
-        query_region = self.normalizer.normalize_region(address.region) if address.region else ""
+        # Нормалізований запит (один раз на пошук, а не на кожного кандидата)
+        query = query or self._compile_query(address)
+        query_city = query.city
+        query_street_options = query.street_options
+        query_street = query.street
+        query_street_type = query.street_type
+        query_building = query.building
+        query_index = query.index
+        query_region = query.region
         
         # ============ 1. МІСТО (35%) - ЖОРСТКИЙ ФІЛЬТР ============
         city_similarity = 0.0
@@ -696,10 +907,8 @@ class HybridSearch:
             
             # БОНУС ДЛЯ ВЕЛИКИХ МІСТ (Столиця + Обласні центри)
             # Якщо запит "Київ"/"Донецьк" і результат "м. Київ"/"м. Донецьк" - даємо бонус
-            major_cities_bonus = ['київ', 'донецьк', 'харків', 'одеса', 'дніпро', 'львів', 'запоріжжя']
-            
-            if query_city in major_cities_bonus or query_city in ['м.' + c for c in major_cities_bonus]:
-                 if record.normalized_city in major_cities_bonus:
+            if query.is_major_city:
+                 if record.normalized_city in self.MAJOR_CITIES_BONUS:
                     # Перевіряємо що це саме місто (зазвичай область співпадає або порожня)
                     # Для Києва область Київ або порожня
                     # Для Донецька область Донецька
@@ -711,7 +920,9 @@ class HybridSearch:
         # ============ ФІЛЬТР РЕГІОНУ (НОВЕ!) ============
         # Якщо область задана, перевіряємо її строго
         if query_region:
-            record_region = self.normalizer.normalize_region(record.region) if record.region else ""
+            record_region = record.normalized_region or (
+                self.normalizer.normalize_region(record.region) if record.region else ""
+            )
             
             if record_region:
                 # Використовуємо token_similarity для регіону
@@ -720,79 +931,85 @@ class HybridSearch:
                     # Регіон НЕ збігся - не повертаємо результат з іншого регіону
                     return 0.0
         
-        # ============ 2. ВУЛИЦЯ (35%) - ЖОРСТКИЙ ФІЛЬТР ============
-        street_similarity = 0.0
-        if query_street and record.normalized_street:
-            # Використовуємо token_similarity для ігнорування порядку слів
-            street_similarity = max(
-                self.similarity.token_similarity(street_option, record.normalized_street)
-                for street_option in query_street_options
-            )
-            record_street_type = self.normalizer.detect_street_type(record.street)
-            if self._is_street_type_conflict(query_street_type, record_street_type, street_similarity):
-                street_similarity = max(0.0, street_similarity - 0.25)
-            
-            # ЖОРСТКИЙ ФІЛЬТР: вулиця має бути досить схожою
-            if street_similarity < config.SCORE_STREET_THRESHOLD:
-                # Якщо вулиця не схожа - великий штраф
-                total_score += street_similarity * 0.10  # Замість 35% тільки 10%
-            else:
-                total_score += street_similarity * config.SCORE_STREET_WEIGHT
-        
         # ============ 3. БУДИНОК (25%) - КРИТИЧНО ВАЖЛИВО! ============
+        # Дешеві компоненти рахуємо до вулиці, а додаємо в score у звичному порядку
         building_bonus = 0.0
+        building_delta = 0.0
         if query_building and record.buildings:
-            # Очищаємо будинок від дефісів та пробілів
-            raw_buildings_list = [b.strip() for b in record.buildings.split(',')]
-            buildings_list = [
-                self._normalize_building_for_match(b)
-                for b in raw_buildings_list
-            ]
-            query_building_clean = self._normalize_building_for_match(query_building)
+            # Будинки запису вже нормалізовані при завантаженні magistral
+            buildings_list, base_buildings = self._record_building_sets(record)
+            query_building_clean = query.building_clean
             
             if query_building_clean in buildings_list:
                 # ТОЧНЕ СПІВПАДІННЯ - повний бонус
                 building_bonus = config.SCORE_BUILDING_EXACT_BONUS
-                total_score += building_bonus
             else:
-                query_building_base = self._building_base(query_building)
-                base_buildings = [self._building_base(b) for b in raw_buildings_list]
+                query_building_base = query.building_base
                 if (
-                    self._has_letter_suffix(query_building)
+                    query.building_has_letter_suffix
                     and query_building_base
                     and query_building_base in base_buildings
                 ):
                     building_bonus = 0.12
-                    total_score += building_bonus
-                    found_partial = True
                 else:
-                    found_partial = False
-
                     # Часткове співпадіння (наприклад, "27" в "27А")
                     for building in buildings_list:
                         if query_building_clean in building or building in query_building_clean:
                             # Часткове співпадіння - зменшений бонус
                             building_bonus = config.SCORE_BUILDING_PARTIAL_BONUS
-                            total_score += building_bonus
-                            found_partial = True
                             break
-                
-                # Якщо будинок взагалі не знайдено - ШТРАФ
-                if not found_partial:
-                    total_score -= config.SCORE_BUILDING_PENALTY  # Штраф
+            
+            # Якщо будинок взагалі не знайдено - ШТРАФ
+            building_delta = building_bonus or -config.SCORE_BUILDING_PENALTY
         
         # ============ 4. ІНДЕКС (5%) ============
-        # ============ 4. ІНДЕКС (5%) ============
+        index_delta = 0.0
         if query_index and record.city_index:
             # Нормалізація індексу (видалення пробілів, нулів на початку)
             q_idx = query_index.replace(" ", "").replace("\x00", "").lstrip('0')
             r_idx = record.city_index.strip().replace(" ", "").replace("\x00", "").lstrip('0')
             
             if q_idx == r_idx:
-                total_score += max(config.SCORE_INDEX_WEIGHT, 0.10)
+                index_delta = max(config.SCORE_INDEX_WEIGHT, 0.10)
             else:
                 # Індекс не співпадає - невеликий штраф
-                total_score -= 0.02
+                index_delta = -0.02
+        
+        # ============ ВЕРХНЯ МЕЖА ДО РОЗРАХУНКУ ВУЛИЦІ ============
+        # Навіть ідеальна вулиця не дасть запису min_score - вулицю не рахуємо
+        if min_score > 0.0:
+            upper_bound = total_score + building_delta + index_delta
+            if query_street and record.normalized_street:
+                upper_bound += max(config.SCORE_STREET_WEIGHT, 0.10)
+                if city_similarity >= 0.95 and building_bonus >= config.SCORE_BUILDING_EXACT_BONUS:
+                    upper_bound += config.SCORE_PERFECT_MATCH_BONUS
+            upper_bound = max(0.0, min(upper_bound, 1.0))
+            if upper_bound < min_score:
+                return upper_bound
+        
+        # ============ 2. ВУЛИЦЯ (35%) - ЖОРСТКИЙ ФІЛЬТР ============
+        street_similarity = 0.0
+        if query_street and record.normalized_street:
+            # Використовуємо token_similarity для ігнорування порядку слів
+            street_similarity = max(
+                self.similarity.token_similarity(street_option, record.normalized_street)
+                for street_option in query_street_options
+            )
+            record_street_type = self.normalizer.detect_street_type(record.street)
+            if self._is_street_type_conflict(query_street_type, record_street_type, street_similarity):
+                street_similarity = max(0.0, street_similarity - 0.25)
+            
+            # ЖОРСТКИЙ ФІЛЬТР: вулиця має бути досить схожою
+            if street_similarity < config.SCORE_STREET_THRESHOLD:
+                # Якщо вулиця не схожа - великий штраф
+                total_score += street_similarity * 0.10  # Замість 35% тільки 10%
+            else:
+                total_score += street_similarity * config.SCORE_STREET_WEIGHT
+        
+        if building_delta:
+            total_score += building_delta
+        if index_delta:
+            total_score += index_delta
         
         # ============ БОНУС ЗА ІДЕАЛЬНЕ СПІВПАДІННЯ ============
         # Якщо все майже ідеально - додатковий бонус
@@ -805,18 +1022,21 @@ class HybridSearch:
 
     @staticmethod
     def _normalize_building_for_match(building: str) -> str:
-        return str(building or "").upper().replace("-", "").replace(" ", "").strip()
+        return TextNormalizer.normalize_building(building)
 
     @staticmethod
     def _building_base(building: str) -> str:
-        cleaned = str(building or "").upper().replace(" ", "").strip()
-        match = re.match(r"^(\d+(?:/\d+)?)(?:-?[A-ZА-ЯІЇЄҐ])?$", cleaned, flags=re.IGNORECASE)
-        return match.group(1) if match else ""
+        return TextNormalizer.building_base(building)
 
     @staticmethod
     def _has_letter_suffix(building: str) -> bool:
-        cleaned = str(building or "").upper().replace(" ", "").strip()
-        return bool(re.match(r"^\d+(?:/\d+)?-?[A-ZА-ЯІЇЄҐ]$", cleaned, flags=re.IGNORECASE))
+        return TextNormalizer.has_building_letter_suffix(building)
+
+    def _record_building_sets(self, record: MagistralRecord):
+        """Будинки запису як множини; записи без передобчислення доповнюються тут"""
+        if record.buildings and not record.normalized_buildings:
+            record.normalized_buildings, record.building_bases = self.normalizer.building_sets(record.buildings)
+        return record.normalized_buildings, record.building_bases
 
     @staticmethod
     def _is_street_type_conflict(query_type: str, record_type: str, street_similarity: float) -> bool:
@@ -838,27 +1058,39 @@ class HybridSearch:
             return ""
         return cleaned.lstrip('0')
     
-    def _confidence_for_result(self, record: MagistralRecord, score: float, address: Address = None) -> int:
+    def _confidence_for_result(
+        self,
+        record: MagistralRecord,
+        score: float,
+        address: Address = None,
+        query: Optional[QueryProfile] = None,
+    ) -> int:
         confidence = int(score * 100)
         if not address or confidence < 100:
             return confidence
 
-        query_street_options = self.normalizer.normalize_street_aliases(address.street, address.city)
+        query = query or self._compile_query(address)
+        query_street_options = query.street_options
         record_street = record.normalized_street or self.normalizer.normalize_street(record.street)
         exact_street = record_street and record_street in query_street_options
 
-        query_building = self._normalize_building_for_match(address.building)
-        raw_buildings_list = [b.strip() for b in str(record.buildings or "").split(",") if b.strip()]
+        query_building = query.building_clean
         exact_building = (
             not query_building
-            or query_building in [self._normalize_building_for_match(b) for b in raw_buildings_list]
+            or query_building in self._record_building_sets(record)[0]
         )
 
         if not exact_street or not exact_building:
             return 99
         return confidence
 
-    def _create_result(self, record: MagistralRecord, score: float, address: Address = None) -> Dict:
+    def _create_result(
+        self,
+        record: MagistralRecord,
+        score: float,
+        address: Address = None,
+        query: Optional[QueryProfile] = None,
+    ) -> Dict:
         """Створює результат з усією інформацією"""
         return {
             'region': record.region,
@@ -871,21 +1103,21 @@ class HybridSearch:
             'buildings': record.buildings,
             'index': record.city_index,
             'score': score,
-            'confidence': self._confidence_for_result(record, score, address),
+            'confidence': self._confidence_for_result(record, score, address, query),
             'features': record.features,
             'not_working': record.not_working,
             'is_working': record.is_working()
         }
 
-    def _get_classifier_results(self, address: Address) -> List[Dict]:
+    def _get_classifier_results(self, address: Address, query: Optional[QueryProfile] = None) -> List[Dict]:
         if not self.classifier:
             return []
+        query = query or self._compile_query(address)
 
         records = []
         seen = set()
 
-        query_index = self._normalize_query_index(address.index)
-        if query_index:
+        if query.index:
             for item in self.classifier.get_addresses_by_postcode(address.index):
                 record = self._record_from_classifier_address(item)
                 self._add_classifier_record(records, seen, record)
@@ -912,14 +1144,14 @@ class HybridSearch:
 
         results = []
         for record in records:
-            score = self._calculate_score_strict(address, record)
-            score = max(score, self._classifier_old_street_score(address, record))
+            score = self._calculate_score_strict(address, record, query)
+            score = max(score, self._classifier_old_street_score(address, record, query))
             if score < config.SIMILARITY_THRESHOLD:
                 continue
-            result = self._create_result(record, score, address)
+            result = self._create_result(record, score, address, query)
             result['source'] = 'ukrposhta_classifier'
             result['source_label'] = 'Класифікатор Укрпошти'
-            old_street = getattr(record, 'classifier_old_street', '')
+            old_street = record.classifier_old_street
             if old_street:
                 result['matched_old_street'] = old_street
                 result['match_reason'] = f"Стара назва: {old_street} → {record.street}"
@@ -963,18 +1195,24 @@ class HybridSearch:
         record.normalized_city = self.normalizer.normalize_city(record.city)
         record.normalized_street = self.normalizer.normalize_street(record.street)
         record.normalized_region = self.normalizer.normalize_region(record.region)
-
-    def _classifier_old_street_score(self, address: Address, record: MagistralRecord) -> float:
-        old_street = getattr(record, 'classifier_old_street', '')
+        record.normalized_buildings, record.building_bases = self.normalizer.building_sets(record.buildings)
+
+    def _classifier_old_street_score(
+        self,
+        address: Address,
+        record: MagistralRecord,
+        query: Optional[QueryProfile] = None,
+    ) -> float:
+        old_street = record.classifier_old_street
         if not old_street or not address.city or not address.street:
             return 0.0
 
-        query_city = self.normalizer.normalize_city(address.city)
-        city_similarity = self.similarity.token_similarity(query_city, record.normalized_city)
+        query = query or self._compile_query(address)
+        city_similarity = self.similarity.token_similarity(query.city, record.normalized_city)
         if city_similarity < 0.95:
             return 0.0
 
-        query_old_street = self.normalizer.normalize_street(address.street)
+        query_old_street = query.street
         old_street_similarity = self.similarity.token_similarity(
             query_old_street,
             self.normalizer.normalize_street(old_street),
@@ -983,13 +1221,8 @@ class HybridSearch:
             return 0.0
 
         if address.building:
-            query_building = self._normalize_building_for_match(address.building)
-            record_buildings = [
-                self._normalize_building_for_match(item)
-                for item in str(record.buildings or "").split(",")
-                if item.strip()
-            ]
-            if query_building not in record_buildings:
+            query_building = query.building_clean
+            if not query_building or query_building not in self._record_building_sets(record)[0]:
                 return 0.0
 
         return 0.99
@@ -1075,5 +1308,6 @@ class HybridSearch:
         return {
             'total_records': len(self.magistral_records),
             'indexed_cities': len(self.loader.index_by_city_prefix),
-            'indexed_regions': len(self.loader.index_by_region)
+            'indexed_regions': len(self.loader.index_by_region),
+            'similarity_cache': self.similarity.cache_info(),
         }
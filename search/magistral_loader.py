@@ -1,17 +1,52 @@
 """
 Завантаження та індексування magistral.csv
 """
+import codecs
 import csv
 import pickle
 import os
 import builtins
+import multiprocessing
 import sys
-from typing import List, Dict
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Optional, Tuple
 from models.magistral_record import MagistralRecord
 from search.normalizer import TextNormalizer
+from search.reference_store import ReferenceStoreError
+from search.region_shards import RegionShards, ShardedIndex, directory_path, write_region_shards
+from search.city_trigram_index import CityTrigramIndex
+from search.street_fuzzy_index import StreetDeletionIndex
+from utils.cache_manifest import stale_reason, write_manifest
 import config
 
 
+# Поле запису -> метод TextNormalizer, що дає значення для нормалізованих полів
+NORMALIZED_FIELDS = {
+    'city': 'normalize_city',
+    'street': 'normalize_street',
+    'region': 'normalize_region',
+    'buildings': 'building_lists',
+}
+
+# TextNormalizer процесу пулу нормалізації
+_chunk_normalizer = None
+
+
+def _normalize_values(normalizer: TextNormalizer, field: str, values: List[str]) -> list:
+    normalize = getattr(normalizer, NORMALIZED_FIELDS[field])
+    return [normalize(value) for value in values]
+
+
+def _normalize_chunk(field: str, values: List[str]) -> list:
+    """Нормалізує шматок значень поля (виконується в процесі пулу)"""
+    global _chunk_normalizer
+    if _chunk_normalizer is None:
+        _chunk_normalizer = TextNormalizer()
+    return _normalize_values(_chunk_normalizer, field, values)
+
+
 def print(*args, **kwargs):
     try:
         builtins.print(*args, **kwargs)
@@ -26,6 +61,16 @@ def print(*args, **kwargs):
 
 class MagistralLoader:
     """Клас для завантаження magistral.csv"""
+
+    # Збільшується при зміні формату записів або індексів у кеші
+    CACHE_VERSION = 7
+    # Індекси, що зберігаються в кеші та бінарному сховищі
+    INDEX_NAMES = (
+        'index_by_city_prefix', 'index_by_region', 'index_by_postcode',
+        'index_by_city', 'index_by_region_city', 'index_by_city_street_token',
+    )
+    # Індекси без області в ключі: каталог шардів зберігає, в яких областях ключ
+    ROUTED_INDEXES = ('index_by_city', 'index_by_postcode')
     
     def __init__(self):
         self.normalizer = TextNormalizer()
@@ -33,6 +78,16 @@ class MagistralLoader:
         self.index_by_city_prefix: Dict[str, List[int]] = {}
         self.index_by_region: Dict[str, List[int]] = {}
         self.index_by_postcode: Dict[str, List[int]] = {}
+        self.index_by_city: Dict[str, List[int]] = {}
+        self.index_by_region_city: Dict[Tuple[str, str], List[int]] = {}
+        # (нормалізоване місто, слово назви вулиці) -> записи
+        self.index_by_city_street_token: Dict[Tuple[str, str], List[int]] = {}
+        # Будується з index_by_city при першому нечіткому пошуку міста
+        self._city_trigram_index = None
+        # Нечіткі індекси вулиць будуються для міста при першому зверненні (LRU)
+        self._street_indexes_by_city: "OrderedDict[str, tuple]" = OrderedDict()
+        # Каталог шардів областей, якщо дані відкрито з бінарного сховища
+        self._shards = None
     
     def load(self, force_reload: bool = False) -> List[MagistralRecord]:
         """
@@ -46,9 +101,18 @@ class MagistralLoader:
         """
         # Шлях до кешу БЕЗ компресії (швидше!)
         cache_path = config.MAGISTRAL_CACHE_PATH
+
+        # Спершу бінарне сховище (mmap), pickle - запасний варіант.
+        # Застарілий кеш (змінився CSV, аліаси чи правила) перебудовується з CSV
+        store_directory = directory_path(config.MAGISTRAL_STORE_DIR)
+        if not force_reload and config.MAGISTRAL_STORE_ENABLED and self._is_cache_fresh(store_directory):
+            try:
+                return self._load_from_store()
+            except ReferenceStoreError as e:
+                print(f"⚠️ Бінарне сховище недоступне: {e}")
         
         # Перевіряємо кеш (якщо НЕ примусове завантаження)
-        if not force_reload and os.path.exists(cache_path):
+        if not force_reload and self._is_cache_fresh(cache_path):
             try:
                 print(f"📦 Завантаження з кешу: {cache_path}")
                 return self._load_from_cache()
@@ -66,126 +130,406 @@ class MagistralLoader:
             except:
                 pass
         
-        # Завантажуємо з CSV
+        # Завантажуємо з CSV (індекси будуються в тому ж проході)
         print("📄 Завантаження magistral.csv...")
         self._load_from_csv()
-        
-        # Будуємо індекси
-        print("🔨 Побудова індексів...")
-        self._build_indexes()
+        self._print_index_stats()
         
         # Зберігаємо в кеш
         print("💾 Збереження в кеш...")
         self._save_to_cache()
+        if config.MAGISTRAL_STORE_ENABLED:
+            self._save_to_store()
         
         print(f"✅ Завантажено {len(self.records)} записів")
         return self.records
 
+    @staticmethod
+    def _cache_sources() -> List[str]:
+        """Файли, від яких залежать записи та індекси кешу"""
+        return [config.MAGISTRAL_CSV_PATH, config.STREET_ALIASES_PATH]
+
+    def _cache_version(self) -> Dict:
+        return {'cache': self.CACHE_VERSION, 'normalizer': TextNormalizer.RULES_VERSION}
+
+    def _is_cache_fresh(self, cache_path: str) -> bool:
+        """
+        Перевірка маніфесту кешу (лише stat джерел)
+
+        Без magistral.csv перебудувати кеш нема з чого - тоді наявний кеш
+        використовується як є.
+        """
+        if not os.path.exists(config.MAGISTRAL_CSV_PATH):
+            return os.path.exists(cache_path)
+
+        reason = stale_reason(cache_path, self._cache_sources(), self._cache_version())
+        if reason and os.path.exists(cache_path):
+            print(f"⚠️ Кеш {os.path.basename(cache_path)} застарів: {reason}")
+        return reason is None
     
+    # Кодування magistral.csv у порядку перевірки
+    CSV_ENCODINGS = ('utf-8', 'cp1251', 'windows-1251', 'iso-8859-1', 'latin1')
+    # Скільки байтів з початку файлу читати для визначення кодування
+    CSV_SAMPLE_BYTES = 1024 * 1024
+
+    # Колонки CSV -> поля MagistralRecord
+    CSV_COLUMNS = (
+        ('region', 'Область'),
+        ('old_district', 'Адміністративний район(старий)'),
+        ('new_district', 'Адміністративний район(новий)'),
+        ('otg', 'Найменування ОТГ(довідково)'),
+        ('city', 'Населений пункт'),
+        ('city_index', 'Індекс НП'),
+        ('street', 'Назва вулиці'),
+        ('buildings', '№ будинку'),
+        ('sort_center_1', 'сортувальний центр 1 рівня'),
+        ('sort_center_2', 'сортувальний центр 2 рівня'),
+        ('delivery_district', 'Адміністративний район доставки(вручення)'),
+        ('tech_index', 'Технологічний індекс ОПЗ доставки(вручення)'),
+        ('features', 'Особливості функціонування ВПЗ'),
+        ('not_working', 'Тимчасово не функціонує'),
+    )
+
+    @classmethod
+    def _detect_encodings(cls, path: str) -> List[str]:
+        """
+        Кодування, якими декодується початок файлу (CSV_SAMPLE_BYTES)
+
+        Returns:
+            Придатні кодування в порядку CSV_ENCODINGS
+        """
+        with open(path, 'rb') as f:
+            sample = f.read(cls.CSV_SAMPLE_BYTES)
+
+        suitable = []
+        for encoding in cls.CSV_ENCODINGS:
+            try:
+                # final=False - багатобайтний символ, обрізаний межею вибірки, не помилка
+                codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            except (UnicodeDecodeError, UnicodeError):
+                continue
+            suitable.append(encoding)
+        return suitable
+
     def _load_from_csv(self):
-        """Завантажує дані з CSV"""
-        self.records = []
-        
-        # Спробуємо різні кодування
-        encodings = ['utf-8', 'cp1251', 'windows-1251', 'iso-8859-1', 'latin1']
-        
-        csv_data = None
-        used_encoding = None
-        
+        """
+        Завантажує дані з CSV потоковим проходом
+
+        Кодування визначається за початком файлу. Поки унікальних значень менше
+        за config.REBUILD_PARALLEL_MIN_VALUES (або пул вимкнено), запис
+        нормалізується та індексується одразу під час читання. Далі решта
+        записів лише читається, їхні нові значення нормалізуються в пулі
+        процесів, і вже тоді записи доповнюються та індексуються.
+        """
+        encodings = self._detect_encodings(config.MAGISTRAL_CSV_PATH)
+
         for encoding in encodings:
             try:
-                with open(config.MAGISTRAL_CSV_PATH, 'r', encoding=encoding) as f:
-                    # Пробуємо прочитати перший рядок
-                    f.readline()
-                    f.seek(0)
-                    
-                    # Якщо успішно - використовуємо це кодування
-                    reader = csv.DictReader(f, delimiter=';')
-                    csv_data = list(reader)
-                    used_encoding = encoding
-                    break
-            except (UnicodeDecodeError, UnicodeError):
+                with open(config.MAGISTRAL_CSV_PATH, 'r', encoding=encoding, newline='') as f:
+                    self._read_csv_rows(csv.reader(f, delimiter=';'))
+            except (UnicodeDecodeError, UnicodeError) as e:
+                # Помилка далі за вибіркою - рідкісний випадок, перечитуємо наступним кодуванням
+                print(f"⚠️ Кодування {encoding} не підійшло: {e}")
                 continue
-        
-        if csv_data is None:
-            raise ValueError("Не вдалося визначити кодування CSV файлу")
-        
-        print(f"✓ Використано кодування: {used_encoding}")
-        
-        # Обробляємо дані
-        for row in csv_data:
-            row = {key.strip().lstrip('\ufeff'): value for key, value in row.items() if key}
-
-            record = MagistralRecord(
-                region=row.get('Область', '').strip(),
-                old_district=row.get('Адміністративний район(старий)', '').strip(),
-                new_district=row.get('Адміністративний район(новий)', '').strip(),
-                otg=row.get('Найменування ОТГ(довідково)', '').strip(),
-                city=row.get('Населений пункт', '').strip(),
-                city_index=row.get('Індекс НП', '').strip(),
-                street=row.get('Назва вулиці', '').strip(),
-                buildings=row.get('№ будинку', '').strip(),
-                sort_center_1=row.get('сортувальний центр 1 рівня', '').strip(),
-                sort_center_2=row.get('сортувальний центр 2 рівня', '').strip(),
-                delivery_district=row.get('Адміністративний район доставки(вручення)', '').strip(),
-                tech_index=row.get('Технологічний індекс ОПЗ доставки(вручення)', '').strip(),
-                features=row.get('Особливості функціонування ВПЗ', '').strip(),
-                not_working=row.get('Тимчасово не функціонує', '').strip()
-            )
-            
-            # Нормалізуємо для пошуку
-            record.normalized_city = self.normalizer.normalize_city(record.city)
-            record.normalized_street = self.normalizer.normalize_street(record.street)
-            record.normalized_region = self.normalizer.normalize_region(record.region)
-            
+            print(f"✓ Використано кодування: {encoding}")
+            return
+
+        self.records = []
+        self._reset_indexes()
+        raise ValueError("Не вдалося визначити кодування CSV файлу")
+
+    def _read_csv_rows(self, reader):
+        """Будує записи та індекси з рядків csv.reader (перший рядок - заголовок)"""
+        self.records = []
+        self._reset_indexes()
+
+        header = next(reader, [])
+        positions = {name.strip().lstrip('\ufeff'): i for i, name in enumerate(header) if name}
+        columns = [(field, positions.get(column)) for field, column in self.CSV_COLUMNS]
+
+        # Область, район, місто, вулиця та набори будинків повторюються тисячі
+        # разів - записи посилаються на один спільний об'єкт, а нормалізація
+        # виконується раз на унікальне значення
+        shared: Dict[str, str] = {}
+        share = shared.setdefault
+        normalized: Dict[str, Dict] = {field: {} for field in NORMALIZED_FIELDS}
+        normalize = {field: getattr(self.normalizer, method) for field, method in NORMALIZED_FIELDS.items()}
+
+        # З якого запису нормалізація відкладається до пулу процесів (None - без пулу)
+        parallel = max(1, config.REBUILD_WORKERS or 1) > 1
+        deferred_from = None
+        unique_count = 0
+
+        for row in reader:
+            if not row:
+                continue
+            size = len(row)
+            values = {}
+            for field, position in columns:
+                text = row[position].strip() if position is not None and position < size else ''
+                values[field] = share(text, text)
+            record = MagistralRecord(**values)
             self.records.append(record)
+
+            if deferred_from is None and parallel and unique_count >= config.REBUILD_PARALLEL_MIN_VALUES:
+                deferred_from = len(self.records) - 1
+            if deferred_from is not None:
+                continue
+
+            for field, by_raw in normalized.items():
+                raw = getattr(record, field)
+                if raw not in by_raw:
+                    self._store_normalized(by_raw, field, raw, normalize[field](raw), share)
+                    unique_count += 1
+            self._apply_normalized(len(self.records) - 1, record, normalized)
+
+        if deferred_from is None:
+            return
+
+        deferred = self.records[deferred_from:]
+        unique = {
+            field: [raw for raw in dict.fromkeys(getattr(record, field) for record in deferred) if raw not in by_raw]
+            for field, by_raw in normalized.items()
+        }
+        for field, results in self._normalize_unique_values(unique).items():
+            for raw, value in zip(unique[field], results):
+                self._store_normalized(normalized[field], field, raw, value, share)
+        for i, record in enumerate(deferred, deferred_from):
+            self._apply_normalized(i, record, normalized)
+
+    @staticmethod
+    def _store_normalized(by_raw: Dict, field: str, raw: str, value, share):
+        """
+        Запам'ятовує нормалізоване значення поля у спільному вигляді
+
+        Однаковий для послідовного й паралельного шляху - кеш виходить
+        побайтово однаковим.
+        """
+        if field == 'buildings':
+            buildings, bases = value
+            by_raw[raw] = (frozenset(share(b, b) for b in buildings), frozenset(share(b, b) for b in bases))
+        else:
+            by_raw[raw] = sys.intern(value)
+
+    def _apply_normalized(self, i: int, record: MagistralRecord, normalized: Dict[str, Dict]):
+        """Заповнює нормалізовані поля запису i і додає його в індекси"""
+        record.normalized_city = normalized['city'][record.city]
+        record.normalized_street = normalized['street'][record.street]
+        record.normalized_region = normalized['region'][record.region]
+        record.normalized_buildings, record.building_bases = normalized['buildings'][record.buildings]
+        self._index_record(i, record)
+
+    def _normalize_unique_values(self, unique: Dict[str, List[str]]) -> Dict[str, list]:
+        """
+        Нормалізує унікальні значення полів (NORMALIZED_FIELDS)
+
+        Великі обсяги діляться на шматки (config.REBUILD_CHUNK_SIZE) і
+        нормалізуються в пулі процесів; результати збираються в порядку
+        значень, тож не залежать від того, який процес що обробив.
+
+        Returns:
+            {поле: результати в порядку unique[поле]}
+        """
+        workers = max(1, config.REBUILD_WORKERS or 1)
+        total = sum(map(len, unique.values()))
+        if workers > 1 and total >= config.REBUILD_PARALLEL_MIN_VALUES:
+            chunk_size = max(1, config.REBUILD_CHUNK_SIZE)
+            try:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                    jobs = [
+                        (field, executor.submit(_normalize_chunk, field, values[start:start + chunk_size]))
+                        for field, values in unique.items()
+                        for start in range(0, len(values), chunk_size)
+                    ]
+                    results = {field: [] for field in unique}
+                    for field, job in jobs:
+                        results[field].extend(job.result())
+                print(f"✓ Нормалізація у {workers} процесах: {total} значень")
+                return results
+            except (OSError, BrokenProcessPool) as e:
+                print(f"⚠️ Пул процесів недоступний, нормалізація послідовно: {e}")
+
+        return {field: _normalize_values(self.normalizer, field, values) for field, values in unique.items()}
     
-    def _build_indexes(self):
-        """Будує індекси для швидкого пошуку"""
+    def _intern_normalized_fields(self):
+        """
+        Інтернує нормалізовані назви після pickle, щоб однакові назви були
+        одним об'єктом і в записах, і в ключах кешу схожості
+        """
+        intern = sys.intern
+        for record in self.records:
+            record.normalized_city = intern(record.normalized_city)
+            record.normalized_street = intern(record.normalized_street)
+            record.normalized_region = intern(record.normalized_region)
+
+    def _reset_indexes(self):
         self.index_by_city_prefix = {}
         self.index_by_region = {}
         self.index_by_postcode = {}
-        
+        self.index_by_city = {}
+        self.index_by_region_city = {}
+        self.index_by_city_street_token = {}
+        self._city_trigram_index = None
+        self._street_indexes_by_city = OrderedDict()
+        self._shards = None
+
+    def _build_indexes(self):
+        """Будує індекси для швидкого пошуку"""
+        self._reset_indexes()
         for i, record in enumerate(self.records):
-            # Індекс по перших 2-3 літерах міста
-            if record.normalized_city and len(record.normalized_city) >= 2:
-                for prefix_len in [2, 3]:
-                    if len(record.normalized_city) >= prefix_len:
-                        prefix = record.normalized_city[:prefix_len]
-                        if prefix not in self.index_by_city_prefix:
-                            self.index_by_city_prefix[prefix] = []
-                        self.index_by_city_prefix[prefix].append(i)
-            
-            # Індекс по області
-            if record.normalized_region:
-                if record.normalized_region not in self.index_by_region:
-                    self.index_by_region[record.normalized_region] = []
-                self.index_by_region[record.normalized_region].append(i)
-
-            postcode = self._normalize_postcode(record.city_index)
-            if postcode:
-                if postcode not in self.index_by_postcode:
-                    self.index_by_postcode[postcode] = []
-                self.index_by_postcode[postcode].append(i)
+            self._index_record(i, record)
+        self._print_index_stats()
+
+    def _index_record(self, i: int, record: MagistralRecord):
+        """Додає запис i до всіх індексів"""
+        # Індекс по перших 2-3 літерах міста
+        if record.normalized_city and len(record.normalized_city) >= 2:
+            for prefix_len in [2, 3]:
+                if len(record.normalized_city) >= prefix_len:
+                    prefix = record.normalized_city[:prefix_len]
+                    if prefix not in self.index_by_city_prefix:
+                        self.index_by_city_prefix[prefix] = []
+                    self.index_by_city_prefix[prefix].append(i)
+
+        # Точний індекс по місту та парі область + місто
+        if record.normalized_city:
+            if record.normalized_city not in self.index_by_city:
+                self.index_by_city[record.normalized_city] = []
+            self.index_by_city[record.normalized_city].append(i)
+
+            region_city = (record.normalized_region, record.normalized_city)
+            if region_city not in self.index_by_region_city:
+                self.index_by_region_city[region_city] = []
+            self.index_by_region_city[region_city].append(i)
         
+        # Індекс по області
+        if record.normalized_region:
+            if record.normalized_region not in self.index_by_region:
+                self.index_by_region[record.normalized_region] = []
+            self.index_by_region[record.normalized_region].append(i)
+
+        postcode = self._normalize_postcode(record.city_index)
+        if postcode:
+            if postcode not in self.index_by_postcode:
+                self.index_by_postcode[postcode] = []
+            self.index_by_postcode[postcode].append(i)
+
+        # Індекс по словах вулиці в межах міста
+        if record.normalized_city and record.normalized_street:
+            for token in set(self.street_tokens(record.normalized_street)):
+                key = (record.normalized_city, token)
+                if key not in self.index_by_city_street_token:
+                    self.index_by_city_street_token[key] = []
+                self.index_by_city_street_token[key].append(i)
+
+    def _print_index_stats(self):
         print(f"✓ Індекс міст: {len(self.index_by_city_prefix)} префіксів")
+        print(f"✓ Індекс населених пунктів: {len(self.index_by_city)} назв")
         print(f"✓ Індекс областей: {len(self.index_by_region)} областей")
         print(f"✓ Індекс поштових індексів: {len(self.index_by_postcode)} індексів")
+        print(f"✓ Індекс вулиць: {len(self.index_by_city_street_token)} пар місто/слово")
     
     def _save_to_cache(self):
         """Зберігає в pickle кеш БЕЗ компресії (швидше!)"""
         cache_path = config.MAGISTRAL_CACHE_PATH
         
         cache_data = {
+            'version': self.CACHE_VERSION,
             'records': self.records,
-            'index_by_city_prefix': self.index_by_city_prefix,
-            'index_by_region': self.index_by_region,
-            'index_by_postcode': self.index_by_postcode
+            **{name: getattr(self, name) for name in self.INDEX_NAMES}
         }
         
         # Зберігаємо БЕЗ компресії - у 4-6 разів швидше!
         with open(cache_path, 'wb') as f:
             pickle.dump(cache_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        write_manifest(cache_path, self._cache_sources(), self._cache_version())
+
+    def _save_to_store(self):
+        """Зберігає записи та індекси в бінарне сховище для mmap (шард на область)"""
+        try:
+            write_region_shards(
+                config.MAGISTRAL_STORE_DIR,
+                self.records,
+                {name: getattr(self, name) for name in self.INDEX_NAMES},
+                self.CACHE_VERSION,
+                self.ROUTED_INDEXES,
+            )
+        except OSError as e:
+            # Напр. у Windows файл відкритий іншою копією програми - лишається pickle
+            print(f"⚠️ Не вдалося зберегти бінарне сховище: {e}")
+            return
+        write_manifest(directory_path(config.MAGISTRAL_STORE_DIR), self._cache_sources(), self._cache_version())
+
+    def _load_from_store(self) -> List[MagistralRecord]:
+        """
+        Відкриває каталог шардів бінарного сховища: записи й індекси області
+        відкриваються через mmap при першому зверненні до неї
+
+        Raises:
+            ReferenceStoreError: сховище відсутнє, пошкоджене або застаріле
+        """
+        print(f"📦 Відкриття бінарного сховища: {config.MAGISTRAL_STORE_DIR}")
+        shards = RegionShards(config.MAGISTRAL_STORE_DIR, self.CACHE_VERSION)
+        missing = [name for name in self.INDEX_NAMES if name not in shards.lengths]
+        missing += [name for name in self.ROUTED_INDEXES if name not in shards.routes]
+        if missing:
+            raise ReferenceStoreError(f"у сховищі немає індексів: {', '.join(missing)}")
+
+        by_region = shards.shards_for_region
+        cities = shards.routes['index_by_city']
+        postcodes = shards.routes['index_by_postcode']
+        prefixes: Optional[Dict[str, tuple]] = None
+
+        def route_prefix(prefix):
+            # Префікси (як в _index_record) рахуються з маршрутів міст при першому зверненні.
+            # Словник збирається окремо і присвоюється цілим: паралельний потік прогріву
+            # бачить або None (і порахує сам), або готові маршрути, а не частину їх
+            nonlocal prefixes
+            routes = prefixes
+            if routes is None:
+                found: Dict[str, set] = {}
+                for city, city_shards in cities.items():
+                    for prefix_len in (2, 3):
+                        if len(city) >= prefix_len:
+                            found.setdefault(city[:prefix_len], set()).update(city_shards)
+                routes = prefixes = {key: tuple(sorted(value)) for key, value in found.items()}
+            return routes.get(prefix, ())
+
+        def first_part(route):
+            return lambda key: route(key[0]) if isinstance(key, tuple) and key else ()
+
+        self.records = shards.records
+        self.index_by_city_prefix = ShardedIndex(shards, 'index_by_city_prefix', route_prefix)
+        self.index_by_region = ShardedIndex(shards, 'index_by_region', by_region)
+        self.index_by_postcode = ShardedIndex(shards, 'index_by_postcode', lambda key: postcodes.get(key, ()))
+        self.index_by_city = ShardedIndex(shards, 'index_by_city', lambda key: cities.get(key, ()), keys=cities.keys)
+        self.index_by_region_city = ShardedIndex(shards, 'index_by_region_city', first_part(by_region))
+        self.index_by_city_street_token = ShardedIndex(
+            shards, 'index_by_city_street_token', first_part(lambda city: cities.get(city, ())),
+        )
+        self._city_trigram_index = None
+        self._street_indexes_by_city = OrderedDict()
+        self._shards = shards
+
+        print(f"✅ Відкрито сховище: {len(self.records)} записів, областей: {len(shards.regions)}")
+        return self.records
+
+    def load_regions(self, regions) -> int:
+        """
+        Наперед відкриває шарди областей (напр. з колонки області Excel файлу)
+
+        Без сховища (дані з pickle чи CSV) усе вже в пам'яті - нічого не робить.
+
+        Args:
+            regions: Назви областей як у файлі
+
+        Returns:
+            Кількість відкритих областей
+        """
+        if self._shards is None:
+            return 0
+        normalized = [self.normalizer.normalize_region(region) for region in regions if region]
+        return self._shards.load_regions(normalized)
     
     def _load_from_cache(self) -> List[MagistralRecord]:
         """Завантажує з pickle кешу БЕЗ компресії (швидше!)"""
@@ -195,12 +539,22 @@ class MagistralLoader:
             # Завантажуємо БЕЗ компресії - у 4-6 разів швидше!
             with open(cache_path, 'rb') as f:
                 cache_data = pickle.load(f)
+
+            if cache_data.get('version') != self.CACHE_VERSION:
+                raise ValueError(f"застаріла версія кешу: {cache_data.get('version')}")
             
             self.records = cache_data['records']
             self.index_by_city_prefix = cache_data['index_by_city_prefix']
             self.index_by_region = cache_data['index_by_region']
             self.index_by_postcode = cache_data.get('index_by_postcode', {})
-            if not self.index_by_postcode:
+            self.index_by_city = cache_data.get('index_by_city', {})
+            self.index_by_region_city = cache_data.get('index_by_region_city', {})
+            self.index_by_city_street_token = cache_data.get('index_by_city_street_token', {})
+            self._intern_normalized_fields()
+            self._city_trigram_index = None
+            self._street_indexes_by_city = OrderedDict()
+            self._shards = None
+            if not self.index_by_postcode or not self.index_by_city or not self.index_by_city_street_token:
                 self._build_indexes()
             
             print(f"✅ Завантажено з кешу: {len(self.records)} записів")
@@ -230,6 +584,107 @@ class MagistralLoader:
         indices = self.index_by_city_prefix[prefix]
         return [self.records[i] for i in indices]
     
+    def get_candidates_by_city(self, city: str, region: str = None) -> List[MagistralRecord]:
+        """Точний пошук по нормалізованій назві міста (і області, якщо задана)"""
+        if not city:
+            return []
+
+        norm_region = self.normalizer.normalize_region(region) if region else ""
+        return self.get_candidates_by_normalized_city(self.normalizer.normalize_city(city), norm_region)
+
+    def get_candidates_by_normalized_city(self, normalized_city: str, normalized_region: str = "") -> List[MagistralRecord]:
+        """Те саме що get_candidates_by_city, але для вже нормалізованих значень"""
+        if not normalized_city:
+            return []
+
+        if normalized_region:
+            indices = self.index_by_region_city.get((normalized_region, normalized_city), [])
+        else:
+            indices = self.index_by_city.get(normalized_city, [])
+        return [self.records[i] for i in indices]
+
+    def has_city(self, normalized_city: str) -> bool:
+        """Чи є в довіднику місто з такою нормалізованою назвою"""
+        return bool(normalized_city) and normalized_city in self.index_by_city
+
+    def find_similar_cities(self, normalized_city: str, limit: int = 5, min_similarity: float = 0.0) -> List[str]:
+        """Нормалізовані назви міст, найбільш схожі на (можливо з помилкою) назву запиту"""
+        if not normalized_city:
+            return []
+
+        if self._city_trigram_index is None:
+            self._city_trigram_index = CityTrigramIndex(self.index_by_city.keys())
+
+        return [
+            name for name, _ in
+            self._city_trigram_index.find(normalized_city, limit=limit, min_similarity=min_similarity)
+        ]
+
+    def _get_street_index(self, normalized_city: str):
+        """(StreetDeletionIndex, вулиця -> записи) для міста; будується ліниво"""
+        cached = self._street_indexes_by_city.get(normalized_city)
+        if cached is not None:
+            self._street_indexes_by_city.move_to_end(normalized_city)
+            return cached
+
+        ids_by_street: Dict[str, List[int]] = {}
+        for i in self.index_by_city.get(normalized_city, []):
+            street = self.records[i].normalized_street
+            if street:
+                if street not in ids_by_street:
+                    ids_by_street[street] = []
+                ids_by_street[street].append(i)
+
+        cached = (StreetDeletionIndex(ids_by_street.keys(), max_distance=config.FUZZY_STREET_MAX_DISTANCE), ids_by_street)
+        self._street_indexes_by_city[normalized_city] = cached
+        if len(self._street_indexes_by_city) > config.FUZZY_STREET_CITY_CACHE_SIZE:
+            self._street_indexes_by_city.popitem(last=False)
+        return cached
+
+    def find_similar_streets(self, normalized_city: str, normalized_street: str, max_distance: int = None) -> List[str]:
+        """Нормалізовані вулиці міста на обмеженій відстані редагування від запиту"""
+        if not normalized_city or not normalized_street or normalized_city not in self.index_by_city:
+            return []
+
+        street_index, _ = self._get_street_index(normalized_city)
+        return [street for street, _ in street_index.lookup(normalized_street, max_distance)]
+
+    def get_candidates_by_similar_streets(self, normalized_city: str, normalized_streets: List[str]) -> List[MagistralRecord]:
+        """Записи міста на вулицях, назви яких відрізняються від запиту кількома літерами"""
+        if not normalized_city or not normalized_streets or normalized_city not in self.index_by_city:
+            return []
+
+        street_index, ids_by_street = self._get_street_index(normalized_city)
+        indices = set()
+        for street in normalized_streets:
+            for similar_street, _ in street_index.lookup(street):
+                indices.update(ids_by_street[similar_street])
+
+        return [self.records[i] for i in sorted(indices)]
+
+    @staticmethod
+    def street_tokens(normalized_street: str) -> List[str]:
+        """Слова нормалізованої назви вулиці (як у SimilarityCalculator.token_similarity)"""
+        return [token for token in normalized_street.split() if len(token) > 1]
+
+    def get_candidates_by_street_tokens(self, normalized_city: str, normalized_streets: List[str]) -> List[MagistralRecord]:
+        """
+        Записи міста, назви вулиць яких мають спільні слова із запитом
+        
+        Args:
+            normalized_city: Нормалізоване місто запиту
+            normalized_streets: Нормалізовані варіанти вулиці запиту
+        """
+        if not normalized_city or not normalized_streets:
+            return []
+
+        indices = set()
+        for street in normalized_streets:
+            for token in self.street_tokens(street):
+                indices.update(self.index_by_city_street_token.get((normalized_city, token), ()))
+
+        return [self.records[i] for i in sorted(indices)]
+    
     def get_candidates_by_region(self, region: str) -> List[MagistralRecord]:
         """Швидкий пошук по області"""
         if not region:
@@ -268,25 +723,14 @@ class MagistralLoader:
         if not city:
             return ""
             
-        candidates = self.get_candidates_by_city_prefix(city)
+        # Записи саме цього міста (і області, якщо задана)
+        candidates = self.get_candidates_by_city(city, region)
         if not candidates:
             return ""
-            
-        # Нормалізуємо для порівняння
-        norm_city = self.normalizer.normalize_city(city)
-        norm_region = self.normalizer.normalize_region(region) if region else None
         
         valid_indices = []
         
         for record in candidates:
-            # Перевіряємо місто
-            if record.normalized_city != norm_city:
-                continue
-                
-            # Перевіряємо область якщо задана
-            if norm_region and record.normalized_region != norm_region:
-                continue
-                
             # Перевіряємо район якщо заданий (нестрого, бо райони мінялись)
             if district:
                 # Тут можна додати логіку перевірки району, але поки пропускаємо
@@ -7,8 +7,15 @@ import re
 import config
 
 
+BUILDING_BASE_RE = re.compile(r"^(\d+(?:/\d+)?)(?:-?[A-ZА-ЯІЇЄҐ])?$", flags=re.IGNORECASE)
+BUILDING_LETTER_SUFFIX_RE = re.compile(r"^\d+(?:/\d+)?-?[A-ZА-ЯІЇЄҐ]$", flags=re.IGNORECASE)
+
+
 class TextNormalizer:
     """Клас для нормалізації тексту"""
+
+    # Збільшується при зміні правил нормалізації - кеші з нормалізованими полями перебудовуються
+    RULES_VERSION = 1
     
     def __init__(self):
         # Транслітерація російська → українська
@@ -212,6 +219,48 @@ class TextNormalizer:
 
         return ""
     
+    @staticmethod
+    def normalize_building(building: str) -> str:
+        """Нормалізує номер будинку для точного порівняння ("27-а" -> "27А")"""
+        return str(building or "").upper().replace("-", "").replace(" ", "").strip()
+
+    @staticmethod
+    def building_base(building: str) -> str:
+        """Номер будинку без літери ("27-А" -> "27"), або "" якщо це не простий номер"""
+        cleaned = str(building or "").upper().replace(" ", "").strip()
+        match = BUILDING_BASE_RE.match(cleaned)
+        return match.group(1) if match else ""
+
+    @staticmethod
+    def has_building_letter_suffix(building: str) -> bool:
+        cleaned = str(building or "").upper().replace(" ", "").strip()
+        return bool(BUILDING_LETTER_SUFFIX_RE.match(cleaned))
+
+    @classmethod
+    def building_lists(cls, buildings: str) -> tuple[tuple, tuple]:
+        """
+        Те саме, що building_sets, але кортежі в порядку списку будинків
+        (результат нормалізації в пулі процесів збирається у множини в основному процесі)
+        """
+        if not buildings:
+            return (), ()
+
+        raw_buildings = [b.strip() for b in str(buildings).split(',')]
+        normalized = tuple(cls.normalize_building(b) for b in raw_buildings)
+        bases = tuple(base for base in map(cls.building_base, raw_buildings) if base)
+        return normalized, bases
+
+    @classmethod
+    def building_sets(cls, buildings: str) -> tuple[frozenset, frozenset]:
+        """
+        Розбирає список будинків через кому
+        
+        Returns:
+            (нормалізовані будинки, номери без літер)
+        """
+        normalized, bases = cls.building_lists(buildings)
+        return frozenset(normalized), frozenset(bases)
+    
     def normalize_region(self, region: str) -> str:
         """Нормалізує назву області"""
         if not region:
@@ -0,0 +1,152 @@
+"""
+Паралельний пошук адрес у пулі процесів (config.MAX_WORKERS)
+
+Кожен процес тримає власний HybridSearch і відкриває бінарне сховище magistral
+(mmap - сторінки файлу спільні між процесами). Процеси завжди стартують через
+spawn: fork з Qt-програми, де працюють інші потоки (обробка, автозбереження,
+очищення кешу), може успадкувати захоплене блокування й зависнути.
+"""
+import copy
+import logging
+import multiprocessing
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import config
+from models.address import Address
+from search.hybrid_search import HybridSearch
+from utils.logger import Logger
+
+
+# HybridSearch процесу-воркера
+_worker_search: Optional[HybridSearch] = None
+
+
+def _init_worker(search_factory: Optional[Callable[[], HybridSearch]]):
+    """Ініціалізація процесу пулу: тихий лог і завантажений пошук"""
+    global _worker_search
+    # Детальний лог кожного рядка з кількох процесів лише заважає
+    logging.getLogger("AddressMatcher").setLevel(logging.WARNING)
+    _worker_search = search_factory() if search_factory else HybridSearch(lazy_load=False)
+
+
+def _search_chunk(start: int, addresses: List[Address], max_results: Optional[int]) -> Tuple[int, List[Dict]]:
+    """Шукає шматок рядків; помилка одного рядка не зриває весь шматок"""
+    # search_many нормалізує адреси на місці - повтор іде по копіях вихідних
+    originals = [copy.copy(address) for address in addresses]
+    try:
+        return start, _worker_search.search_many(addresses, max_results)
+    except Exception as e:
+        logger = Logger()
+        logger.error(f"Помилка пакетного пошуку рядків {start}-{start + len(addresses) - 1}: {e}")
+        logger.error(traceback.format_exc())
+
+    results = []
+    for address in originals:
+        try:
+            results.append(_worker_search.search_with_confidence(address, max_results))
+        except Exception as e:
+            results.append({'error': str(e)})
+    return start, results
+
+
+class ParallelSearchEngine:
+    """Пул процесів для пакетного search_with_confidence зі збереженням порядку рядків"""
+
+    def __init__(
+        self,
+        search_factory: Optional[Callable[[], HybridSearch]] = None,
+        max_workers: int = None,
+        chunk_size: int = None,
+    ):
+        """
+        Args:
+            search_factory: Створює пошук у процесі пулу (функція чи клас рівня
+                модуля - передається через pickle); None - HybridSearch(lazy_load=False)
+            max_workers: Кількість процесів (None - config.MAX_WORKERS)
+            chunk_size: Рядків на одне завдання (None - config.PARALLEL_CHUNK_SIZE)
+        """
+        self.search_factory = search_factory
+        self.max_workers = max(1, max_workers or config.MAX_WORKERS)
+        self.chunk_size = max(1, chunk_size or config.PARALLEL_CHUNK_SIZE)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.search_factory,),
+            )
+        return self._executor
+
+    def search_many(
+        self,
+        addresses: Sequence[Address],
+        max_results: int = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        poll_interval: float = 0.1,
+    ) -> Iterator[Tuple[int, Dict]]:
+        """
+        Результати search_with_confidence у порядку addresses
+
+        Рядок з помилкою повертається як {'error': текст}. Поки наступний по
+        порядку шматок не готовий, кожні poll_interval секунд викликається
+        on_progress(готово_рядків, всього) - у ньому можна обробити події UI.
+        Якщо should_stop() повертає True (або викликач перериває ітерацію),
+        завдання, що ще не почались, скасовуються.
+
+        Yields:
+            (позиція в addresses, результат)
+        """
+        total = len(addresses)
+        if total == 0:
+            return
+
+        executor = self._get_executor()
+        chunks = deque(range(0, total, self.chunk_size))
+        in_flight = deque()
+        max_in_flight = self.max_workers * 2
+        done_rows = 0
+
+        def submit_more():
+            while chunks and len(in_flight) < max_in_flight:
+                start = chunks.popleft()
+                chunk = list(addresses[start:start + self.chunk_size])
+                in_flight.append((executor.submit(_search_chunk, start, chunk, max_results), len(chunk)))
+
+        def completed_rows() -> int:
+            return done_rows + sum(size for future, size in in_flight if future.done())
+
+        try:
+            submit_more()
+            while in_flight:
+                future, size = in_flight[0]
+                while not future.done():
+                    if should_stop and should_stop():
+                        return
+                    if on_progress:
+                        on_progress(completed_rows(), total)
+                    wait([item[0] for item in in_flight], timeout=poll_interval, return_when=FIRST_COMPLETED)
+
+                in_flight.popleft()
+                start, results = future.result()
+                submit_more()
+                for offset, result in enumerate(results):
+                    yield start + offset, result
+                done_rows += size
+                if on_progress:
+                    on_progress(completed_rows(), total)
+        finally:
+            for future, _ in in_flight:
+                future.cancel()
+
+    def close(self):
+        """Зупиняє процеси пулу (наступний пошук створить новий пул)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,26 @@
+"""
+Скомпільований запит пошуку
+"""
+from dataclasses import dataclass, field
+from typing import List
+
+
+@dataclass
+class QueryProfile:
+    """Нормалізовані поля запиту, обчислені один раз на пошук"""
+
+    city: str = ""                              # normalize_city(address.city)
+    street_options: List[str] = field(default_factory=list)  # Вулиця + аліаси перейменувань
+    street_type: str = ""                       # detect_street_type(address.street)
+    building: str = ""                          # Будинок як введено (strip)
+    building_clean: str = ""                    # Будинок для точного порівняння
+    building_base: str = ""                     # Номер без літери ("27А" -> "27")
+    building_has_letter_suffix: bool = False
+    index: str = ""                             # Індекс без провідних нулів
+    region: str = ""                            # normalize_region(address.region)
+    is_major_city: bool = False
+
+    @property
+    def street(self) -> str:
+        """Основний нормалізований варіант вулиці"""
+        return self.street_options[0] if self.street_options else ""
@@ -0,0 +1,355 @@
+"""
+Бінарне сховище довідника magistral для відкриття через mmap
+
+Формат файлу:
+    MAGIC, довжина заголовка (uint32), заголовок JSON, вирівняні секції.
+
+Секції - масиви uint32 (крім UTF-8 блоку рядків):
+    - таблиця рядків: зсуви + блок UTF-8, кожен унікальний рядок один раз;
+    - колонки записів: номер рядка в таблиці для кожного поля запису;
+    - таблиця наборів будинків: зсуви + номери рядків (CSR);
+    - індекси (місто, область, індекс...): колонки ключів, зсуви, номери записів (CSR).
+
+Файл відкривається через mmap: старт майже миттєвий, сторінки спільні для
+процесів пулу й кількох копій програми, а записи MagistralRecord
+створюються лише при першому зверненні.
+"""
+import json
+import mmap
+import os
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+
+from models.magistral_record import MagistralRecord
+
+MAGIC = b"PIMREF\x00\x01"
+FORMAT_VERSION = 1
+_ALIGN = 8
+
+# Рядкові поля запису в порядку конструктора MagistralRecord
+RECORD_FIELDS = (
+    'region', 'old_district', 'new_district', 'otg', 'city', 'city_index',
+    'street', 'buildings', 'sort_center_1', 'sort_center_2', 'delivery_district',
+    'tech_index', 'features', 'not_working',
+    'normalized_city', 'normalized_street', 'normalized_region',
+)
+SET_FIELDS = ('normalized_buildings', 'building_bases')
+
+
+class ReferenceStoreError(ValueError):
+    """Сховище відсутнє, пошкоджене або іншої версії"""
+
+
+class _Writer:
+    """Послідовний запис секцій з вирівнюванням"""
+
+    def __init__(self):
+        self.sections: Dict[str, Tuple[int, int, str]] = {}
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, name: str, data: array):
+        padding = -self.size % _ALIGN
+        if padding:
+            self.chunks.append(b"\x00" * padding)
+            self.size += padding
+        raw = data.tobytes()
+        self.sections[name] = (self.size, len(data), data.typecode)
+        self.chunks.append(raw)
+        self.size += len(raw)
+
+
+def write_reference_store(
+    path: str,
+    records: List[MagistralRecord],
+    indexes: Dict[str, Dict],
+    cache_version: int,
+):
+    """
+    Записує записи та індекси у файл сховища (tmp + атомарна заміна)
+
+    Args:
+        path: Шлях до файлу сховища
+        records: Записи magistral
+        indexes: {назва: {ключ (рядок або кортеж рядків): [номери записів]}}
+        cache_version: MagistralLoader.CACHE_VERSION
+    """
+    string_ids: Dict[str, int] = {}
+    set_ids: Dict[frozenset, int] = {}
+    set_offsets = array('I', [0])
+    set_members = array('I')
+
+    def string_id(text: str) -> int:
+        sid = string_ids.get(text)
+        if sid is None:
+            sid = string_ids[text] = len(string_ids)
+        return sid
+
+    def set_id(values: frozenset) -> int:
+        sid = set_ids.get(values)
+        if sid is None:
+            sid = set_ids[values] = len(set_ids)
+            set_members.extend(string_id(value) for value in sorted(values))
+            set_offsets.append(len(set_members))
+        return sid
+
+    writer = _Writer()
+    for field in RECORD_FIELDS:
+        writer.add(f"field:{field}", array('I', (string_id(getattr(r, field)) for r in records)))
+    for field in SET_FIELDS:
+        writer.add(f"field:{field}", array('I', (set_id(getattr(r, field)) for r in records)))
+    writer.add("sets:offsets", set_offsets)
+    writer.add("sets:members", set_members)
+
+    index_arity = {}
+    for name, index in indexes.items():
+        keys = sorted(index)
+        arity = len(keys[0]) if keys and isinstance(keys[0], tuple) else 1
+        index_arity[name] = arity
+        for part in range(arity):
+            writer.add(
+                f"index:{name}:key{part}",
+                array('I', (string_id(key[part] if arity > 1 else key) for key in keys)),
+            )
+        offsets = array('I', [0])
+        values = array('I')
+        for key in keys:
+            values.extend(index[key])
+            offsets.append(len(values))
+        writer.add(f"index:{name}:offsets", offsets)
+        writer.add(f"index:{name}:values", values)
+
+    blob = bytearray()
+    string_offsets = array('I', [0])
+    for text in string_ids:  # Словник зберігає порядок додавання = номер рядка
+        blob += text.encode('utf-8')
+        string_offsets.append(len(blob))
+    writer.add("strings:offsets", string_offsets)
+    writer.add("strings:blob", array('B', bytes(blob)))
+
+    header = json.dumps({
+        'format': FORMAT_VERSION,
+        'cache_version': cache_version,
+        'byteorder': sys.byteorder,
+        'itemsize': array('I').itemsize,
+        'count': len(records),
+        'indexes': index_arity,
+        'sections': writer.sections,
+    }).encode('utf-8')
+
+    prefix = MAGIC + len(header).to_bytes(4, 'little') + header
+    prefix += b"\x00" * (-len(prefix) % _ALIGN)
+
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(prefix)
+            for chunk in writer.chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class MappedRecords(Sequence):
+    """Записи сховища; MagistralRecord створюється при першому зверненні й кешується"""
+
+    def __init__(self, store: "ReferenceStore"):
+        self._store = store
+        self._columns = [store.section(f"field:{field}") for field in RECORD_FIELDS]
+        self._set_columns = [store.section(f"field:{field}") for field in SET_FIELDS]
+        self._records: List[Optional[MagistralRecord]] = [None] * store.count
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self._records)))]
+
+        record = self._records[position]
+        if record is None:
+            i = position + len(self._records) if position < 0 else position
+            strings = self._store.strings
+            frozen_set = self._store.frozen_set
+            buildings, bases = self._set_columns
+            record = MagistralRecord(*[strings[column[i]] for column in self._columns])
+            record.normalized_buildings = frozen_set(buildings[i])
+            record.building_bases = frozen_set(bases[i])
+            self._records[i] = record
+        return record
+
+    def __iter__(self):
+        for i in range(len(self._records)):
+            yield self[i]
+
+
+class MappedIndex(Mapping):
+    """
+    Індекс {ключ: [номери записів]} поверх CSR-секцій сховища
+
+    Ключі записані відсортованими, тож ключі з однаковою першою частиною
+    (напр. місто в парі місто/слово вулиці) лежать підряд. Пошук спершу
+    знаходить діапазон першої частини, а словник решти ключа будується
+    лише для діапазонів, до яких звертались.
+    """
+
+    def __init__(self, store: "ReferenceStore", name: str, arity: int):
+        self._store = store
+        self._key_columns = [store.section(f"index:{name}:key{part}") for part in range(arity)]
+        self._offsets = store.section(f"index:{name}:offsets")
+        self._values = store.section(f"index:{name}:values")
+        self._ranges: Optional[Dict[str, Tuple[int, int]]] = None
+        self._groups: Dict[str, Dict[tuple, int]] = {}
+
+    def _key(self, position: int):
+        strings = self._store.strings
+        if len(self._key_columns) == 1:
+            return strings[self._key_columns[0][position]]
+        return tuple(strings[column[position]] for column in self._key_columns)
+
+    def _first_ranges(self) -> Dict[str, Tuple[int, int]]:
+        """Перша частина ключа -> діапазон позицій"""
+        if self._ranges is None:
+            strings = self._store.strings
+            ranges = {}
+            start = 0
+            for sid, run in groupby(self._key_columns[0]):
+                end = start + sum(1 for _ in run)
+                ranges[strings[sid]] = (start, end)
+                start = end
+            self._ranges = ranges
+        return self._ranges
+
+    def _position(self, key) -> Optional[int]:
+        if len(self._key_columns) == 1:
+            found = self._first_ranges().get(key)
+            return found[0] if found else None
+
+        if not isinstance(key, tuple) or len(key) != len(self._key_columns):
+            return None
+        group = self._groups.get(key[0])
+        if group is None:
+            found = self._first_ranges().get(key[0])
+            if found is None:
+                return None
+            group = self._groups[key[0]] = {self._key(position)[1:]: position for position in range(*found)}
+        return group.get(key[1:])
+
+    def __getitem__(self, key) -> List[int]:
+        position = self._position(key)
+        if position is None:
+            raise KeyError(key)
+        return self._values[self._offsets[position]:self._offsets[position + 1]].tolist()
+
+    def __contains__(self, key) -> bool:
+        return self._position(key) is not None
+
+    def __iter__(self):
+        return (self._key(position) for position in range(len(self)))
+
+    def __len__(self) -> int:
+        return len(self._key_columns[0])
+
+
+class ReferenceStore:
+    """Відкрите через mmap сховище довідника"""
+
+    def __init__(self, path: str, cache_version: int):
+        """
+        Args:
+            path: Файл сховища
+            cache_version: Очікувана MagistralLoader.CACHE_VERSION
+
+        Raises:
+            ReferenceStoreError: файл не підходить - викликач читає pickle або CSV
+        """
+        try:
+            with open(path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise ReferenceStoreError(f"не вдалося відкрити сховище: {e}") from e
+
+        buffer = memoryview(self._mmap)
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ReferenceStoreError("невідомий формат сховища")
+        header_start = len(MAGIC) + 4
+        header_len = int.from_bytes(buffer[len(MAGIC):header_start], 'little')
+        try:
+            header = json.loads(bytes(buffer[header_start:header_start + header_len]))
+        except ValueError as e:
+            raise ReferenceStoreError(f"пошкоджений заголовок сховища: {e}") from e
+
+        if header.get('format') != FORMAT_VERSION or header.get('cache_version') != cache_version:
+            raise ReferenceStoreError(f"застаріла версія сховища: {header.get('cache_version')}")
+        if header.get('byteorder') != sys.byteorder or header.get('itemsize') != array('I').itemsize:
+            raise ReferenceStoreError("сховище створене на іншій платформі")
+
+        data_start = header_start + header_len
+        self._data = buffer[data_start + (-data_start % _ALIGN):]
+        self._sections = header['sections']
+        self.count = header['count']
+
+        string_offsets = self.section("strings:offsets")
+        end = string_offsets[len(string_offsets) - 1] if len(string_offsets) else 0
+        if len(self.section("strings:blob")) != end:
+            raise ReferenceStoreError("сховище обрізане")
+
+        self._string_offsets = string_offsets
+        self._blob = self.section("strings:blob")
+        self._strings: Optional[List[str]] = None
+        self._set_offsets = self.section("sets:offsets")
+        self._set_members = self.section("sets:members")
+        self._sets: List[Optional[frozenset]] = [None] * (len(self._set_offsets) - 1)
+
+        self.records = MappedRecords(self)
+        self.indexes = {
+            name: MappedIndex(self, name, arity)
+            for name, arity in header['indexes'].items()
+        }
+
+    def section(self, name: str) -> memoryview:
+        try:
+            offset, length, typecode = self._sections[name]
+        except KeyError:
+            raise ReferenceStoreError(f"у сховищі немає секції {name}") from None
+        itemsize = array(typecode).itemsize
+        view = self._data[offset:offset + length * itemsize]
+        if len(view) != length * itemsize:
+            raise ReferenceStoreError("сховище обрізане")
+        return view.cast(typecode)
+
+    @property
+    def strings(self) -> List[str]:
+        """
+        Таблиця рядків; декодується цілком при першому зверненні (унікальних
+        рядків на порядок менше, ніж записів). Рядки інтерновані, як ключі
+        кешу схожості, тож однакові значення - один об'єкт
+        """
+        if self._strings is None:
+            offsets = self._string_offsets.tolist()
+            blob = self._blob
+            intern = sys.intern
+            self._strings = [intern(str(blob[start:end], 'utf-8')) for start, end in zip(offsets, offsets[1:])]
+        return self._strings
+
+    def warm_up(self):
+        """Декодує таблицю рядків і діапазони ключів індексів наперед"""
+        self.strings
+        for index in self.indexes.values():
+            index._first_ranges()
+
+    def frozen_set(self, sid: int) -> frozenset:
+        values = self._sets[sid]
+        if values is None:
+            members = self._set_members[self._set_offsets[sid]:self._set_offsets[sid + 1]]
+            values = self._sets[sid] = frozenset(map(self.strings.__getitem__, members))
+        return values
+
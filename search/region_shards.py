@@ -0,0 +1,296 @@
+"""
+Шардоване за областями сховище довідника magistral
+
+Записи кожної області (нормалізована назва) лежать в окремому файлі
+ReferenceStore. Індекси шарда містять глобальні номери записів (порядок
+CSV), тому результати кількох шардів зливаються в той самий список, що
+дав би повний індекс.
+
+Поруч лежить невеликий каталог (directory.pkl), що читається при старті:
+області та файли шардів, діапазони номерів записів, маршрути ключів
+(місто, поштовий індекс -> шарди) і розміри індексів. Шард відкривається
+при першому зверненні до його області.
+"""
+import heapq
+import os
+import pickle
+import threading
+import time
+from bisect import bisect_right
+from collections.abc import Mapping, Sequence
+from typing import Callable, Dict, Iterable, List, Optional, Sequence as SequenceType
+
+from models.magistral_record import MagistralRecord
+from search.reference_store import ReferenceStore, ReferenceStoreError, write_reference_store
+
+DIRECTORY_NAME = 'directory.pkl'
+FORMAT_VERSION = 1
+SHARD_SUFFIX = '.bin'
+
+
+def directory_path(store_dir: str) -> str:
+    """Файл каталогу шардів (на нього пишеться маніфест кешу)"""
+    return os.path.join(store_dir, DIRECTORY_NAME)
+
+
+def write_region_shards(
+    store_dir: str,
+    records: List[MagistralRecord],
+    indexes: Dict[str, Dict],
+    cache_version: int,
+    routed: Iterable[str] = (),
+):
+    """
+    Записує шарди областей і каталог
+
+    Файли шардів мають мітку покоління в назві: процес, що відкрив
+    попередній каталог, не прочитає шард нового. Каталог пишеться останнім
+    (tmp + атомарна заміна), після чого файли попереднього покоління
+    видаляються, якщо їх ніхто не тримає.
+
+    Args:
+        store_dir: Каталог сховища
+        records: Записи magistral
+        indexes: {назва: {ключ: [номери записів за зростанням]}}
+        cache_version: MagistralLoader.CACHE_VERSION
+        routed: Індекси, для ключів яких каталог зберігає номери шардів
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    shard_by_region: Dict[str, int] = {}
+    shard_records: List[List[MagistralRecord]] = []
+    shard_of: List[int] = []
+    run_starts, run_shards, run_locals = [], [], []
+    for i, record in enumerate(records):
+        shard = shard_by_region.get(record.normalized_region)
+        if shard is None:
+            shard = shard_by_region[record.normalized_region] = len(shard_records)
+            shard_records.append([])
+        if not run_shards or run_shards[-1] != shard:
+            run_starts.append(i)
+            run_shards.append(shard)
+            run_locals.append(len(shard_records[shard]))
+        shard_of.append(shard)
+        shard_records[shard].append(record)
+
+    # Індекси по шардах; ключ, записи якого в кількох областях, є в кожній з них
+    shard_indexes: List[Dict[str, Dict]] = [{name: {} for name in indexes} for _ in shard_records]
+    routes: Dict[str, Dict] = {name: {} for name in routed}
+    for name, index in indexes.items():
+        route = routes.get(name)
+        for key, ids in index.items():
+            first = shard_of[ids[0]]
+            if all(shard_of[i] == first for i in ids):
+                groups = {first: list(ids)}
+            else:
+                groups = {}
+                for i in ids:
+                    groups.setdefault(shard_of[i], []).append(i)
+            for shard, group in groups.items():
+                shard_indexes[shard][name][key] = group
+            if route is not None:
+                route[key] = tuple(sorted(groups))
+
+    generation = f"{time.time_ns():x}"
+    shards = []
+    for shard, region_records in enumerate(shard_records):
+        file_name = f"{generation}-{shard:03d}{SHARD_SUFFIX}"
+        path = os.path.join(store_dir, file_name)
+        write_reference_store(path, region_records, shard_indexes[shard], cache_version)
+        shards.append({
+            'region': region_records[0].normalized_region,
+            'file': file_name,
+            'size': os.path.getsize(path),
+            'count': len(region_records),
+        })
+
+    directory = {
+        'format': FORMAT_VERSION,
+        'cache_version': cache_version,
+        'count': len(records),
+        'shards': shards,
+        'runs': (run_starts, run_shards, run_locals),
+        'routes': routes,
+        'lengths': {name: len(index) for name, index in indexes.items()},
+    }
+    target = directory_path(store_dir)
+    tmp_path = f"{target}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(directory, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, target)
+
+    current = {shard['file'] for shard in shards}
+    for file_name in os.listdir(store_dir):
+        if file_name.endswith(SHARD_SUFFIX) and file_name not in current:
+            try:
+                os.remove(os.path.join(store_dir, file_name))
+            except OSError:
+                pass  # Напр. у Windows файл відкритий іншою копією програми
+
+
+class ShardedRecords(Sequence):
+    """Записи в глобальній нумерації; запис береться з шарда його області й кешується"""
+
+    def __init__(self, shards: "RegionShards"):
+        self._shards = shards
+        self._starts, self._run_shards, self._run_locals = shards.runs
+        self._records: List[Optional[MagistralRecord]] = [None] * shards.count
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self._records)))]
+
+        record = self._records[position]
+        if record is None:
+            i = position + len(self._records) if position < 0 else position
+            run = bisect_right(self._starts, i) - 1
+            store = self._shards.shard(self._run_shards[run])
+            record = self._records[i] = store.records[self._run_locals[run] + i - self._starts[run]]
+        return record
+
+    def __iter__(self):
+        ends = self._starts[1:] + [len(self)]
+        for start, end, shard, local in zip(self._starts, ends, self._run_shards, self._run_locals):
+            yield from self._shards.shard(shard).records[local:local + end - start]
+
+
+class ShardedIndex(Mapping):
+    """
+    Індекс {ключ: [номери записів]} поверх шардів
+
+    route(ключ) повертає номери шардів, де може бути ключ; відкриваються
+    лише вони. Списки кількох шардів зливаються за зростанням номерів.
+    """
+
+    def __init__(
+        self,
+        shards: "RegionShards",
+        name: str,
+        route: Callable[[object], SequenceType[int]],
+        keys: Optional[Callable[[], Iterable]] = None,
+    ):
+        """
+        Args:
+            shards: Відкритий каталог шардів
+            name: Назва індексу
+            route: ключ -> номери шардів
+            keys: Ключі без відкриття шардів (інакше перебір відкриває всі шарди)
+        """
+        self._shards = shards
+        self._name = name
+        self._route = route
+        self._keys = keys
+
+    def _parts(self, key) -> List[List[int]]:
+        parts = []
+        for shard in self._route(key):
+            index = self._shards.shard(shard).indexes[self._name]
+            if key in index:
+                parts.append(index[key])
+        return parts
+
+    def __getitem__(self, key) -> List[int]:
+        parts = self._parts(key)
+        if not parts:
+            raise KeyError(key)
+        if len(parts) == 1:
+            return parts[0]
+        return list(heapq.merge(*parts))
+
+    def __contains__(self, key) -> bool:
+        return any(key in self._shards.shard(shard).indexes[self._name] for shard in self._route(key))
+
+    def __iter__(self):
+        if self._keys is not None:
+            return iter(self._keys())
+        keys = {}
+        for shard in range(len(self._shards.regions)):
+            keys.update(dict.fromkeys(self._shards.shard(shard).indexes[self._name]))
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return self._shards.lengths[self._name]
+
+
+class RegionShards:
+    """Каталог шардів; шард відкривається (mmap) при першому зверненні"""
+
+    def __init__(self, store_dir: str, cache_version: int):
+        """
+        Args:
+            store_dir: Каталог сховища
+            cache_version: Очікувана MagistralLoader.CACHE_VERSION
+
+        Raises:
+            ReferenceStoreError: каталог чи шард відсутній, змінений або іншої версії
+        """
+        try:
+            with open(directory_path(store_dir), 'rb') as f:
+                directory = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError) as e:
+            raise ReferenceStoreError(f"не вдалося прочитати каталог шардів: {e}") from e
+
+        if not isinstance(directory, dict) or directory.get('format') != FORMAT_VERSION:
+            raise ReferenceStoreError("невідомий формат каталогу шардів")
+        if directory.get('cache_version') != cache_version:
+            raise ReferenceStoreError(f"застаріла версія сховища: {directory.get('cache_version')}")
+
+        self._store_dir = store_dir
+        self._cache_version = cache_version
+        self._files = [shard['file'] for shard in directory['shards']]
+        for shard in directory['shards']:
+            try:
+                size = os.path.getsize(os.path.join(store_dir, shard['file']))
+            except OSError:
+                size = None
+            if size != shard['size']:
+                raise ReferenceStoreError(f"шард області «{shard['region']}» відсутній або змінений")
+
+        self.regions: List[str] = [shard['region'] for shard in directory['shards']]
+        self._shard_by_region = {region: shard for shard, region in enumerate(self.regions)}
+        self.count: int = directory['count']
+        self.runs = directory['runs']
+        self.routes: Dict[str, Dict] = directory['routes']
+        self.lengths: Dict[str, int] = directory['lengths']
+
+        self._stores: List[Optional[ReferenceStore]] = [None] * len(self.regions)
+        self._lock = threading.Lock()
+        self.records = ShardedRecords(self)
+
+    def shard(self, shard: int) -> ReferenceStore:
+        store = self._stores[shard]
+        if store is None:
+            with self._lock:
+                store = self._stores[shard]
+                if store is None:
+                    store = ReferenceStore(os.path.join(self._store_dir, self._files[shard]), self._cache_version)
+                    missing = [name for name in self.lengths if name not in store.indexes]
+                    if missing:
+                        raise ReferenceStoreError(f"у шарді немає індексів: {', '.join(missing)}")
+                    self._stores[shard] = store
+        return store
+
+    def shards_for_region(self, normalized_region: str) -> tuple:
+        shard = self._shard_by_region.get(normalized_region)
+        return () if shard is None else (shard,)
+
+    @property
+    def loaded_regions(self) -> List[str]:
+        return [region for region, store in zip(self.regions, self._stores) if store is not None]
+
+    def load_regions(self, normalized_regions: Iterable[str]) -> int:
+        """
+        Відкриває шарди областей і декодує їхні рядки та ключі індексів
+
+        Returns:
+            Кількість знайдених областей
+        """
+        loaded = 0
+        for region in dict.fromkeys(normalized_regions):
+            for shard in self.shards_for_region(region):
+                self.shard(shard).warm_up()
+                loaded += 1
+        return loaded
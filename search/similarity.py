@@ -1,9 +1,47 @@
 """
 Алгоритми для обчислення схожості тексту
 """
+from functools import lru_cache
+from typing import Dict
+
+import config
+from search.similarity_backends import get_backend
+
+# Обирається один раз при імпорті (config.SIMILARITY_BACKEND)
+_backend = get_backend()
+
+
 class SimilarityCalculator:
     """Клас для обчислення схожості між текстами"""
     
+    def __init__(self, cache_size: int = None):
+        """
+        Args:
+            cache_size: Розмір LRU-кешу token_similarity для цього екземпляра
+                (None - config.SIMILARITY_CACHE_SIZE, 0 - без кешу).
+                Виклики через клас (SimilarityCalculator.token_similarity) не кешуються.
+        """
+        if cache_size is None:
+            cache_size = getattr(config, 'SIMILARITY_CACHE_SIZE', 0)
+        self.cache_size = cache_size
+        self._token_similarity_cache = None
+        if cache_size > 0:
+            # Ключ - пара вже нормалізованих (інтернованих) рядків
+            self._token_similarity_cache = lru_cache(maxsize=cache_size)(SimilarityCalculator.token_similarity)
+            self.token_similarity = self._token_similarity_cache
+
+    def cache_info(self) -> Dict:
+        """Лічильники кешу token_similarity"""
+        if self._token_similarity_cache is None:
+            return {'hits': 0, 'misses': 0, 'size': 0, 'max_size': 0}
+        info = self._token_similarity_cache.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+    def clear_cache(self) -> None:
+        """Очищає кеш (наприклад, після перезавантаження magistral)"""
+        if self._token_similarity_cache is not None:
+            self._token_similarity_cache.cache_clear()
+
     @staticmethod
     def jaro_winkler_similarity(s1: str, s2: str, scaling: float = 0.1) -> float:
         """
@@ -21,13 +59,16 @@ class SimilarityCalculator:
         if not s1 or not s2:
             return 0.0
         
-        s1, s2 = s1.lower(), s2.lower()
-        
+        return SimilarityCalculator._jaro_winkler_lowered(s1.lower(), s2.lower(), scaling)
+
+    @staticmethod
+    def _jaro_winkler_lowered(s1: str, s2: str, scaling: float = 0.1) -> float:
+        """Jaro-Winkler для непорожніх рядків, уже приведених до нижнього регістру"""
         if s1 == s2:
             return 1.0
         
         # Jaro distance
-        jaro = SimilarityCalculator._jaro_similarity(s1, s2)
+        jaro = _backend.jaro(s1, s2)
         
         if jaro < 0.7:
             return jaro
@@ -47,54 +88,12 @@ class SimilarityCalculator:
     @staticmethod
     def _jaro_similarity(s1: str, s2: str) -> float:
         """Базовий Jaro distance"""
-        len1, len2 = len(s1), len(s2)
-        
-        if len1 == 0 or len2 == 0:
-            return 0.0
-        
-        # Match window
-        match_window = max(len1, len2) // 2 - 1
-        match_window = max(0, match_window)
-        
-        s1_matches = [False] * len1
-        s2_matches = [False] * len2
-        
-        matches = 0
-        transpositions = 0
-        
-        # Знаходимо співпадіння
-        for i in range(len1):
-            start = max(0, i - match_window)
-            end = min(i + match_window + 1, len2)
-            
-            for j in range(start, end):
-                if s2_matches[j] or s1[i] != s2[j]:
-                    continue
-                s1_matches[i] = s2_matches[j] = True
-                matches += 1
-                break
-        
-        if matches == 0:
-            return 0.0
-        
-        # Рахуємо транспозиції
-        k = 0
-        for i in range(len1):
-            if not s1_matches[i]:
-                continue
-            while not s2_matches[k]:
-                k += 1
-            if s1[i] != s2[k]:
-                transpositions += 1
-            k += 1
-        
-        jaro = (
-            matches / len1 +
-            matches / len2 +
-            (matches - transpositions / 2) / matches
-        ) / 3
-        
-        return jaro
+        return _backend.jaro(s1, s2)
+
+    @staticmethod
+    def backend_name() -> str:
+        """Назва активного бекенду ('python' або 'rapidfuzz')"""
+        return _backend.name
     
     @staticmethod
     def levenshtein_distance(s1: str, s2: str) -> int:
@@ -109,27 +108,7 @@ class SimilarityCalculator:
         Returns:
             Відстань (чим менше, тим схожіші)
         """
-        if not s1:
-            return len(s2)
-        if not s2:
-            return len(s1)
-        
-        if len(s1) < len(s2):
-            return SimilarityCalculator.levenshtein_distance(s2, s1)
-        
-        previous_row = list(range(len(s2) + 1))
-        
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                # Вартість операцій
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-        
-        return previous_row[-1]
+        return _backend.levenshtein(s1, s2)
     
     @staticmethod
     def levenshtein_similarity(s1: str, s2: str) -> float:
@@ -174,6 +153,8 @@ class SimilarityCalculator:
         """
         if not s1 or not s2:
             return 0.0
+        if s1 == s2:
+            return 1.0
             
         # Розбиваємо на слова, сортуємо
         tokens1 = sorted([t for t in s1.lower().split() if len(t) > 1])
@@ -186,4 +167,5 @@ class SimilarityCalculator:
         sorted_s1 = " ".join(tokens1)
         sorted_s2 = " ".join(tokens2)
         
-        return SimilarityCalculator.jaro_winkler_similarity(sorted_s1, sorted_s2)
+        # Токени вже в нижньому регістрі
+        return SimilarityCalculator._jaro_winkler_lowered(sorted_s1, sorted_s2)
@@ -0,0 +1,130 @@
+"""
+Ядра Jaro та Левенштейна для SimilarityCalculator
+
+Обидва бекенди повертають ті самі значення, що й початкова реалізація
+на циклах по символах; rapidfuzz використовується автоматично, якщо
+встановлений (config.SIMILARITY_BACKEND = 'auto').
+"""
+from itertools import compress
+
+import config
+
+try:
+    from rapidfuzz.distance import Levenshtein as _RapidFuzzLevenshtein
+except ImportError:  # rapidfuzz необов'язковий
+    _RapidFuzzLevenshtein = None
+
+
+class PythonSimilarityBackend:
+    """Чистий Python: пошук співпадінь через str.find замість вкладеного циклу"""
+
+    name = "python"
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    @staticmethod
+    def jaro(s1: str, s2: str) -> float:
+        len1, len2 = len(s1), len(s2)
+        if len1 == 0 or len2 == 0:
+            return 0.0
+
+        match_window = max(len1, len2) // 2 - 1
+        if match_window < 0:
+            match_window = 0
+
+        # Для кожного символу s1 - перше вільне таке ж місце в s2 у межах вікна
+        s2_matches = bytearray(len2)
+        s1_matched_chars = []
+        find = s2.find
+        for i, char in enumerate(s1):
+            start = i - match_window
+            end = i + match_window + 1
+            j = find(char, start if start > 0 else 0, end)
+            while j != -1 and s2_matches[j]:
+                j = find(char, j + 1, end)
+            if j != -1:
+                s2_matches[j] = 1
+                s1_matched_chars.append(char)
+
+        matches = len(s1_matched_chars)
+        if matches == 0:
+            return 0.0
+
+        transpositions = sum(
+            1 for char1, char2 in zip(s1_matched_chars, compress(s2, s2_matches))
+            if char1 != char2
+        )
+        return (
+            matches / len1 +
+            matches / len2 +
+            (matches - transpositions / 2) / matches
+        ) / 3
+
+    @staticmethod
+    def levenshtein(s1: str, s2: str) -> int:
+        if s1 == s2:
+            return 0
+        if len(s1) < len(s2):
+            s1, s2 = s2, s1
+        if not s2:
+            return len(s1)
+
+        previous_row = list(range(len(s2) + 1))
+        for i, c1 in enumerate(s1, 1):
+            current_row = [i]
+            left = i
+            for j, c2 in enumerate(s2):
+                # Сусідні клітинки різняться не більше ніж на 1, тож при
+                # однакових символах діагональ завжди мінімальна
+                if c1 == c2:
+                    left = previous_row[j]
+                else:
+                    left = min(previous_row[j], previous_row[j + 1], left) + 1
+                current_row.append(left)
+            previous_row = current_row
+
+        return previous_row[-1]
+
+
+class RapidFuzzSimilarityBackend:
+    """
+    Левенштейн з rapidfuzz (C++), якщо пакет встановлено
+
+    rapidfuzz.distance.Jaro відбирає співпадіння інакше, ніж наш Jaro, і на
+    частині пар дає інший результат, тому Jaro лишається чистим Python.
+    """
+
+    name = "rapidfuzz"
+
+    @staticmethod
+    def available() -> bool:
+        return _RapidFuzzLevenshtein is not None
+
+    jaro = staticmethod(PythonSimilarityBackend.jaro)
+
+    @staticmethod
+    def levenshtein(s1: str, s2: str) -> int:
+        return _RapidFuzzLevenshtein.distance(s1, s2)
+
+
+BACKENDS = {
+    PythonSimilarityBackend.name: PythonSimilarityBackend,
+    RapidFuzzSimilarityBackend.name: RapidFuzzSimilarityBackend,
+}
+
+
+def get_backend(name: str = None):
+    """
+    Бекенд за назвою ('auto', 'python', 'rapidfuzz')
+
+    'auto' бере rapidfuzz, якщо він встановлений; недоступний бекенд,
+    заданий явно, замінюється чистим Python.
+    """
+    if name is None:
+        name = getattr(config, 'SIMILARITY_BACKEND', 'auto')
+    if name == 'auto':
+        name = RapidFuzzSimilarityBackend.name
+    backend = BACKENDS.get(name, PythonSimilarityBackend)
+    return backend if backend.available() else PythonSimilarityBackend
@@ -0,0 +1,71 @@
+"""
+Індекс видалень (SymSpell) для пошуку вулиць з опечатками
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from search.similarity import SimilarityCalculator
+
+
+class StreetDeletionIndex:
+    """
+    Словник видалень по унікальних нормалізованих назвах вулиць одного міста
+
+    Для кожної назви зберігаються всі варіанти її префікса з видаленими
+    до max_distance символами. Запит генерує такі ж варіанти, а знайдені
+    назви перевіряються справжньою відстанню Левенштейна.
+    """
+
+    def __init__(self, streets: Iterable[str], max_distance: int = 2, prefix_length: int = 7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.streets: List[str] = sorted(set(street for street in streets if street))
+        self._deletes: Dict[str, List[int]] = {}
+
+        for street_id, street in enumerate(self.streets):
+            for variant in self._delete_variants(street[:prefix_length], max_distance):
+                if variant not in self._deletes:
+                    self._deletes[variant] = []
+                self._deletes[variant].append(street_id)
+
+    @staticmethod
+    def _delete_variants(word: str, max_distance: int) -> set:
+        variants = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            next_frontier = set()
+            for item in frontier:
+                if len(item) <= 1:
+                    continue
+                for pos in range(len(item)):
+                    next_frontier.add(item[:pos] + item[pos + 1:])
+            variants |= next_frontier
+            frontier = next_frontier
+        return variants
+
+    def lookup(self, query: str, max_distance: int = None) -> List[Tuple[str, int]]:
+        """
+        Назви вулиць на відстані редагування не більше max_distance
+
+        Returns:
+            Список (назва, відстань) за зростанням відстані
+        """
+        if not query:
+            return []
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        candidate_ids = set()
+        for variant in self._delete_variants(query[:self.prefix_length], max_distance):
+            candidate_ids.update(self._deletes.get(variant, ()))
+
+        results = []
+        for street_id in candidate_ids:
+            street = self.streets[street_id]
+            if abs(len(street) - len(query)) > max_distance:
+                continue
+            distance = SimilarityCalculator.levenshtein_distance(query, street)
+            if distance <= max_distance:
+                results.append((street, distance))
+
+        results.sort(key=lambda item: (item[1], item[0]))
+        return results
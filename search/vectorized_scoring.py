@@ -0,0 +1,179 @@
+"""
+Векторизована оцінка кандидатів (NumPy)
+
+Рахує той самий score, що й HybridSearch._calculate_score_strict, але для
+всього набору кандидатів одразу: схожість міста, області та вулиці
+обчислюється один раз на унікальне значення, а компоненти складаються
+масивами в тому ж порядку, що й у скалярному коді.
+"""
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy необов'язковий - тоді працює тільки скалярний шлях
+    np = None
+
+import config
+from models.magistral_record import MagistralRecord
+from search.normalizer import TextNormalizer
+from search.query_profile import QueryProfile
+from search.similarity import SimilarityCalculator
+
+
+class VectorizedScorer:
+    """Пакетна оцінка кандидатів для одного скомпільованого запиту"""
+
+    def __init__(
+        self,
+        normalizer: TextNormalizer,
+        similarity: SimilarityCalculator,
+        major_cities: Iterable[str] = (),
+    ):
+        self.normalizer = normalizer
+        self.similarity = similarity
+        self.major_cities = frozenset(major_cities)
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    @staticmethod
+    def _encode(values: Iterable[str]) -> Tuple["np.ndarray", List[str]]:
+        """Кодує значення колонки цілими id; повертає (коди, унікальні значення)"""
+        codes_by_value: Dict[str, int] = {}
+        codes = [codes_by_value.setdefault(value, len(codes_by_value)) for value in values]
+        return np.array(codes, dtype=np.intp), list(codes_by_value)
+
+    def _record_buildings(self, record: MagistralRecord):
+        if record.normalized_buildings:
+            return record.normalized_buildings, record.building_bases
+        return self.normalizer.building_sets(record.buildings)
+
+    def _building_delta(self, query: QueryProfile, record: MagistralRecord) -> Tuple[float, float]:
+        """(зміна score, building_bonus) - як блок БУДИНОК у скалярному коді"""
+        buildings, bases = self._record_buildings(record)
+        if query.building_clean in buildings:
+            return config.SCORE_BUILDING_EXACT_BONUS, config.SCORE_BUILDING_EXACT_BONUS
+        if query.building_has_letter_suffix and query.building_base and query.building_base in bases:
+            return 0.12, 0.12
+        for building in buildings:
+            if query.building_clean in building or building in query.building_clean:
+                return config.SCORE_BUILDING_PARTIAL_BONUS, config.SCORE_BUILDING_PARTIAL_BONUS
+        return -config.SCORE_BUILDING_PENALTY, 0.0
+
+    def score(self, query: QueryProfile, records: Sequence[MagistralRecord]) -> List[float]:
+        count = len(records)
+        if count == 0:
+            return []
+
+        total = np.zeros(count)
+        city_similarity = np.zeros(count)
+        street_similarity = np.zeros(count)
+        city_failed = np.zeros(count, dtype=bool)
+        region_failed = np.zeros(count, dtype=bool)
+        building_bonus = np.zeros(count)
+
+        # ============ 1. МІСТО ============
+        if query.city:
+            city_codes, cities = self._encode(record.normalized_city for record in records)
+            has_city = np.array([bool(city) for city in cities])[city_codes]
+            distinct_similarity = np.array([
+                self.similarity.token_similarity(query.city, city) if city else 0.0
+                for city in cities
+            ])
+            city_similarity = distinct_similarity[city_codes]
+            city_failed = has_city & (city_similarity < config.SCORE_CITY_THRESHOLD)
+            city_passed = has_city & ~city_failed
+            total = total + np.where(city_passed, city_similarity * config.SCORE_CITY_WEIGHT, 0.0)
+
+            if query.is_major_city:
+                is_major = np.array([city in self.major_cities for city in cities])[city_codes]
+                total = total + np.where(city_passed & is_major, config.SCORE_CAPITAL_BONUS, 0.0)
+
+        # ============ ФІЛЬТР РЕГІОНУ ============
+        if query.region:
+            region_codes, regions = self._encode(
+                record.normalized_region or (
+                    self.normalizer.normalize_region(record.region) if record.region else ""
+                )
+                for record in records
+            )
+            distinct_failed = np.array([
+                bool(region)
+                and self.similarity.token_similarity(query.region, region) < config.SCORE_REGION_THRESHOLD
+                for region in regions
+            ])
+            region_failed = distinct_failed[region_codes]
+
+        # ============ 2. ВУЛИЦЯ ============
+        if query.street:
+            street_codes, streets = self._encode(record.normalized_street for record in records)
+            has_street = np.array([bool(street) for street in streets])[street_codes]
+            similarity = np.array([
+                max(self.similarity.token_similarity(option, street) for option in query.street_options)
+                if street else 0.0
+                for street in streets
+            ])[street_codes]
+
+            if query.street_type:
+                raw_codes, raw_streets = self._encode(record.street for record in records)
+                type_differs = np.array([
+                    bool(street_type) and street_type != query.street_type
+                    for street_type in map(self.normalizer.detect_street_type, raw_streets)
+                ])[raw_codes]
+                conflict = has_street & type_differs
+                if query.street_type == "street":
+                    conflict &= similarity < 0.98
+                similarity = np.where(conflict, np.maximum(0.0, similarity - 0.25), similarity)
+
+            street_part = np.where(
+                similarity < config.SCORE_STREET_THRESHOLD,
+                similarity * 0.10,
+                similarity * config.SCORE_STREET_WEIGHT,
+            )
+            total = total + np.where(has_street, street_part, 0.0)
+            street_similarity = np.where(has_street, similarity, 0.0)
+
+        # ============ 3. БУДИНОК ============
+        if query.building:
+            deltas_by_buildings: Dict[str, Tuple[float, float]] = {}
+            building_delta = np.zeros(count)
+            for position, record in enumerate(records):
+                if not record.buildings:
+                    continue
+                delta = deltas_by_buildings.get(record.buildings)
+                if delta is None:
+                    delta = self._building_delta(query, record)
+                    deltas_by_buildings[record.buildings] = delta
+                building_delta[position], building_bonus[position] = delta
+            total = total + building_delta
+
+        # ============ 4. ІНДЕКС ============
+        if query.index:
+            query_index = query.index.replace(" ", "").replace("\x00", "").lstrip('0')
+            match_bonus = max(config.SCORE_INDEX_WEIGHT, 0.10)
+            deltas_by_index: Dict[str, float] = {}
+            index_delta = np.zeros(count)
+            for position, record in enumerate(records):
+                if not record.city_index:
+                    continue
+                delta = deltas_by_index.get(record.city_index)
+                if delta is None:
+                    record_index = record.city_index.strip().replace(" ", "").replace("\x00", "").lstrip('0')
+                    delta = match_bonus if record_index == query_index else -0.02
+                    deltas_by_index[record.city_index] = delta
+                index_delta[position] = delta
+            total = total + index_delta
+
+        # ============ БОНУС ЗА ІДЕАЛЬНЕ СПІВПАДІННЯ ============
+        perfect = (
+            (city_similarity >= 0.95)
+            & (street_similarity >= 0.95)
+            & (building_bonus >= config.SCORE_BUILDING_EXACT_BONUS)
+        )
+        total = total + np.where(perfect, config.SCORE_PERFECT_MATCH_BONUS, 0.0)
+
+        scores = np.maximum(0.0, np.minimum(total, 1.0))
+        scores = np.where(region_failed, 0.0, scores)
+        scores = np.where(city_failed, city_similarity * 0.2, scores)
+        return scores.tolist()
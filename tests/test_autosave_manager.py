@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+from PyQt5.QtWidgets import QApplication
+
+import config
+from handlers.excel_handler import ExcelHandler
+from ui.managers.autosave_manager import AutosaveManager, autosave_path
+
+
+@pytest.fixture
+def handler(tmp_path, monkeypatch):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    QApplication.instance() or QApplication(sys.argv)
+    monkeypatch.setattr(config, "AUTOSAVE_DIR", str(tmp_path / "autosave"))
+
+    source = tmp_path / "source.xlsx"
+    pd.DataFrame({"city": ["Київ", "Львів"], "index": ["01001", "79000"]}).to_excel(source, index=False)
+    handler = ExcelHandler()
+    handler.load_file(str(source))
+    return handler
+
+
+def test_only_dirty_cells_are_autosaved_and_restored(handler):
+    manager = AutosaveManager(handler)
+    assert manager.autosave_now() is None
+
+    handler.set_cell(1, 1, "79001")
+    manager.autosave_now().result()
+    assert manager.autosave_now() is None
+
+    reopened = ExcelHandler()
+    reopened.load_file(handler.file_path)
+    recovery = AutosaveManager(reopened).find_recovery(handler.file_path)
+
+    assert recovery["changes"] == [[1, "index", "79001"]]
+    assert reopened.restore_changes(recovery["changes"]) == 1
+    assert reopened.df.iloc[1, 1] == "79001"
+    assert reopened.dirty_cells == {(1, "index"): "79001"}
+
+
+def test_autosave_is_dropped_when_changes_are_saved_or_source_changed(handler):
+    manager = AutosaveManager(handler)
+    handler.set_cell(0, 1, "01002")
+    manager.autosave_now().result()
+    path = autosave_path(handler.file_path)
+    assert os.path.exists(path)
+
+    manager.mark_saved()
+    assert not os.path.exists(path)
+
+    handler.set_cell(0, 1, "01003")
+    manager.autosave_now().result()
+    with open(handler.file_path, "ab") as f:
+        f.write(b"\0")
+
+    assert manager.find_recovery(handler.file_path) is None
+    assert not os.path.exists(path)
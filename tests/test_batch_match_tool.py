@@ -0,0 +1,94 @@
+import pandas as pd
+
+from handlers.excel_handler import ExcelHandler
+from tools.batch_match import match_rows, save_result
+from utils.index_rules import auto_index, determine_index
+
+
+def auto_response(index, confidence=95, not_working=""):
+    return {
+        "mode": "auto",
+        "applied": True,
+        "auto_result": {"index": index, "confidence": confidence, "not_working": not_working},
+    }
+
+
+def test_determine_index_handles_closed_offices():
+    assert determine_index({"index": "01001"}) == "01001"
+    assert determine_index({"index": "01001", "not_working": "Тимчасово не функціонує"}) == "*"
+    assert determine_index({"index": "01001", "not_working": "ВПЗ 01002"}) == "01002"
+
+
+def test_auto_index_respects_mode_and_min_confidence():
+    assert auto_index(auto_response("01001")) == "01001"
+    assert auto_index(auto_response("01001", confidence=70), min_confidence=80) == ""
+    assert auto_index({**auto_response("01001"), "applied": False}) == ""
+    assert auto_index({"mode": "manual", "applied": False}) == ""
+
+
+def make_excel():
+    excel = ExcelHandler()
+    excel.df = pd.DataFrame({
+        "Місто": ["Київ", "", "Львів", "Одеса"],
+        "Вулиця": ["Хрещатик", "", "Городоцька", "Дерибасівська"],
+        "Індекс": ["", "", "", ""],
+    })
+    excel.has_header = True
+    excel.set_column_mapping({"city": [0], "street": [1], "index": [2]})
+    return excel
+
+
+def test_match_rows_writes_auto_indexes_and_counts_outcomes():
+    excel = make_excel()
+    responses = {
+        "Київ": auto_response("01001"),
+        "Львів": {"mode": "manual", "applied": False},
+        "Одеса": {"mode": "none", "applied": False, "error": "boom"},
+    }
+    seen = []
+
+    def search_rows(addresses, max_results, auto_apply):
+        seen.append([address.city for address in addresses])
+        for position, address in enumerate(addresses):
+            yield position, responses[address.city]
+
+    stats = match_rows(excel, search_rows, 0, 4, batch_size=3)
+
+    assert seen == [["Київ", "Львів"], ["Одеса"]]
+    assert excel.df["Індекс"].tolist() == ["01001", "", "", ""]
+    assert stats["auto_applied"] == 1
+    assert stats["manual_required"] == 1
+    assert stats["skipped"] == 1
+    assert stats["errors"] == 1
+
+
+def test_match_rows_counts_unreadable_rows_as_errors_and_continues():
+    excel = make_excel()
+    read_address = excel.get_address_from_row
+
+    def get_address_from_row(row_idx):
+        if row_idx == 2:
+            raise ValueError("broken row")
+        return read_address(row_idx)
+
+    excel.get_address_from_row = get_address_from_row
+
+    def search_rows(addresses, max_results, auto_apply):
+        for position, address in enumerate(addresses):
+            yield position, auto_response("01001")
+
+    stats = match_rows(excel, search_rows, 0, 4)
+
+    assert excel.df["Індекс"].tolist() == ["01001", "", "", "01001"]
+    assert stats["errors"] == 1
+    assert stats["auto_applied"] == 2
+    assert stats["skipped"] == 1
+
+
+def test_save_result_falls_back_to_plain_write(tmp_path):
+    excel = make_excel()
+    excel.file_path = None
+
+    saved = save_result(excel, tmp_path / "out.xlsx")
+
+    assert pd.read_excel(saved, dtype=str).shape == (4, 3)
@@ -0,0 +1,119 @@
+import sqlite3
+import time
+
+import pytest
+
+import config
+import utils.cache_manager as cache_manager
+from utils.cache_manager import CacheManager, reference_fingerprint
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ENABLE_SEARCH_CACHE", True)
+    monkeypatch.setattr(config, "SEARCH_CACHE_BATCH_SIZE", 3)
+    return str(tmp_path / "search_cache.sqlite")
+
+
+def stored_rows(path):
+    with sqlite3.connect(path) as connection:
+        return connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def test_key_covers_building_and_index_and_ignores_case_and_spaces(cache_path):
+    cache = CacheManager(cache_path, fingerprint="v1")
+    base = {"city": "Київ", "street": "Хрещатик", "building": "1", "index": "01001"}
+
+    assert cache.generate_key(base) == cache.generate_key({**base, "city": "  КИЇВ ", "street": "Хрещатик "})
+    assert cache.generate_key(base) != cache.generate_key({**base, "building": "2"})
+    assert cache.generate_key(base) != cache.generate_key({**base, "index": "01002"})
+    assert cache.generate_key({"city": "Київ", "region": "x"}) != cache.generate_key({"city": "Київ", "district": "x"})
+
+
+def test_writes_are_batched_and_survive_reopen(cache_path):
+    cache = CacheManager(cache_path, fingerprint="v1")
+    cache.set("a", {"index": "01001"})
+    cache.set("b", {"index": "01002"})
+
+    assert cache.get("a") == {"index": "01001"}
+    assert stored_rows(cache_path) == 0
+
+    cache.set("c", {"index": "01003"})
+    assert stored_rows(cache_path) == 3
+
+    cache.set("d", {"index": "01004"})
+    cache.close()
+
+    reopened = CacheManager(cache_path, fingerprint="v1")
+    assert reopened.get("d") == {"index": "01004"}
+    assert reopened.get_statistics()["total_entries"] == 4
+
+
+def test_results_of_other_fingerprint_are_never_served(cache_path):
+    cache = CacheManager(cache_path, fingerprint="v1")
+    cache.set("a", {"index": "01001"})
+    cache.close()
+
+    updated = CacheManager(cache_path, fingerprint="v2")
+    assert updated.get("a") is None
+    updated.wait_for_cleanup()
+    assert stored_rows(cache_path) == 0
+
+    updated.set("a", {"index": "02002"})
+    updated.refresh_fingerprint("v3")
+    assert updated.get("a") is None
+
+
+def test_cleanup_runs_only_when_manifest_is_stale(cache_path):
+    cache = CacheManager(cache_path, fingerprint="v1")
+    cache.set("a", {"index": "01001"})
+    cache.close()
+
+    same = CacheManager(cache_path, fingerprint="v1")
+    assert same._cleanup_thread is None
+    same.close()
+
+    changed = CacheManager(cache_path, fingerprint="v2")
+    assert changed._cleanup_thread is not None
+    changed.close()
+    assert stored_rows(cache_path) == 0
+    assert CacheManager(cache_path, fingerprint="v2")._cleanup_thread is None
+
+
+def test_expired_entries_are_hidden_and_swept(cache_path, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_EXPIRY_DAYS", 1)
+    cache = CacheManager(cache_path, fingerprint="v1")
+    cache.set("old", {"index": "01001"})
+    cache.set("new", {"index": "01002"})
+    cache.flush()
+    with cache._connection:
+        cache._connection.execute("UPDATE results SET cached_at = ? WHERE key = 'old'", (time.time() - 2 * 86400,))
+
+    assert cache.get("old") is None
+    assert cache.get("new") == {"index": "01002"}
+
+    monkeypatch.setattr(config, "SEARCH_CACHE_SWEEP_INTERVAL", 0)
+    cache.flush()
+    assert stored_rows(cache_path) == 1
+
+
+def test_reference_fingerprint_follows_magistral_file(tmp_path, monkeypatch):
+    magistral = tmp_path / "magistral.csv"
+    magistral.write_text("a", encoding="utf-8")
+    monkeypatch.setattr(config, "MAGISTRAL_CSV_PATH", str(magistral))
+
+    before = reference_fingerprint()
+    magistral.write_text("ab", encoding="utf-8")
+
+    assert reference_fingerprint() != before
+
+
+def test_reference_fingerprint_follows_version_constants(monkeypatch):
+    before = reference_fingerprint()
+
+    monkeypatch.setattr(cache_manager, "RESULTS_VERSION", cache_manager.RESULTS_VERSION + 1)
+    bumped = reference_fingerprint()
+    monkeypatch.setattr(config, "APP_VERSION", "0.0")
+
+    assert bumped != before
+    assert reference_fingerprint() not in (before, bumped)
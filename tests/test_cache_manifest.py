@@ -0,0 +1,39 @@
+import os
+
+from utils.cache_manifest import manifest_path, stale_reason, write_manifest
+
+
+def make_cache(tmp_path, source_text="a;b\n"):
+    source = tmp_path / "magistral.csv"
+    source.write_text(source_text, encoding="utf-8")
+    cache = tmp_path / "cache.pkl"
+    cache.write_bytes(b"cache")
+    write_manifest(str(cache), [str(source)], {"cache": 1, "normalizer": 1})
+    return source, cache
+
+
+def test_fresh_cache_and_rewritten_source_with_same_content(tmp_path):
+    source, cache = make_cache(tmp_path)
+    assert stale_reason(str(cache), [str(source)], {"cache": 1, "normalizer": 1}) is None
+
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert stale_reason(str(cache), [str(source)], {"cache": 1, "normalizer": 1}) is None
+    assert str(stat.st_mtime_ns + 10**9) in (tmp_path / "cache.pkl.manifest.json").read_text(encoding="utf-8")
+
+
+def test_changed_source_version_or_missing_manifest_is_stale(tmp_path):
+    source, cache = make_cache(tmp_path)
+
+    assert stale_reason(str(cache), [str(source)], {"cache": 1, "normalizer": 2})
+
+    stat = os.stat(source)
+    source.write_text("a;c\n", encoding="utf-8")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert stale_reason(str(cache), [str(source)], {"cache": 1, "normalizer": 1}) is None  # same size and mtime: not re-hashed
+
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert "змінилося джерело" in stale_reason(str(cache), [str(source)], {"cache": 1, "normalizer": 1})
+
+    os.remove(manifest_path(str(cache)))
+    assert stale_reason(str(cache), [str(source)], {"cache": 1, "normalizer": 1}) == "немає маніфесту"
@@ -0,0 +1,21 @@
+from search.city_trigram_index import CityTrigramIndex
+from search.normalizer import TextNormalizer
+
+
+def test_find_recovers_misspelled_city_including_first_letters():
+    normalizer = TextNormalizer()
+    names = [normalizer.normalize_city(city) for city in ["Житомир", "Жмеринка", "Бердичів", "Коростень", "Житнє"]]
+    index = CityTrigramIndex(names)
+
+    assert index.find(normalizer.normalize_city("Жтомир"), limit=1)[0][0] == normalizer.normalize_city("Житомир")
+    assert index.find(normalizer.normalize_city("Бкрдичів"), limit=1)[0][0] == normalizer.normalize_city("Бердичів")
+
+
+def test_find_applies_similarity_floor_and_limit():
+    index = CityTrigramIndex(["петрівка", "петрівське", "петрове", "київ"])
+
+    results = index.find("петрівка", limit=5, min_similarity=0.9)
+
+    assert [name for name, _ in results] == ["петрівка", "петрівське"]
+    assert len(index.find("петрівка", limit=1)) == 1
+    assert index.find("") == []
@@ -76,6 +76,75 @@ class TestExcelHandlerStructure(unittest.TestCase):
         self.assertEqual(reloaded.iloc[0, 3], "01001")
         self.assertEqual(len(reloaded), 2)
 
+    def test_streaming_reader_matches_pandas_header_and_cell_rules(self):
+        from openpyxl import Workbook
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "cells.xlsx"
+            workbook = Workbook()
+            sheet = workbook.active
+            sheet.append(["city", "city", "street", None, "index", "name"])
+            sheet.append(["Київ", 12.0, "Хрещатик", 2.5, "01001"])
+            sheet.append(["Львів"])
+            sheet.append([None, None])
+            workbook.save(path)
+
+            handler = ExcelHandler()
+            handler.load_file(str(path))
+
+        self.assertTrue(handler.has_header)
+        self.assertEqual(list(handler.df.columns), ["city", "city.1", "street", "Unnamed: 3", "index", "name"])
+        self.assertEqual(handler.df.iloc[0].tolist(), ["Київ", "12", "Хрещатик", "2.5", "01001", ""])
+        self.assertEqual(handler.df.iloc[1].tolist(), ["Львів", "", "", "", "", ""])
+        self.assertEqual(len(handler.df), 2)
+
+    def test_set_cell_journals_changes_by_original_row(self):
+        handler = ExcelHandler()
+        handler.df = pd.DataFrame({
+            "_original_row_index": [2, 0],
+            "city": ["Львів", "Київ"],
+            "index": ["79000", "01001"],
+        })
+        handler.set_column_mapping({"city": [1], "index": [2]})
+
+        handler.update_row(0, {"index": "79001"})
+        handler.set_cell(1, 2, "01002")
+        handler.set_cell(1, 2, "01001")
+
+        self.assertEqual(handler.dirty_cells, {(2, "index"): "79001"})
+        self.assertEqual(handler.df.iloc[0, 2], "79001")
+
+    def test_unique_field_values_join_mapped_columns(self):
+        handler = ExcelHandler()
+        handler.df = pd.DataFrame({
+            "region": ["Київська", "Одеська", "Київська", ""],
+            "suffix": ["обл.", "", "обл.", ""],
+        })
+        handler.set_column_mapping({"region": [0, 1]})
+
+        self.assertEqual(handler.get_unique_field_values("region"), ["Київська обл.", "Одеська"])
+        self.assertEqual(handler.get_unique_field_values("city"), [])
+
+    def test_row_snapshot_builds_same_addresses_as_row_reads(self):
+        handler = ExcelHandler()
+        handler.df = pd.DataFrame({
+            "city": ["Київ", None, "Одеса"],
+            "street": ["Хрещатик", "Городоцька", float("nan")],
+            "building": [" 1 ", "2", "3"],
+            "suffix": ["а", "", None],
+            "note": ["x", "y", "z"],
+        })
+        handler.set_column_mapping({"city": [0], "street": [1], "building": [2, 3]})
+
+        snapshot = handler.snapshot_rows(1, 3, extra_columns=[4])
+        handler.df.loc[1, "city"] = "changed after snapshot"
+
+        self.assertEqual(snapshot.address(2).to_dict(), handler.get_address_from_row(2).to_dict())
+        self.assertEqual(snapshot.address(1).street, "Городоцька")
+        self.assertEqual(snapshot.address(1).city, "")
+        self.assertEqual(snapshot.value(2, 4), "z")
+        self.assertEqual(handler.snapshot_rows(0, 1).address(0).building, "1 а")
+
     def test_save_file_falls_back_from_xls_to_xlsx(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             path = Path(tmpdir) / "legacy.xls"
@@ -46,8 +46,10 @@ class TestFileManager(unittest.TestCase):
             manager.excel_handler.df = pd.DataFrame({
                 "_original_row_index": [0, 2],
                 "city": ["Київ", "Львів"],
-                "index": ["01002", "079000"],
+                "index": ["01001", "79000"],
             })
+            manager.excel_handler.set_cell(0, 2, "01002")
+            manager.excel_handler.set_cell(1, 2, "079000")
 
             self.assertTrue(manager.save_file(str(path), parent=None))
             reloaded = pd.read_excel(
@@ -83,7 +85,7 @@ class TestFileManager(unittest.TestCase):
             handler.load_file(str(source_path))
             handler.set_column_mapping({"index": [1]})
             handler.apply_column_filter()
-            handler.df.iloc[0, handler.column_mapping["index"][0]] = "01002"
+            handler.set_cell(0, handler.column_mapping["index"][0], "01002")
             manager.current_file = str(source_path)
 
             self.assertTrue(manager.save_file(str(target_path), parent=None))
@@ -1,12 +1,17 @@
+import csv
+import tempfile
 import unittest
-from unittest.mock import MagicMock
+from pathlib import Path
+from unittest.mock import MagicMock, patch
 import sys
 import os
 
 # Додаємо кореневу директорію в sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import config
 from search.hybrid_search import HybridSearch
+from search.magistral_loader import MagistralLoader
 from search.ukrposhta_classifier import ClassifierCity, ClassifierStreet, PostOffice
 from models.address import Address
 from models.magistral_record import MagistralRecord
@@ -18,6 +23,10 @@ class TestHybridSearch(unittest.TestCase):
         self.search.loader = MagicMock()
         self.search.loader.index_by_city_prefix = {}
         self.search.loader.index_by_region = {}
+        self.search.loader.get_candidates_by_street_tokens.return_value = []
+        self.search.loader.get_candidates_by_similar_streets.return_value = []
+        self.search.loader.get_candidates_by_normalized_city.return_value = []
+        self.search.loader.find_similar_cities.return_value = []
         self.search._is_loaded = True # Імітуємо що завантажено
         
     def test_classifier_results_are_added_as_search_candidates(self):
@@ -141,6 +150,175 @@ class TestHybridSearch(unittest.TestCase):
 
         self.assertGreaterEqual(score, 0.95)
 
+    def test_compiled_query_gives_same_score_as_raw_address(self):
+        address = Address(city="Київ", street="бульв. Лесі Українки", building="27А", region="Київ", index="01133")
+        record = MagistralRecord(
+            region="Київ", new_district="Київ", city="м. Київ",
+            street="бульв. Лесі Українки", buildings="25,27,29", city_index="01133"
+        )
+        record.normalized_city = self.search.normalizer.normalize_city(record.city)
+        record.normalized_street = self.search.normalizer.normalize_street(record.street)
+        record.normalized_region = self.search.normalizer.normalize_region(record.region)
+
+        query = self.search._compile_query(address)
+
+        self.assertEqual(query.city, self.search.normalizer.normalize_city("м. Київ"))
+        self.assertEqual(query.building_base, "27")
+        self.assertTrue(query.building_has_letter_suffix)
+        self.assertEqual(
+            self.search._calculate_score_strict(address, record, query),
+            self.search._calculate_score_strict(address, record),
+        )
+
+    def test_search_compiles_query_once_for_all_candidates(self):
+        records = []
+        for idx in range(20):
+            record = MagistralRecord(
+                region="Київ", city="м. Київ", street=f"вул. Хрещатик {idx}",
+                buildings="1", city_index=f"01{idx:03d}"
+            )
+            record.normalized_city = "киів"
+            record.normalized_street = self.search.normalizer.normalize_street(record.street)
+            records.append(record)
+        self.search.magistral_records = records
+        self.search.loader.get_candidates_by_city_prefix.return_value = records
+        self.search.classifier = None
+
+        compile_query = MagicMock(wraps=self.search._compile_query)
+        self.search._compile_query = compile_query
+
+        self.search.search_with_confidence(Address(city="Київ", street="Хрещатик", building="1"))
+
+        self.assertEqual(compile_query.call_count, 1)
+
+    def test_get_candidates_prefers_street_token_index(self):
+        street_record = MagistralRecord(city="м. Київ", street="вул. Хрещатик", city_index="01001")
+        prefix_record = MagistralRecord(city="м. Київ", street="вул. Січових Стрільців", city_index="04053")
+        self.search.loader.get_candidates_by_street_tokens.return_value = [street_record]
+        self.search.loader.get_candidates_by_city_prefix.return_value = [street_record, prefix_record]
+
+        candidates = self.search._get_candidates(Address(city="Київ", street="Хрещатик"))
+
+        self.assertEqual(candidates, [street_record])
+        self.search.loader.get_candidates_by_city_prefix.assert_not_called()
+
+    def test_get_candidates_uses_similar_streets_when_no_token_matches(self):
+        street_record = MagistralRecord(city="м. Київ", street="вул. Хрещатик", city_index="01001")
+        self.search.loader.get_candidates_by_similar_streets.return_value = [street_record]
+
+        candidates = self.search._get_candidates(Address(city="Київ", street="Хрещятик"))
+
+        self.assertEqual(candidates, [street_record])
+        self.search.loader.get_candidates_by_normalized_city.assert_not_called()
+
+    def test_get_candidates_falls_back_to_city_prefix(self):
+        prefix_record = MagistralRecord(city="м. Київ", street="вул. Хрещатик", city_index="01001")
+        self.search.loader.get_candidates_by_city_prefix.return_value = [prefix_record]
+        self.search.loader.get_candidates_by_region.return_value = []
+
+        candidates = self.search._get_candidates(Address(city="Київ", street="Хрещятик"))
+
+        self.assertEqual(candidates, [prefix_record])
+
+    def test_get_candidates_uses_exact_city_before_prefix(self):
+        city_record = MagistralRecord(city="м. Київ", street="вул. Хрещатик", city_index="01001")
+        self.search.loader.get_candidates_by_normalized_city.return_value = [city_record]
+        self.search.loader.get_candidates_by_region.return_value = []
+
+        candidates = self.search._get_candidates(Address(city="Київ", street="Хрещятик"))
+
+        self.assertEqual(candidates, [city_record])
+        self.search.loader.get_candidates_by_city_prefix.assert_not_called()
+
+    def test_get_candidates_uses_similar_cities_for_misspelled_city(self):
+        zhytomyr = MagistralRecord(city="м. Житомир", street="вул. Київська", city_index="10001")
+        self.search.loader.find_similar_cities.return_value = ["житомир"]
+        self.search.loader.get_candidates_by_normalized_city.side_effect = (
+            lambda city, region="": [zhytomyr] if city == "житомир" else []
+        )
+        self.search.loader.get_candidates_by_region.return_value = []
+
+        candidates = self.search._get_candidates(Address(city="Жтомир", street="Київська"))
+
+        self.assertEqual(candidates, [zhytomyr])
+        self.search.loader.get_candidates_by_city_prefix.assert_not_called()
+
+    def test_misspelled_big_city_narrows_similar_cities_by_street(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_path = Path(tmpdir) / "magistral.csv"
+            with csv_path.open("w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(["Область", "Населений пункт", "Індекс НП", "Назва вулиці", "№ будинку"])
+                # A big city: its whole record list is longer than MAX_CANDIDATES
+                writer.writerow(["Запорізька", "м. Запоріжжя", "69000", "бульв. Лівці", "1"])
+                for i in range(30):
+                    writer.writerow(["Запорізька", "м. Запоріжжя", f"{69001 + i}", f"вул. Робітнича {i + 1}", "1"])
+                writer.writerow(["Запорізька", "м. Запоріжжя", "69095", "вул. Соборна", "1"])
+
+            with patch.object(config, "MAGISTRAL_CSV_PATH", str(csv_path)), \
+                    patch.object(config, "MAGISTRAL_CACHE_PATH", str(Path(tmpdir) / "normalized_magistral.pkl")), \
+                    patch.object(config, "MAGISTRAL_STORE_DIR", str(Path(tmpdir) / "magistral_store")), \
+                    patch.object(config, "MAX_CANDIDATES", 10), \
+                    patch("search.magistral_loader.print"):
+                self.search.loader = MagistralLoader()
+                self.search.magistral_records = self.search.loader.load(force_reload=True)
+                self.search.classifier = None
+
+                for city in ("Запоріжя", "Запорожжя", "Зпоріжжя"):
+                    candidates = self.search._get_candidates(Address(city=city, street="Соборна", building="1"))
+                    result = self.search.search_with_confidence(Address(city=city, street="Соборна", building="1"))
+
+                    self.assertEqual([c.city_index for c in candidates], ["69095"], city)
+                    self.assertEqual(result['manual'][0]['index'], "69095", city)
+
+    def test_search_many_shares_city_candidates_and_keeps_input_order(self):
+        normalizer = self.search.normalizer
+        records = []
+        for city, street, index in [
+            ("м. Житомир", "вул. Київська", "10001"),
+            ("м. Житомир", "вул. Вітрука", "10002"),
+            ("м. Бровари", "вул. Київська", "07400"),
+        ]:
+            record = MagistralRecord(region="Житомирська", city=city, street=street, buildings="1", city_index=index)
+            record.normalized_city = normalizer.normalize_city(city)
+            record.normalized_street = normalizer.normalize_street(street)
+            records.append(record)
+        self.search.magistral_records = records
+        self.search.classifier = None
+        self.search.loader.find_similar_cities.side_effect = (
+            lambda city, **kwargs: [records[0].normalized_city] if city == normalizer.normalize_city("Жтомир") else []
+        )
+        self.search.loader.get_candidates_by_normalized_city.side_effect = (
+            lambda city, region="": [r for r in records if r.normalized_city == city]
+        )
+        self.search.loader.get_candidates_by_region.return_value = []
+        self.search.loader.get_candidates_by_street_tokens.side_effect = lambda *args: []
+        self.search.loader.get_candidates_by_similar_streets.side_effect = lambda *args: []
+
+        addresses = [
+            Address(city="Жтомир", street="Київська", building="1"),
+            Address(city="Бровари", street="Київська", building="1"),
+            Address(city="Жтомир", street="Вітрука", building="1"),
+        ]
+        expected = [
+            self.search.search_with_confidence(Address(**address.to_dict()))
+            for address in addresses
+        ]
+        self.search.loader.find_similar_cities.reset_mock()
+
+        results = self.search.search_many(addresses)
+
+        self.assertEqual(
+            [result['auto']['index'] if result['auto'] else None for result in results],
+            [result['auto']['index'] if result['auto'] else None for result in expected],
+        )
+        self.assertEqual([result['manual'] for result in results], [result['manual'] for result in expected])
+        self.assertEqual(results[0]['manual'][0]['index'], "10001")
+        self.assertEqual(results[2]['manual'][0]['index'], "10002")
+        # Нечіткий пошук міста - один раз на групу "Жтомир"
+        self.assertEqual(self.search.loader.find_similar_cities.call_count, 1)
+        self.assertIsNone(self.search._group_cache)
+
     def test_calculate_score_strict_partial_match(self):
         """Тест часткового співпадіння (помилка в вулиці)"""
         address = Address(city="Київ", street="Хрещ", building="1") # Помилка
@@ -154,6 +332,47 @@ class TestHybridSearch(unittest.TestCase):
         score = self.search._calculate_score_strict(address, record)
         self.assertTrue(0.5 < score < 1.0)
 
+    def test_calculate_score_strict_skips_street_below_min_score(self):
+        address = Address(city="Київ", street="Хрещатик", building="7", index="04053")
+        record = MagistralRecord(
+            region="Київ", city="м. Київ", street="вул. Хрещатик", buildings="1", city_index="01001"
+        )
+        record.normalized_city = "киів"
+        record.normalized_street = "хрещатик"
+        query = self.search._compile_query(address)
+        full_score = self.search._calculate_score_strict(address, record, query)
+
+        self.search.similarity = MagicMock(wraps=self.search.similarity)
+        pruned = self.search._calculate_score_strict(address, record, query, min_score=0.95)
+
+        self.assertLess(pruned, 0.95)
+        self.assertGreaterEqual(pruned, full_score)
+        self.assertEqual(self.search.similarity.token_similarity.call_count, 1)  # Тільки місто
+        self.assertEqual(self.search._calculate_score_strict(address, record, query, min_score=0.5), full_score)
+
+    def test_top_scored_candidates_keeps_best_in_candidate_order(self):
+        address = Address(city="Київ", street="Хрещатик", building="1")
+        records = []
+        for idx, buildings in enumerate(["2", "1", "3", "1", "1", "9"]):
+            record = MagistralRecord(
+                region="Київ", city="м. Київ", street="вул. Хрещатик",
+                buildings=buildings, city_index=f"01{idx:03d}"
+            )
+            record.normalized_city = "киів"
+            record.normalized_street = "хрещатик"
+            records.append(record)
+        query = self.search._compile_query(address)
+
+        top = self.search._top_scored_candidates(address, records, query, limit=3)
+
+        self.assertEqual([record.city_index for record, _ in top], ["01001", "01003", "01004"])
+        full = self.search._top_scored_candidates(address, records, query, limit=10)
+        self.assertEqual(len(full), 6)
+        self.assertEqual(
+            sorted(score for _, score in full)[-3:],
+            sorted(score for _, score in top),
+        )
+
     def test_find_auto_result_success(self):
         """Тест успішної автопідстановки"""
         address = Address(city="Київ", street="Хрещатик", building="1")
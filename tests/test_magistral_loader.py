@@ -1,11 +1,15 @@
 import csv
+import pickle
+import sys
 import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import patch
 
 import config
+from models.magistral_record import MagistralRecord
 from search.magistral_loader import MagistralLoader
+from search.normalizer import TextNormalizer
 
 
 class TestMagistralLoader(unittest.TestCase):
@@ -109,5 +113,318 @@ class TestMagistralLoader(unittest.TestCase):
         self.assertEqual(loader.get_candidates_by_postcode("*"), [])
 
 
+    def test_street_token_index_returns_records_sharing_street_words(self):
+        loader = MagistralLoader()
+        for city, street in [
+            ("м. Київ", "вул. Лесі Українки"),
+            ("м. Київ", "бульв. Лесі Українки"),
+            ("м. Київ", "вул. Хрещатик"),
+            ("м. Львів", "вул. Лесі Українки"),
+        ]:
+            record = MagistralRecord(city=city, street=street)
+            record.normalized_city = loader.normalizer.normalize_city(city)
+            record.normalized_street = loader.normalizer.normalize_street(street)
+            loader.records.append(record)
+        with patch("search.magistral_loader.print"):
+            loader._build_indexes()
+
+        kyiv = loader.normalizer.normalize_city("Київ")
+        candidates = loader.get_candidates_by_street_tokens(kyiv, [loader.normalizer.normalize_street("Українки")])
+
+        self.assertEqual([r.street for r in candidates], ["вул. Лесі Українки", "бульв. Лесі Українки"])
+        self.assertEqual(loader.get_candidates_by_street_tokens(kyiv, ["невідома"]), [])
+
+    def test_similar_streets_are_found_within_city(self):
+        loader = MagistralLoader()
+        for city, street in [
+            ("м. Київ", "вул. Хрещатик"),
+            ("м. Київ", "вул. Хрещатик"),
+            ("м. Київ", "вул. Прорізна"),
+            ("м. Львів", "вул. Хрещатик"),
+        ]:
+            record = MagistralRecord(city=city, street=street)
+            record.normalized_city = loader.normalizer.normalize_city(city)
+            record.normalized_street = loader.normalizer.normalize_street(street)
+            loader.records.append(record)
+        with patch("search.magistral_loader.print"):
+            loader._build_indexes()
+
+        kyiv = loader.normalizer.normalize_city("Київ")
+        candidates = loader.get_candidates_by_similar_streets(kyiv, ["хрещятик"])
+
+        self.assertEqual(loader.find_similar_streets(kyiv, "хрешатик"), ["хрещатик"])
+        self.assertEqual(len(candidates), 2)
+        self.assertTrue(all(r.city == "м. Київ" for r in candidates))
+        self.assertEqual(loader.find_similar_streets(kyiv, "саксаганського"), [])
+
+    def test_exact_city_index_and_min_index_respect_region(self):
+        loader = MagistralLoader()
+        for region, city, index in [
+            ("Київська", "с. Петрівка", "07010"),
+            ("Київська", "с. Петрівка", "07005"),
+            ("Одеська", "с. Петрівка", "67000"),
+            ("Київська", "с. Петрівське", "08000"),
+        ]:
+            record = MagistralRecord(region=region, city=city, city_index=index)
+            record.normalized_city = loader.normalizer.normalize_city(city)
+            record.normalized_region = loader.normalizer.normalize_region(region)
+            loader.records.append(record)
+        with patch("search.magistral_loader.print"):
+            loader._build_indexes()
+
+        self.assertEqual(len(loader.get_candidates_by_city("Петрівка")), 3)
+        self.assertEqual(len(loader.get_candidates_by_city("Петрівка", "Київська обл.")), 2)
+        self.assertEqual(loader.get_min_index_for_city("Петрівка"), "07005")
+        self.assertEqual(loader.get_min_index_for_city("Петрівка", "Одеська"), "67000")
+        self.assertEqual(loader.get_candidates_by_city("Петрівк"), [])
+
+    def test_building_sets_are_precomputed_and_cached(self):
+        headers = [
+            "Область",
+            "Населений пункт",
+            "Індекс НП",
+            "Назва вулиці",
+            "№ будинку",
+        ]
+        rows = [
+            ["Київ", "м. Київ", "01001", "вул. Хрещатик", "1, 27-а,43/5"],
+        ]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_path = Path(tmpdir) / "magistral.csv"
+            cache_path = Path(tmpdir) / "normalized_magistral.pkl"
+            with csv_path.open("w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(headers)
+                writer.writerows(rows)
+
+            with patch.object(config, "MAGISTRAL_CSV_PATH", str(csv_path)), \
+                    patch.object(config, "MAGISTRAL_CACHE_PATH", str(cache_path)), \
+                    patch.object(config, "MAGISTRAL_STORE_DIR", str(Path(tmpdir) / "magistral_store")), \
+                    patch("search.magistral_loader.print"):
+                MagistralLoader().load(force_reload=True)
+                record = MagistralLoader().load()[0]
+
+        self.assertEqual(record.normalized_buildings, frozenset({"1", "27А", "43/5"}))
+        self.assertEqual(record.building_bases, frozenset({"1", "27", "43/5"}))
+        self.assertIs(record.normalized_city, sys.intern("".join(record.normalized_city)))
+        self.assertIs(record.normalized_street, sys.intern("".join(record.normalized_street)))
+
+    def test_cache_from_older_version_is_rebuilt_from_csv(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_path = Path(tmpdir) / "magistral.csv"
+            cache_path = Path(tmpdir) / "normalized_magistral.pkl"
+            with csv_path.open("w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(["Область", "Населений пункт", "Індекс НП", "Назва вулиці", "№ будинку"])
+                writer.writerow(["Київ", "м. Київ", "01001", "вул. Хрещатик", "1"])
+            with cache_path.open("wb") as f:
+                pickle.dump({
+                    'records': [],
+                    'index_by_city_prefix': {},
+                    'index_by_region': {},
+                    'index_by_postcode': {},
+                }, f)
+
+            with patch.object(config, "MAGISTRAL_CSV_PATH", str(csv_path)), \
+                    patch.object(config, "MAGISTRAL_CACHE_PATH", str(cache_path)), \
+                    patch.object(config, "MAGISTRAL_STORE_DIR", str(Path(tmpdir) / "magistral_store")), \
+                    patch("search.magistral_loader.print"):
+                records = MagistralLoader().load()
+
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].normalized_buildings, frozenset({"1"}))
+
+    def test_records_share_repeated_values_after_cache_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_path = Path(tmpdir) / "magistral.csv"
+            cache_path = Path(tmpdir) / "normalized_magistral.pkl"
+            with csv_path.open("w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(["Область", "Населений пункт", "Індекс НП", "Назва вулиці", "№ будинку"])
+                writer.writerow(["Київська ", "м. Біла Церква", "09100", "вул. Шевченка", "1-5"])
+                writer.writerow(["Київська", "м. Біла Церква", "09101", "вул. Шевченка", "1-5"])
+
+            with patch.object(config, "MAGISTRAL_CSV_PATH", str(csv_path)), \
+                    patch.object(config, "MAGISTRAL_CACHE_PATH", str(cache_path)), \
+                    patch.object(config, "MAGISTRAL_STORE_DIR", str(Path(tmpdir) / "magistral_store")), \
+                    patch("search.magistral_loader.print"):
+                MagistralLoader().load(force_reload=True)
+                first, second = MagistralLoader().load()
+
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertIs(first.region, second.region)
+        self.assertIs(first.street, second.street)
+        self.assertIs(first.normalized_buildings, second.normalized_buildings)
+        self.assertEqual((first.city_index, second.city_index), ("09100", "09101"))
+
+    def test_encoding_is_detected_from_sample_and_rows_are_streamed(self):
+        header = ["Область", "Населений пункт", "Індекс НП", "Назва вулиці", "№ будинку"]
+        rows = [["Київська", "м. Біла Церква", "09100", "вул. Шевченка", "1"], [], ["Львівська", "м. Львів", "79000"]]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            utf8_path = Path(tmpdir) / "utf8.csv"
+            cp1251_path = Path(tmpdir) / "cp1251.csv"
+            for path, encoding in [(utf8_path, "utf-8"), (cp1251_path, "cp1251")]:
+                with path.open("w", encoding=encoding, newline="") as f:
+                    writer = csv.writer(f, delimiter=";")
+                    writer.writerow(header)
+                    writer.writerows(rows)
+
+            with patch.object(MagistralLoader, "CSV_SAMPLE_BYTES", 3):  # splits the first Cyrillic letter
+                sampled = MagistralLoader._detect_encodings(str(utf8_path))
+
+            loader = MagistralLoader()
+            with patch.object(config, "MAGISTRAL_CSV_PATH", str(cp1251_path)), \
+                    patch("search.magistral_loader.print"):
+                loader._load_from_csv()
+
+        self.assertEqual(sampled[0], "utf-8")
+        self.assertEqual([r.city for r in loader.records], ["м. Біла Церква", "м. Львів"])
+        self.assertEqual(loader.records[1].street, "")
+        self.assertEqual(loader.get_candidates_by_postcode("79000"), [loader.records[1]])
+
+    def test_cache_is_rebuilt_when_csv_or_normalizer_rules_change(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_path = Path(tmpdir) / "magistral.csv"
+
+            def write_csv(index):
+                with csv_path.open("w", encoding="utf-8", newline="") as f:
+                    writer = csv.writer(f, delimiter=";")
+                    writer.writerow(["Область", "Населений пункт", "Індекс НП", "Назва вулиці", "№ будинку"])
+                    writer.writerow(["Київська", "м. Біла Церква", index, "вул. Шевченка", "1"])
+
+            with patch.object(config, "MAGISTRAL_CSV_PATH", str(csv_path)), \
+                    patch.object(config, "MAGISTRAL_CACHE_PATH", str(Path(tmpdir) / "normalized_magistral.pkl")), \
+                    patch.object(config, "MAGISTRAL_STORE_DIR", str(Path(tmpdir) / "magistral_store")), \
+                    patch("search.magistral_loader.print"):
+                write_csv("09100")
+                MagistralLoader().load()
+                write_csv("09117")
+                changed_csv = MagistralLoader().load()[0].city_index
+
+                with patch.object(MagistralLoader, "_load_from_csv", side_effect=AssertionError("rebuilt")):
+                    MagistralLoader().load()
+                    with patch.object(TextNormalizer, "RULES_VERSION", TextNormalizer.RULES_VERSION + 1), \
+                            self.assertRaisesRegex(AssertionError, "rebuilt"):
+                        MagistralLoader().load()
+
+        self.assertEqual(changed_csv, "09117")
+
+    def test_mapped_store_matches_csv_and_falls_back_to_pickle(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_path = Path(tmpdir) / "magistral.csv"
+            store_dir = Path(tmpdir) / "magistral_store"
+            with csv_path.open("w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(["Область", "Населений пункт", "Індекс НП", "Назва вулиці", "№ будинку"])
+                writer.writerow(["Київська", "с. Петрівка", "07010", "вул. Лесі Українки", "1, 3-а"])
+                writer.writerow(["Одеська", "с. Петрівка", "67000", "вул. Шкільна", ""])
+                writer.writerow(["Київська", "м. Біла Церква", "09100", "вул. Шевченка", "2"])
+
+            with patch.object(config, "MAGISTRAL_CSV_PATH", str(csv_path)), \
+                    patch.object(config, "MAGISTRAL_CACHE_PATH", str(Path(tmpdir) / "normalized_magistral.pkl")), \
+                    patch.object(config, "MAGISTRAL_STORE_DIR", str(store_dir)), \
+                    patch("search.magistral_loader.print"):
+                built = MagistralLoader()
+                expected = list(built.load(force_reload=True))
+
+                mapped = MagistralLoader()
+                records = mapped.load()
+                loaded_at_start = mapped._shards.loaded_regions
+                kyiv_region = mapped.normalizer.normalize_region("Київська")
+                petrivka = mapped.normalizer.normalize_city("Петрівка")
+                by_region_city = mapped.get_candidates_by_normalized_city(petrivka, kyiv_region)
+                loaded_for_region = mapped._shards.loaded_regions
+                ukrainky = mapped.get_candidates_by_street_tokens(petrivka, [mapped.normalizer.normalize_street("Українки")])
+                materialized = list(records)
+
+                (store_dir / "directory.pkl").write_bytes(b"broken")
+                fallback = MagistralLoader().load()
+
+        self.assertNotIsInstance(records, list)
+        self.assertEqual(loaded_at_start, [])
+        self.assertEqual(loaded_for_region, [kyiv_region])
+        self.assertEqual(materialized, expected)
+        self.assertEqual(len(mapped.index_by_city), len(built.index_by_city))
+        self.assertEqual(mapped.index_by_city[petrivka], [0, 1])
+        self.assertEqual(records[-1].building_bases, frozenset({"2"}))
+        self.assertEqual(dict(mapped.index_by_city), built.index_by_city)
+        self.assertEqual(dict(mapped.index_by_region_city), built.index_by_region_city)
+        self.assertEqual({key: mapped.index_by_city_prefix[key] for key in built.index_by_city_prefix},
+                         built.index_by_city_prefix)
+        self.assertEqual([r.city_index for r in ukrainky], ["07010"])
+        self.assertEqual([r.city_index for r in by_region_city], ["07010"])
+        self.assertIsInstance(fallback, list)
+        self.assertEqual(fallback, expected)
+
+    def test_parallel_rebuild_writes_same_cache_bytes_as_sequential(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_path = Path(tmpdir) / "magistral.csv"
+            with csv_path.open("w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(["Область", "Населений пункт", "Індекс НП", "Назва вулиці", "№ будинку"])
+                for i in range(40):
+                    writer.writerow([
+                        ("Київська", "Одеська", "Львівська")[i % 3],
+                        f"с. Петрівка {i % 7}",
+                        f"{7000 + i:05d}",
+                        f"вул. Шевченка {i % 11}",
+                        f"{i}, {i + 1}-а, 5/{i % 4}",
+                    ])
+
+            def rebuild(name, **overrides):
+                cache_path = Path(tmpdir) / f"{name}.pkl"
+                store_dir = Path(tmpdir) / name
+                with patch.object(config, "MAGISTRAL_CSV_PATH", str(csv_path)), \
+                        patch.object(config, "MAGISTRAL_CACHE_PATH", str(cache_path)), \
+                        patch.object(config, "MAGISTRAL_STORE_DIR", str(store_dir)), \
+                        patch.multiple(config, **overrides), \
+                        patch("search.magistral_loader.print"):
+                    MagistralLoader().load(force_reload=True)
+                # Shard file names carry a generation stamp; compare contents in shard order
+                shards = [path.read_bytes() for path in sorted(store_dir.glob("*.bin"))]
+                return cache_path.read_bytes(), shards
+
+            # Without the pool every record is normalized while it is read
+            with patch.object(MagistralLoader, "_normalize_unique_values", side_effect=AssertionError):
+                sequential = rebuild("sequential", REBUILD_WORKERS=1)
+            parallel = rebuild("parallel", REBUILD_WORKERS=2, REBUILD_PARALLEL_MIN_VALUES=0, REBUILD_CHUNK_SIZE=3)
+            # The first rows are normalized inline, the rest are deferred to the pool
+            mixed = rebuild("mixed", REBUILD_WORKERS=2, REBUILD_PARALLEL_MIN_VALUES=30, REBUILD_CHUNK_SIZE=3)
+
+        self.assertEqual(parallel[0], sequential[0])
+        self.assertEqual(len(sequential[1]), 3)
+        self.assertEqual(parallel[1], sequential[1])
+        self.assertEqual(mixed, sequential)
+
+    def test_load_regions_opens_only_requested_region_shards(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_path = Path(tmpdir) / "magistral.csv"
+            with csv_path.open("w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(["Область", "Населений пункт", "Індекс НП", "Назва вулиці", "№ будинку"])
+                writer.writerow(["Київська", "с. Петрівка", "07010", "вул. Шкільна", "1"])
+                writer.writerow(["Одеська", "с. Петрівка", "67000", "вул. Шкільна", "2"])
+                writer.writerow(["Львівська", "м. Львів", "79000", "вул. Городоцька", "3"])
+
+            with patch.object(config, "MAGISTRAL_CSV_PATH", str(csv_path)), \
+                    patch.object(config, "MAGISTRAL_CACHE_PATH", str(Path(tmpdir) / "normalized_magistral.pkl")), \
+                    patch.object(config, "MAGISTRAL_STORE_DIR", str(Path(tmpdir) / "magistral_store")), \
+                    patch("search.magistral_loader.print"):
+                built = MagistralLoader()
+                built.load(force_reload=True)
+                in_memory = built.load_regions(["Київська"])
+
+                loader = MagistralLoader()
+                loader.load()
+                opened = loader.load_regions(["Одеська обл.", "Невідома", "", "Одеська"])
+                loaded = loader._shards.loaded_regions
+
+        self.assertEqual(in_memory, 0)
+        self.assertEqual(opened, 1)
+        self.assertEqual(loaded, [loader.normalizer.normalize_region("Одеська")])
+
+
 if __name__ == "__main__":
     unittest.main()
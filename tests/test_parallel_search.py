@@ -0,0 +1,68 @@
+import os
+import time
+
+import pytest
+
+from models.address import Address
+from search.parallel_search import ParallelSearchEngine
+
+
+class FakeSearch:
+    """Пошук, що повертає номер будинку і pid процесу"""
+
+    def search_with_confidence(self, address, max_results=None):
+        if address.building == "bad":
+            raise ValueError("зламаний рядок")
+        if address.building == "slow":
+            time.sleep(0.5)
+        return {"building": address.building, "street": address.street, "pid": os.getpid()}
+
+    def search_many(self, addresses, max_results=None):
+        # Like HybridSearch.search_many, rewrites the addresses in place before searching
+        for address in addresses:
+            address.street = "normalized " + address.street
+        return [self.search_with_confidence(address, max_results) for address in addresses]
+
+
+@pytest.fixture
+def engine():
+    # Spawned workers import this module and build their own FakeSearch
+    engine = ParallelSearchEngine(FakeSearch, max_workers=2, chunk_size=3)
+    yield engine
+    engine.close()
+
+
+def test_results_are_merged_in_input_order(engine):
+    addresses = [Address(building=str(number)) for number in range(20)]
+    progress = []
+
+    results = list(engine.search_many(addresses, on_progress=lambda done, total: progress.append((done, total))))
+
+    assert [position for position, _ in results] == list(range(20))
+    assert [result["building"] for _, result in results] == [str(number) for number in range(20)]
+    assert all(result["pid"] != os.getpid() for _, result in results)
+    assert progress[-1] == (20, 20)
+
+
+def test_failed_row_does_not_break_its_chunk(engine):
+    addresses = [Address(street="Main", building="1"), Address(building="bad"), Address(street="Main", building="3")]
+
+    results = dict(engine.search_many(addresses))
+
+    assert results[0]["building"] == "1"
+    assert results[1] == {"error": "зламаний рядок"}
+    assert results[2]["building"] == "3"
+    # The per-row retry searches the addresses as they were before the failed batch
+    assert results[2]["street"] == "Main"
+
+
+def test_stop_request_cancels_remaining_chunks(engine):
+    addresses = [Address(building="slow") for _ in range(30)]
+
+    started = time.monotonic()
+    results = list(engine.search_many(addresses, should_stop=lambda: True))
+
+    assert results == []
+    assert time.monotonic() - started < 2
+    # Пул придатний для наступного запуску
+    assert [result["building"] for _, result in engine.search_many([Address(building="7")])] == ["7"]
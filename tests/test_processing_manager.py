@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import unittest
 
 import pandas as pd
@@ -37,35 +38,93 @@ class TestProcessingManager(unittest.TestCase):
         undo = UndoManager()
         return ProcessingManager(handler, undo), handler, undo
 
-    def test_auto_processing_skips_rows_that_already_differ_from_old_index(self):
+    def run_background(self, manager, **kwargs):
+        finished = []
+        self.assertTrue(manager.start_background_processing(
+            0, len(manager.excel_handler.df),
+            on_finished=finished.append,
+            **kwargs
+        ))
+        deadline = time.monotonic() + 5
+        while not finished and not manager.semi_auto_waiting and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+        while manager._worker is not None and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+        return finished
+
+    def test_background_processing_applies_results_in_gui_thread(self):
         manager, handler, _ = self.make_manager()
         handler.df.loc[1, "index"] = "79001"
-
-        def search_func(address, auto_apply):
-            return {
-                "mode": "auto",
-                "applied": True,
-                "auto_result": {
-                    "index": "02002",
-                    "city": address.city,
-                    "street": address.street,
-                    "building": address.building,
-                    "not_working": "",
-                },
-                "total_found": 1,
-                "manual_results": [],
-            }
+        searched = []
+
+        def search_rows(addresses, auto_apply=False, should_stop=None, parallel=True):
+            addresses = list(addresses)
+            searched.extend(address.city for address in addresses)
+            for position, address in enumerate(addresses):
+                yield position, {
+                    "mode": "auto",
+                    "applied": auto_apply,
+                    "auto_result": {"index": "02002", "city": address.city, "street": "", "building": "", "confidence": 99},
+                    "total_found": 1,
+                    "manual_results": [],
+                }
 
         processed = []
         manager.on_row_processed = lambda row, index, mode: processed.append((row, index, mode))
 
-        stats = manager.start_auto_processing(0, len(handler.df), search_func)
+        finished = self.run_background(manager, search_rows=search_rows)
 
+        self.assertEqual(searched, ["Kyiv"])
         self.assertEqual(handler.df.loc[0, "index"], "02002")
         self.assertEqual(handler.df.loc[1, "index"], "79001")
-        self.assertEqual(stats["auto_applied"], 1)
-        self.assertEqual(stats["skipped"], 1)
         self.assertEqual(processed, [(0, "02002", "auto")])
+        self.assertEqual(len(finished), 1)
+        self.assertEqual(finished[0]["auto_applied"], 1)
+        self.assertEqual(finished[0]["skipped"], 1)
+
+    def test_background_semi_auto_pauses_on_manual_row_and_continues(self):
+        manager, handler, _ = self.make_manager()
+
+        def search_rows(addresses, auto_apply=False, should_stop=None, parallel=True):
+            self.assertFalse(parallel)
+            for position, address in enumerate(addresses):
+                yield position, {
+                    "mode": "manual",
+                    "applied": False,
+                    "auto_result": None,
+                    "total_found": 2,
+                    "manual_results": [{"index": address.index}],
+                }
+
+        paused = []
+        manager.on_semi_auto_pause = lambda row, results: paused.append((row, results))
+        snapshots = []
+        snapshot_rows = handler.snapshot_rows
+        handler.snapshot_rows = lambda *args: snapshots.append(args) or snapshot_rows(*args)
+
+        def read_row(row_idx):
+            raise AssertionError("rows must come from the snapshot, not the DataFrame")
+
+        handler.get_address_from_row = read_row
+
+        finished = self.run_background(manager, search_rows=search_rows, semi_auto=True)
+
+        self.assertEqual(finished, [])
+        self.assertTrue(manager.semi_auto_waiting)
+        self.assertEqual(paused, [(0, [{"index": "01001"}])])
+
+        self.assertTrue(manager.continue_background_processing())
+        deadline = time.monotonic() + 5
+        while (len(paused) < 2 or manager._worker is not None) and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.01)
+
+        self.assertEqual(paused[1][0], 1)
+        self.assertEqual(manager.stats["manual_required"], 2)
+        # Continuing reuses the unread tail of the first snapshot
+        self.assertEqual(len(snapshots), 1)
 
     def test_apply_index_pushes_undo_and_updates_dataframe(self):
         manager, handler, undo = self.make_manager()
@@ -0,0 +1,61 @@
+import pytest
+
+from models.magistral_record import MagistralRecord
+from search.reference_store import ReferenceStoreError
+from search.region_shards import RegionShards, ShardedIndex, write_region_shards
+
+
+def make_records():
+    # Regions interleave so that records of one shard are not contiguous
+    rows = [("київ", "петрівка"), ("одес", "петрівка"), ("київ", "біла церква"), ("одес", "ізмаїл"), ("київ", "петрівка")]
+    records = []
+    for region, city in rows:
+        record = MagistralRecord(region=region, city=city)
+        record.normalized_region = region
+        record.normalized_city = city
+        records.append(record)
+    return records
+
+
+def write_store(tmp_path, records):
+    index_by_city = {}
+    index_by_region = {}
+    for i, record in enumerate(records):
+        index_by_city.setdefault(record.normalized_city, []).append(i)
+        index_by_region.setdefault(record.normalized_region, []).append(i)
+    write_region_shards(
+        str(tmp_path), records, {"index_by_city": index_by_city, "index_by_region": index_by_region},
+        cache_version=1, routed=("index_by_city",),
+    )
+    return index_by_city
+
+
+def test_sharded_views_match_full_index_and_open_only_routed_shards(tmp_path):
+    records = make_records()
+    index_by_city = write_store(tmp_path, records)
+
+    shards = RegionShards(str(tmp_path), cache_version=1)
+    cities = shards.routes["index_by_city"]
+    by_city = ShardedIndex(shards, "index_by_city", lambda key: cities.get(key, ()), keys=cities.keys)
+    by_region = ShardedIndex(shards, "index_by_region", shards.shards_for_region)
+
+    assert list(by_city) == list(index_by_city)
+    assert len(by_city) == 3
+    assert by_city["ізмаїл"] == [3]
+    assert shards.loaded_regions == ["одес"]
+    assert by_city["петрівка"] == [0, 1, 4]
+    assert "львів" not in by_city and "київ" in by_region
+    assert [r.city for r in shards.records] == [r.city for r in records]
+    assert shards.records[-1].city == "петрівка"
+    assert shards.load_regions(["київ", "львів"]) == 1
+
+
+def test_changed_shard_file_is_rejected_at_open(tmp_path):
+    write_store(tmp_path, make_records())
+    shard_file = next(tmp_path.glob("*.bin"))
+    shard_file.write_bytes(shard_file.read_bytes() + b"\0")
+
+    with pytest.raises(ReferenceStoreError):
+        RegionShards(str(tmp_path), cache_version=1)
+    with pytest.raises(ReferenceStoreError):
+        RegionShards(str(tmp_path / "missing"), cache_version=1)
@@ -1,8 +1,13 @@
+import os
+import tempfile
 import unittest
 import importlib.util
 from pathlib import Path
 from types import SimpleNamespace
 
+from models.address import Address
+from utils.cache_manager import CacheManager
+
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 SEARCH_MANAGER_PATH = PROJECT_ROOT / "ui" / "managers" / "search_manager.py"
@@ -57,6 +62,148 @@ class TestSearchManager(unittest.TestCase):
         self.assertEqual(manager.search_engine.magistral_records, ["fresh"])
         self.assertTrue(manager.search_engine._is_loaded)
 
+    def test_warm_up_regions_preloads_in_background_thread(self):
+        manager = SearchManager.__new__(SearchManager)
+        manager.logger = StubLogger()
+        preloaded = []
+        manager.search_engine = SimpleNamespace(preload_regions=lambda regions: preloaded.append(regions) or len(regions))
+
+        thread = manager.warm_up_regions(["Київська", "Одеська"])
+        thread.join()
+
+        self.assertEqual(preloaded, [["Київська", "Одеська"]])
+        self.assertIsNone(manager.warm_up_regions([]))
+
+    def make_batch_manager(self, searched):
+        manager = SearchManager.__new__(SearchManager)
+        manager.logger = StubLogger()
+        manager._log_search_request = lambda address: None
+        manager._log_search_results_detailed = lambda address, result: None
+        manager.parallel_engine = None
+        manager.last_results = []
+        manager.last_search_response = None
+
+        class FakeEngine:
+            def search_with_confidence(self, address, max_results=None):
+                searched.append(address.city)
+                return {'search_mode': 'manual', 'auto': None, 'manual': [{'city': address.city}], 'total_found': 1}
+
+        manager.search_engine = FakeEngine()
+        return manager
+
+    def test_search_rows_with_auto_uses_pool_for_large_runs(self):
+        searched = []
+        manager = self.make_batch_manager(searched)
+
+        class FakePool:
+            max_workers = 2
+
+            def search_many(self, addresses, max_results=None, on_progress=None, should_stop=None):
+                yield 0, {'search_mode': 'manual', 'auto': None, 'manual': [], 'total_found': 0}
+                yield 1, {'error': 'boom'}
+
+        manager.parallel_engine = FakePool()
+        config = search_manager_module.config
+        original = config.PARALLEL_MIN_ROWS
+        config.PARALLEL_MIN_ROWS = 2
+        try:
+            sequential = list(manager.search_rows_with_auto([Address(city="a")]))
+            parallel = list(manager.search_rows_with_auto([Address(city="a"), Address(city="b")]))
+        finally:
+            config.PARALLEL_MIN_ROWS = original
+
+        self.assertEqual(searched, ["a"])
+        self.assertEqual(sequential[0][1]['manual_results'], [{'city': "a"}])
+        self.assertEqual([position for position, _ in parallel], [0, 1])
+        self.assertEqual(parallel[0][1]['mode'], 'manual')
+        self.assertEqual(parallel[1][1]['mode'], 'none')
+        self.assertEqual(parallel[1][1]['error'], 'boom')
+
+    def test_search_rows_with_auto_searches_repeated_addresses_once(self):
+        rows = [
+            Address(city="Київ", street="Хрещатик", building="1"),
+            Address(city=" київ ", street="Хрещатик", building="1"),
+            Address(city="Львів", street="Хрещатик", building="1"),
+            Address(city="Київ", street="Хрещатик", building="2"),
+            Address(city="КИЇВ", street="Хрещатик  ", building="1"),
+        ]
+
+        for parallel in (True, False):
+            searched = []
+            manager = self.make_batch_manager(searched)
+
+            results = list(manager.search_rows_with_auto(iter(rows) if not parallel else rows, parallel=parallel))
+
+            self.assertEqual(searched, ["Київ", "Львів", "Київ"])
+            self.assertEqual([position for position, _ in results], [0, 1, 2, 3, 4])
+            self.assertEqual(
+                [response.get('deduplicated', False) for _, response in results],
+                [False, True, False, False, True],
+            )
+            self.assertEqual(results[4][1]['manual_results'], [{'city': "Київ"}])
+            # Batch search runs on the worker thread and leaves the interactive state alone
+            self.assertEqual(manager.last_results, [])
+            self.assertIsNone(manager.last_search_response)
+
+    def test_search_rows_with_auto_serves_stored_results_before_searching(self):
+        config = search_manager_module.config
+        original = config.ENABLE_SEARCH_CACHE
+        config.ENABLE_SEARCH_CACHE = True
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                cache = CacheManager(os.path.join(tmp, "cache.sqlite"), fingerprint="v1")
+                rows = [Address(city="Київ", building="1"), Address(city="Львів", building="1")]
+
+                searched = []
+                manager = self.make_batch_manager(searched)
+                manager.result_cache = cache
+                list(manager.search_rows_with_auto(rows[:1]))
+
+                searched.clear()
+                results = list(manager.search_rows_with_auto(rows))
+                cache.close()
+            finally:
+                config.ENABLE_SEARCH_CACHE = original
+
+        self.assertEqual(searched, ["Львів"])
+        self.assertEqual(results[0][1]['manual_results'], [{'city': "Київ"}])
+        self.assertEqual(results[1][1]['manual_results'], [{'city': "Львів"}])
+
+    def test_search_with_auto_preprocesses_address_before_result_cache(self):
+        config = search_manager_module.config
+        original = config.ENABLE_SEARCH_CACHE
+        config.ENABLE_SEARCH_CACHE = True
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                searched = []
+                manager = self.make_batch_manager(searched)
+                manager.result_cache = CacheManager(os.path.join(tmp, "cache.sqlite"), fingerprint="v1")
+
+                def preprocess_address(address):
+                    # Mimics HybridSearch: split the building off the street, in place
+                    if not address.building and " " in address.street:
+                        address.street, address.building = address.street.rsplit(" ", 1)
+
+                manager.search_engine.preprocess_address = preprocess_address
+
+                manager.search_with_auto(Address(city="Київ", street="Хрещатик 1"))
+                hit = Address(city="Київ", street="Хрещатик 1")
+                response = manager.search_with_auto(hit)
+                split = manager.search_with_auto(Address(city="Київ", street="Хрещатик", building="1"))
+                # Batch paths share the interactive key and leave the row processed the same way
+                batch_rows = [Address(city="Київ", street="Хрещатик 1"), Address(city="Київ", street="Хрещатик 1")]
+                list(manager.search_rows_with_auto(batch_rows[:1]))
+                list(manager.search_rows_with_auto(iter(batch_rows[1:]), parallel=False))
+                manager.result_cache.close()
+            finally:
+                config.ENABLE_SEARCH_CACHE = original
+
+        self.assertEqual(searched, ["Київ"])
+        self.assertEqual((hit.street, hit.building), ("Хрещатик", "1"))
+        self.assertEqual([(row.street, row.building) for row in batch_rows], [("Хрещатик", "1")] * 2)
+        self.assertEqual(response['manual_results'], [{'city': "Київ"}])
+        self.assertIs(manager.last_search_response, split)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,6 @@
 from models.address import Address
 from search.hybrid_search import HybridSearch
-from tools.analyze_search_quality import build_issue_tags, compact_result, summarize
+from tools.analyze_search_quality import analyze_rows, build_issue_tags, compact_result, summarize
 
 
 def test_compact_result_handles_missing_result():
@@ -34,3 +34,25 @@ def test_summarize_counts_modes_and_tags():
     assert summary["rows_analyzed"] == 2
     assert summary["modes"] == {"auto": 1, "manual": 1}
     assert summary["issue_tags"]["placeholder_index"] == 2
+
+
+def test_analyze_rows_keeps_row_order_and_original_input():
+    class FakeSearch(HybridSearch):
+        def search_many(self, addresses, max_results=None):
+            results = []
+            for address in addresses:
+                address.street = address.street.replace(" 27", "")
+                results.append({"search_mode": "auto", "total_found": 1, "auto": {"index": address.city}, "manual": []})
+            return results
+
+    search = FakeSearch(lazy_load=True)
+    addresses = [Address(city="01001", street="Хрещатик 27"), Address(city="08133", street="Центральна")]
+
+    rows = analyze_rows([4, 9], addresses, search, max_results=5)
+
+    assert [row["row_number"] for row in rows] == [5, 10]
+    assert [row["auto_index"] for row in rows] == ["01001", "08133"]
+    assert rows[0]["input_street"] == "Хрещатик 27"
+    assert rows[0]["processed_street"] == "Хрещатик"
+    assert "street_cleaned" in rows[0]["issue_tags"]
+    assert addresses[0].street == "Хрещатик 27"
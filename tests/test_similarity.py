@@ -0,0 +1,30 @@
+from search.similarity import SimilarityCalculator
+
+
+def test_token_similarity_cache_counts_hits_and_misses():
+    similarity = SimilarityCalculator(cache_size=10)
+
+    first = similarity.token_similarity("шевченка", "шевчука")
+    second = similarity.token_similarity("шевченка", "шевчука")
+    similarity.token_similarity("франка", "шевчука")
+
+    assert first == second == SimilarityCalculator.token_similarity("шевченка", "шевчука")
+    assert similarity.cache_info() == {'hits': 1, 'misses': 2, 'size': 2, 'max_size': 10}
+
+
+def test_token_similarity_cache_is_bounded_and_clearable():
+    similarity = SimilarityCalculator(cache_size=2)
+    for street in ("франка", "шевченка", "грушевського"):
+        similarity.token_similarity("киів", street)
+
+    assert similarity.cache_info()['size'] == 2
+
+    similarity.clear_cache()
+    assert similarity.cache_info() == {'hits': 0, 'misses': 0, 'size': 0, 'max_size': 2}
+
+
+def test_zero_cache_size_disables_memo():
+    similarity = SimilarityCalculator(cache_size=0)
+
+    assert similarity.token_similarity("одеса", "одеса") == 1.0
+    assert similarity.cache_info() == {'hits': 0, 'misses': 0, 'size': 0, 'max_size': 0}
@@ -0,0 +1,126 @@
+import itertools
+
+import pytest
+
+from search.similarity import SimilarityCalculator
+from search.similarity_backends import (
+    PythonSimilarityBackend,
+    RapidFuzzSimilarityBackend,
+    get_backend,
+)
+
+
+def reference_jaro(s1, s2):
+    """Початкова реалізація SimilarityCalculator._jaro_similarity"""
+    len1, len2 = len(s1), len(s2)
+    if len1 == 0 or len2 == 0:
+        return 0.0
+    match_window = max(0, max(len1, len2) // 2 - 1)
+    s1_matches = [False] * len1
+    s2_matches = [False] * len2
+    matches = 0
+    transpositions = 0
+    for i in range(len1):
+        start = max(0, i - match_window)
+        end = min(i + match_window + 1, len2)
+        for j in range(start, end):
+            if s2_matches[j] or s1[i] != s2[j]:
+                continue
+            s1_matches[i] = s2_matches[j] = True
+            matches += 1
+            break
+    if matches == 0:
+        return 0.0
+    k = 0
+    for i in range(len1):
+        if not s1_matches[i]:
+            continue
+        while not s2_matches[k]:
+            k += 1
+        if s1[i] != s2[k]:
+            transpositions += 1
+        k += 1
+    return (matches / len1 + matches / len2 + (matches - transpositions / 2) / matches) / 3
+
+
+def reference_jaro_winkler(s1, s2, scaling=0.1):
+    if not s1 or not s2:
+        return 0.0
+    s1, s2 = s1.lower(), s2.lower()
+    if s1 == s2:
+        return 1.0
+    jaro = reference_jaro(s1, s2)
+    if jaro < 0.7:
+        return jaro
+    prefix = 0
+    for i in range(min(len(s1), len(s2), 4)):
+        if s1[i] == s2[i]:
+            prefix += 1
+        else:
+            break
+    return jaro + (prefix * scaling * (1 - jaro))
+
+
+def reference_levenshtein(s1, s2):
+    if not s1:
+        return len(s2)
+    if not s2:
+        return len(s1)
+    if len(s1) < len(s2):
+        return reference_levenshtein(s2, s1)
+    previous_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        current_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            current_row.append(min(previous_row[j + 1] + 1, current_row[j] + 1, previous_row[j] + (c1 != c2)))
+        previous_row = current_row
+    return previous_row[-1]
+
+
+def reference_token_similarity(s1, s2):
+    if not s1 or not s2:
+        return 0.0
+    tokens1 = sorted(t for t in s1.lower().split() if len(t) > 1)
+    tokens2 = sorted(t for t in s2.lower().split() if len(t) > 1)
+    if not tokens1 or not tokens2:
+        return reference_jaro_winkler(s1, s2)
+    return reference_jaro_winkler(" ".join(tokens1), " ".join(tokens2))
+
+
+NAMES = [
+    "київ", "киів", "київська", "київець", "харків", "харківська", "одеса", "одесса", "дніпро",
+    "дніпропетровськ", "львів", "львівська", "запоріжжя", "запорожжя", "житомир", "ірпінь",
+    "біла церква", "кам'янець-подільський", "камянець подільський", "івано-франківськ",
+    "шевченка", "тараса шевченка", "шевченко", "шевчука", "лесі украінки", "лесі українки",
+    "украінки лесі", "хрещатик", "хрещатік", "грушевського", "грушевсього", "бандери",
+    "степана бандери", "героів майдану", "героїв майдану", "перемоги", "незалежності",
+    "соборна", "садова", "ст. бандери", "вул", "а", "аб", "ба", "ї", "ґанок", "єдності",
+    "Київ", "ХРЕЩАТИК", "пр-т перемоги", "1", "",
+]
+PAIRS = list(itertools.product(NAMES, repeat=2))
+
+
+@pytest.mark.parametrize("backend", [PythonSimilarityBackend, RapidFuzzSimilarityBackend], ids=lambda b: b.name)
+def test_backend_kernels_match_reference(backend):
+    if not backend.available():
+        pytest.skip(f"{backend.name} не встановлено")
+
+    for s1, s2 in PAIRS:
+        assert backend.jaro(s1, s2) == reference_jaro(s1, s2), (s1, s2)
+        assert backend.levenshtein(s1, s2) == reference_levenshtein(s1, s2), (s1, s2)
+
+
+def test_similarity_calculator_matches_reference_on_corpus():
+    for s1, s2 in PAIRS:
+        assert SimilarityCalculator.jaro_winkler_similarity(s1, s2) == reference_jaro_winkler(s1, s2), (s1, s2)
+        assert SimilarityCalculator.token_similarity(s1, s2) == reference_token_similarity(s1, s2), (s1, s2)
+        assert SimilarityCalculator.levenshtein_distance(s1, s2) == reference_levenshtein(s1, s2), (s1, s2)
+
+
+def test_get_backend_falls_back_to_python(monkeypatch):
+    monkeypatch.setattr(RapidFuzzSimilarityBackend, "available", staticmethod(lambda: False))
+
+    assert get_backend("auto") is PythonSimilarityBackend
+    assert get_backend("rapidfuzz") is PythonSimilarityBackend
+    assert get_backend("python") is PythonSimilarityBackend
+    assert SimilarityCalculator.backend_name() in {"python", "rapidfuzz"}
@@ -0,0 +1,20 @@
+from search.street_fuzzy_index import StreetDeletionIndex
+
+
+def test_lookup_returns_streets_within_edit_distance():
+    index = StreetDeletionIndex(["шевченка", "шевчука", "франка", "лесі украінки"])
+
+    assert index.lookup("шевченка") == [("шевченка", 0), ("шевчука", 2)]
+    assert index.lookup("шевченка", max_distance=1) == [("шевченка", 0)]
+    assert index.lookup("шевчеенка") == [("шевченка", 1)]
+    assert index.lookup("шевчнка")[0] == ("шевченка", 1)
+    assert index.lookup("лесі укаінки") == [("лесі украінки", 1)]
+
+
+def test_lookup_respects_max_distance():
+    index = StreetDeletionIndex(["грушевського"], max_distance=2)
+
+    assert index.lookup("грушевскго") == [("грушевського", 2)]
+    assert index.lookup("грушевскго", max_distance=1) == []
+    assert index.lookup("грщвскго") == []
+    assert index.lookup("") == []
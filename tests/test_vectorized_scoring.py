@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from models.address import Address
+from models.magistral_record import MagistralRecord
+from search.hybrid_search import HybridSearch
+
+
+RECORDS = [
+    ("Київ", "м. Київ", "бульв. Лесі Українки", "25,27,29", "01133"),
+    ("Київ", "м. Київ", "вул. Лесі Українки", "27А,31", "01133"),
+    ("Київ", "м. Київ", "вул. Хрещатик", "1,3,5", "01001"),
+    ("Київська", "м. Бровари", "вул. Київська", "10,12", "07400"),
+    ("Київська", "с. Київець", "вул. Шевченка", "", "07401"),
+    ("Одеська", "м. Одеса", "просп. Шевченка", "4/1,6", "65044"),
+    ("Одеська", "м. Одеса", "вул. Шевченка", "4,8", "65045"),
+    ("Одеська", "м. Одеса", "", "", "65000"),
+    ("Львівська", "м. Львів", "вул. Івана Франка", "12,14А", "79005"),
+    ("", "м. Львів", "пл. Ринок", "1", ""),
+]
+
+QUERIES = [
+    Address(city="Київ", street="бульв. Лесі Українки", building="27А", region="Київ", index="01133"),
+    Address(city="Київ", street="Лесі Українки", building="27"),
+    Address(city="Київ", street="Хрещатик", building="2", index="01001"),
+    Address(city="Одеса", street="Шевченка", building="4", region="Одеська"),
+    Address(city="Одеса", street="просп. Шевченка", building="4/1", index="65044"),
+    Address(city="Одесса", street="Шевченко", building="8", region="Київська"),
+    Address(city="Львів", street="Франка", building="14", index="79005"),
+    Address(city="Бровари", street="Київська", building="12", region="Київська"),
+    Address(street="Шевченка", building="4"),
+    Address(city="Київ"),
+]
+
+
+@pytest.fixture
+def search():
+    search = HybridSearch(lazy_load=True)
+    search.classifier = None
+    return search
+
+
+@pytest.fixture
+def records(search):
+    normalizer = search.normalizer
+    records = []
+    for region, city, street, buildings, index in RECORDS:
+        record = MagistralRecord(region=region, city=city, street=street, buildings=buildings, city_index=index)
+        record.normalized_city = normalizer.normalize_city(city)
+        record.normalized_street = normalizer.normalize_street(street)
+        record.normalized_region = normalizer.normalize_region(region)
+        if buildings:
+            record.normalized_buildings, record.building_bases = normalizer.building_sets(buildings)
+        records.append(record)
+    return records
+
+
+@pytest.mark.parametrize("address", QUERIES, ids=lambda address: address.get_full_address())
+def test_vectorized_scores_match_scalar_path(search, records, address):
+    query = search._compile_query(address)
+
+    scalar = [search._calculate_score_strict(address, record, query) for record in records]
+    vectorized = search.vectorized_scorer.score(query, records)
+
+    assert vectorized == pytest.approx(scalar, abs=1e-9)
+
+
+def test_top_scored_candidates_follows_config_switch(search, records, monkeypatch):
+    import config
+
+    address = QUERIES[0]
+    query = search._compile_query(address)
+    calls = []
+    score = search.vectorized_scorer.score
+    monkeypatch.setattr(search.vectorized_scorer, "score", lambda *args: calls.append(args) or score(*args))
+
+    monkeypatch.setattr(config, "VECTORIZED_SCORING", False)
+    scalar = search._top_scored_candidates(address, records, query, limit=5)
+    assert calls == []
+
+    monkeypatch.setattr(config, "VECTORIZED_SCORING", True)
+    vectorized = search._top_scored_candidates(address, records, query, limit=5)
+    assert [record for record, _ in vectorized] == [record for record, _ in scalar]
+    assert [score for _, score in vectorized] == pytest.approx([score for _, score in scalar], abs=1e-9)
+    assert len(calls) == 1
+    assert search.vectorized_scorer.score(query, []) == []
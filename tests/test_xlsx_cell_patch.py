@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from handlers.xlsx_cell_patch import UnsupportedWorkbookLayout, patch_first_sheet
+
+
+def make_workbook(path):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Дані"
+    sheet.append(["id", "city", "index", "date"])
+    sheet.append([1, "Київ", "01001", datetime(2024, 1, 2)])
+    sheet.append([2, "Львів"])
+    sheet.cell(5, 1).value = 4
+    sheet["B2"].font = Font(bold=True)
+    sheet["D2"].number_format = "yyyy-mm-dd"
+    sheet.column_dimensions["B"].width = 30
+    workbook.create_sheet("Інший")["A1"] = "keep"
+    workbook.save(path)
+
+
+def test_patch_writes_only_given_cells_as_text(tmp_path):
+    source = tmp_path / "source.xlsx"
+    target = tmp_path / "target.xlsx"
+    make_workbook(source)
+
+    patch_first_sheet(str(source), str(target), {
+        (2, 2): "Київ & область",
+        (2, 3): "01002",
+        (3, 3): "79000",
+        (4, 2): "Нове",
+        (5, 1): "",
+    })
+
+    workbook = load_workbook(target)
+    sheet = workbook.worksheets[0]
+    assert sheet["B2"].value == "Київ & область"
+    assert sheet["B2"].font.b
+    assert sheet["B2"].number_format == "@"
+    assert sheet["C2"].value == "01002"
+    assert sheet["C3"].value == "79000"
+    assert sheet["B4"].value == "Нове"
+    assert sheet["A5"].value is None
+    assert sheet["A2"].value == 1
+    assert sheet["D2"].value == datetime(2024, 1, 2)
+    assert sheet["D2"].number_format == "yyyy-mm-dd"
+    assert sheet.column_dimensions["B"].width == 30
+    assert workbook["Інший"]["A1"].value == "keep"
+
+
+def test_patch_refuses_to_overwrite_formulas(tmp_path):
+    source = tmp_path / "source.xlsx"
+    workbook = Workbook()
+    workbook.active["A1"] = "=1+1"
+    workbook.save(source)
+
+    with pytest.raises(UnsupportedWorkbookLayout):
+        patch_first_sheet(str(source), str(tmp_path / "target.xlsx"), {(1, 1): "2"})
@@ -26,6 +26,7 @@ from search.hybrid_search import HybridSearch
 
 
 PLACEHOLDER_INDEXES = {"", "*", "00000", "01000"}
+BATCH_SIZE = 500
 REPORT_COLUMNS = [
     "row_number",
     "mode",
@@ -160,6 +161,32 @@ def analyze_row(
     original = clone_address(address)
     processed = clone_address(address)
     result = search.search_with_confidence(processed, max_results=max_results)
+    return build_report_row(row_index, original, processed, result, search)
+
+
+def analyze_rows(
+    row_indexes: List[int],
+    addresses: List[Address],
+    search: HybridSearch,
+    max_results: int,
+) -> List[Dict[str, Any]]:
+    """Batch variant of analyze_row: rows of the same city share candidates via search_many."""
+    originals = [clone_address(address) for address in addresses]
+    processed = [clone_address(address) for address in addresses]
+    results = search.search_many(processed, max_results=max_results)
+    return [
+        build_report_row(row_index, original, processed_address, result, search)
+        for row_index, original, processed_address, result in zip(row_indexes, originals, processed, results)
+    ]
+
+
+def build_report_row(
+    row_index: int,
+    original: Address,
+    processed: Address,
+    result: Dict[str, Any],
+    search: HybridSearch,
+) -> Dict[str, Any]:
     manual_results = result.get("manual", [])
     auto_result = result.get("auto")
     top = [compact_result(r) for r in manual_results[:3]]
@@ -289,11 +316,11 @@ def main() -> int:
     end_idx = len(excel.df) if args.limit == 0 else min(len(excel.df), start_idx + args.limit)
     rows = []
 
-    for row_idx in range(start_idx, end_idx):
-        address = excel.get_address_from_row(row_idx)
-        rows.append(quiet_call(args.verbose, analyze_row, row_idx, address, search, args.max_results))
-        if len(rows) % 25 == 0:
-            print(f"Analyzed {len(rows)} rows...", flush=True)
+    for batch_start in range(start_idx, end_idx, BATCH_SIZE):
+        row_indexes = list(range(batch_start, min(batch_start + BATCH_SIZE, end_idx)))
+        addresses = [excel.get_address_from_row(row_idx) for row_idx in row_indexes]
+        rows.extend(quiet_call(args.verbose, analyze_rows, row_indexes, addresses, search, args.max_results))
+        print(f"Analyzed {len(rows)} rows...", flush=True)
 
     output_path = Path(args.output) if args.output else default_output_path()
     output_path.parent.mkdir(parents=True, exist_ok=True)
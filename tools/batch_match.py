@@ -0,0 +1,199 @@
+"""Match postal indexes for a whole Excel file without the GUI.
+
+Usage:
+    python -m tools.batch_match input.xlsx --mapping Vodafon --workers 4
+
+Rows are searched in batches through SearchManager (address deduplication,
+result cache, process pool) and indexes are written back with the same rules
+as auto-processing in the UI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import config
+from handlers.excel_handler import ExcelHandler
+from tools.analyze_search_quality import configure_console_logging, load_mapping, quiet_call
+from ui.managers.search_manager import SearchManager
+from utils.index_rules import auto_index
+from utils.logger import Logger
+
+
+BATCH_SIZE = 2000
+
+
+def default_output_path(input_path: Path) -> Path:
+    return input_path.with_name(f"{input_path.stem}_matched{input_path.suffix}")
+
+
+def match_rows(
+    excel: ExcelHandler,
+    search_rows: Callable,
+    start: int,
+    end: int,
+    min_confidence: int = 0,
+    max_results: int = 20,
+    batch_size: int = BATCH_SIZE,
+    on_batch: Optional[Callable[[int, Dict[str, int]], None]] = None,
+) -> Dict[str, int]:
+    """Search rows [start, end) and write auto-applied indexes into excel.df."""
+    stats = {
+        "total": max(end - start, 0),
+        "auto_applied": 0,
+        "manual_required": 0,
+        "not_found": 0,
+        "skipped": 0,
+        "errors": 0,
+        "searches_saved": 0,
+    }
+
+    for batch_start in range(start, end, batch_size):
+        batch_end = min(batch_start + batch_size, end)
+        row_indexes = []
+        addresses = []
+        for row_idx in range(batch_start, batch_end):
+            # An unreadable row is an error for the summary, not a reason to stop the run
+            try:
+                address = excel.get_address_from_row(row_idx)
+            except Exception as e:
+                Logger().error(f"Row {row_idx + 1}: failed to read address: {e}")
+                stats["errors"] += 1
+                continue
+            if not address or address.is_empty():
+                stats["skipped"] += 1
+                continue
+            row_indexes.append(row_idx)
+            addresses.append(address)
+
+        for position, response in search_rows(addresses, max_results=max_results, auto_apply=True):
+            if response.get("deduplicated"):
+                stats["searches_saved"] += 1
+            if response.get("error"):
+                stats["errors"] += 1
+                continue
+
+            index = auto_index(response, min_confidence)
+            if index:
+                excel.update_row(row_indexes[position], {"index": index})
+                stats["auto_applied"] += 1
+            elif response["mode"] == "none":
+                stats["not_found"] += 1
+            else:
+                stats["manual_required"] += 1
+
+        if on_batch:
+            on_batch(batch_end - start, stats)
+
+    return stats
+
+
+def save_result(excel: ExcelHandler, output_path: Path) -> str:
+    """Edit the source workbook in place when possible, otherwise rewrite the table."""
+    try:
+        return excel.save_preserving_original_workbook(excel.df, str(output_path))
+    except ValueError:
+        return excel.write_dataframe(excel.df, str(output_path), include_header=excel.has_header)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Fill postal indexes in an Excel file using the offline matcher."
+    )
+    parser.add_argument("input", help="Excel file to process.")
+    parser.add_argument(
+        "--mapping",
+        required=True,
+        help="Mapping JSON path or saved mapping name from column_mappings/.",
+    )
+    parser.add_argument("--output", default=None, help="Output path. Defaults to <input>_matched.<ext>.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=f"Search processes. Defaults to config.MAX_WORKERS ({config.MAX_WORKERS}).",
+    )
+    parser.add_argument("--min-confidence", type=int, default=0, help="Minimum confidence to write an index.")
+    parser.add_argument("--start", type=int, default=1, help="1-based first row to process.")
+    parser.add_argument("--limit", type=int, default=0, help="Maximum rows to process. Use 0 for all rows.")
+    parser.add_argument("--max-results", type=int, default=20, help="Manual candidates to keep per row.")
+    parser.add_argument("--summary", default=None, help="Also write the summary as JSON to this path.")
+    parser.add_argument("--verbose", action="store_true", help="Show detailed search logs.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    configure_console_logging(args.verbose)
+    input_path = Path(args.input)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    mapping = load_mapping(args.mapping)
+    excel = ExcelHandler()
+    quiet_call(args.verbose, excel.load_file, str(input_path))
+    quiet_call(args.verbose, excel.set_column_mapping, mapping)
+    if "index" not in excel.column_mapping:
+        print("Mapping has no index column to write results into.", file=sys.stderr)
+        return 2
+
+    if args.workers is not None:
+        config.MAX_WORKERS = max(args.workers, 1)
+
+    search_manager = SearchManager()
+    search_manager.log_queries = args.verbose
+    quiet_call(args.verbose, search_manager.search_engine._ensure_loaded)
+
+    start_idx = max(args.start - 1, 0)
+    end_idx = len(excel.df) if args.limit == 0 else min(len(excel.df), start_idx + args.limit)
+
+    def report_progress(done: int, stats: Dict[str, int]) -> None:
+        print(f"Processed {done}/{stats['total']} rows...", file=sys.stderr, flush=True)
+
+    started = time.perf_counter()
+    try:
+        stats = quiet_call(
+            args.verbose,
+            match_rows,
+            excel,
+            search_manager.search_rows_with_auto,
+            start_idx,
+            end_idx,
+            min_confidence=args.min_confidence,
+            max_results=args.max_results,
+            on_batch=report_progress,
+        )
+    finally:
+        search_manager.shutdown()
+    elapsed = time.perf_counter() - started
+
+    output_path = Path(args.output) if args.output else default_output_path(input_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    saved_path = quiet_call(args.verbose, save_result, excel, output_path)
+
+    summary = {
+        **stats,
+        "elapsed_seconds": round(elapsed, 2),
+        "rows_per_second": round(stats["total"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "workers": config.MAX_WORKERS,
+        "output": saved_path,
+    }
+    if args.summary:
+        with Path(args.summary).open("w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,235 @@
+"""Measure per-row search latency on a synthetic or real magistral."""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+from unittest.mock import patch
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import config
+from models.address import Address
+from search.hybrid_search import HybridSearch
+
+
+MAGISTRAL_HEADERS = [
+    "Область",
+    "Адміністративний район(старий)",
+    "Адміністративний район(новий)",
+    "Найменування ОТГ(довідково)",
+    "Населений пункт",
+    "Індекс НП",
+    "Назва вулиці",
+    "№ будинку",
+    "сортувальний центр 1 рівня",
+    "сортувальний центр 2 рівня",
+    "Адміністративний район доставки(вручення)",
+    "Технологічний індекс ОПЗ доставки(вручення)",
+    "Особливості функціонування ВПЗ",
+    "Тимчасово не функціонує",
+]
+
+REGIONS = [
+    "Вінницька", "Волинська", "Дніпропетровська", "Донецька", "Житомирська",
+    "Закарпатська", "Запорізька", "Івано-Франківська", "Київська", "Кіровоградська",
+    "Луганська", "Львівська", "Миколаївська", "Одеська", "Полтавська",
+    "Рівненська", "Сумська", "Тернопільська", "Харківська", "Херсонська",
+    "Хмельницька", "Черкаська", "Чернівецька", "Чернігівська",
+]
+MAJOR_CITIES = ["Київ", "Харків", "Одеса", "Дніпро", "Львів", "Запоріжжя"]
+SYLLABLES = [
+    "бо", "ва", "ги", "де", "жи", "зо", "ко", "ла", "ми", "но", "пи", "ро",
+    "са", "ти", "фе", "хо", "че", "ше", "ян", "лів", "гор", "дуб", "вер", "бер",
+    "сос", "лип", "кам", "мир", "слав", "град", "поль", "нів", "ків", "тин",
+]
+CITY_ENDINGS = ["ка", "івка", "ове", "ине", "ичі", "ів", "ськ", "не", "ці", "ище"]
+STREET_NAMES = [
+    "Шевченка", "Лесі Українки", "Івана Франка", "Грушевського", "Соборна",
+    "Незалежності", "Миру", "Садова", "Центральна", "Гагаріна", "Зелена",
+    "Польова", "Шкільна", "Молодіжна", "Лісова", "Набережна", "Київська",
+    "Богдана Хмельницького", "Героїв Майдану", "Степана Бандери", "Вишнева",
+    "Перемоги", "Космонавтів", "Весняна", "Сонячна", "Підгірна", "Квіткова",
+]
+STREET_TYPES = ["вул.", "вул.", "вул.", "пров.", "просп.", "бульв."]
+
+
+def _synthetic_name(rng: random.Random) -> str:
+    body = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+    return (body + rng.choice(CITY_ENDINGS)).capitalize()
+
+
+def _street_pool(rng: random.Random, size: int) -> List[str]:
+    streets = list(STREET_NAMES)
+    while len(streets) < size:
+        streets.append(_synthetic_name(rng))
+    rng.shuffle(streets)
+    return streets[:size]
+
+
+def _buildings(rng: random.Random) -> str:
+    start = rng.randint(1, 120)
+    numbers = [str(start + step * 2) for step in range(rng.randint(1, 12))]
+    if rng.random() < 0.3:
+        numbers.append(f"{start}А")
+    return ",".join(numbers)
+
+
+def write_synthetic_magistral(path: Path, records: int, seed: int) -> int:
+    """Write a magistral-shaped CSV: a few huge cities plus many small settlements."""
+    rng = random.Random(seed)
+    written = 0
+    postcode = 1000
+
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(MAGISTRAL_HEADERS)
+
+        def emit(region: str, city: str, street: str, index: str) -> None:
+            nonlocal written
+            writer.writerow([
+                region, "", f"{region[:-2]}ий", "", city, index, street,
+                _buildings(rng), "", "", "", "", "", "",
+            ])
+            written += 1
+
+        major_share = records // 4
+        per_major = major_share // len(MAJOR_CITIES)
+        for city_name in MAJOR_CITIES:
+            region = city_name if city_name == "Київ" else rng.choice(REGIONS)
+            streets = _street_pool(rng, max(per_major // 4, 1))
+            for offset in range(per_major):
+                street = streets[offset % len(streets)]
+                street_type = STREET_TYPES[len(street) % len(STREET_TYPES)]
+                emit(region, f"м. {city_name}", f"{street_type} {street}", f"{postcode + offset % 90:05d}")
+            postcode += 100
+
+        while written < records:
+            region = rng.choice(REGIONS)
+            city = f"{rng.choice(['с.', 'с.', 'смт', 'м.'])} {_synthetic_name(rng)}"
+            index = f"{rng.randint(postcode, 99999):05d}"
+            for street in _street_pool(rng, rng.randint(1, 40)):
+                if written >= records:
+                    break
+                street_type = rng.choice(STREET_TYPES)
+                for _ in range(rng.randint(1, 3)):
+                    emit(region, city, f"{street_type} {street}", index)
+
+    return written
+
+
+def _typo(rng: random.Random, value: str) -> str:
+    if len(value) < 5:
+        return value
+    pos = rng.randint(1, len(value) - 2)
+    return value[:pos] + value[pos + 1] + value[pos] + value[pos + 2:]
+
+
+def sample_queries(records, rows: int, seed: int, city_typos: float = 0.0, cities: int = 0) -> List[Address]:
+    rng = random.Random(seed + 1)
+    if cities:
+        # Як у корпоративному файлі: багато рядків із невеликої кількості міст
+        chosen = set(rng.sample(sorted({record.city for record in records}), cities))
+        records = [record for record in records if record.city in chosen]
+    queries = []
+    for _ in range(rows):
+        record = rng.choice(records)
+        buildings = [b.strip() for b in record.buildings.split(",") if b.strip()]
+        street = record.street.split(" ", 1)[-1]
+        if rng.random() < 0.2:
+            street = _typo(rng, street)
+        city = record.city.split(" ", 1)[-1]
+        if rng.random() < city_typos:
+            city = _typo(rng, city)
+        queries.append(Address(
+            city=city,
+            street=street,
+            building=rng.choice(buildings) if buildings else "",
+            region=record.region if rng.random() < 0.5 else "",
+            index=record.city_index if rng.random() < 0.5 else "",
+        ))
+    return queries
+
+
+def run_benchmark(search: HybridSearch, queries: List[Address]) -> List[float]:
+    timings = []
+    for query in queries:
+        address = Address(**query.to_dict())
+        started = time.perf_counter()
+        search.search_with_confidence(address)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run_batch(search: HybridSearch, queries: List[Address]) -> float:
+    addresses = [Address(**query.to_dict()) for query in queries]
+    started = time.perf_counter()
+    search.search_many(addresses)
+    return time.perf_counter() - started
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark HybridSearch per-row latency.")
+    parser.add_argument("--csv", default=None, help="Real magistral.csv. Defaults to a synthetic one.")
+    parser.add_argument("--workdir", default=None, help="Directory for the synthetic CSV and its cache.")
+    parser.add_argument("--records", type=int, default=330000, help="Synthetic magistral size.")
+    parser.add_argument("--rows", type=int, default=200, help="Query rows to time.")
+    parser.add_argument("--city-typos", type=float, default=0.0, help="Share of rows with a misspelled city.")
+    parser.add_argument("--vectorized", action="store_true", help="Score candidates with the NumPy engine.")
+    parser.add_argument("--cities", type=int, default=0, help="Draw query rows from this many cities only.")
+    parser.add_argument("--batch", action="store_true", help="Also time HybridSearch.search_many on the same rows.")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="magistral_bench_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    csv_path = Path(args.csv) if args.csv else workdir / "magistral.csv"
+    if not args.csv and not csv_path.exists():
+        written = write_synthetic_magistral(csv_path, args.records, args.seed)
+        print(f"Synthetic magistral: {written} records -> {csv_path}", flush=True)
+
+    with patch.object(config, "MAGISTRAL_CSV_PATH", str(csv_path)), \
+            patch.object(config, "MAGISTRAL_CACHE_PATH", str(workdir / "normalized_magistral.pkl")), \
+            patch.object(config, "MAGISTRAL_STORE_DIR", str(workdir / "magistral_store")), \
+            patch.object(config, "VECTORIZED_SCORING", args.vectorized):
+        search = HybridSearch(lazy_load=True)
+        search.classifier = None
+        logging.getLogger("AddressMatcher").setLevel(logging.WARNING)
+
+        started = time.perf_counter()
+        search._ensure_loaded()
+        print(f"Load: {time.perf_counter() - started:.2f}s, records: {len(search.magistral_records)}")
+
+        queries = sample_queries(search.magistral_records, args.rows, args.seed, args.city_typos, args.cities)
+        run_benchmark(search, queries[:5])
+        timings = run_benchmark(search, queries)
+        batch_seconds = run_batch(search, queries) if args.batch else None
+
+    timings_ms = sorted(t * 1000 for t in timings)
+    p95 = timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.95))]
+    print(f"Rows: {len(timings_ms)}")
+    print(f"Per-row latency: mean {statistics.mean(timings_ms):.1f} ms, "
+          f"median {statistics.median(timings_ms):.1f} ms, p95 {p95:.1f} ms")
+    print(f"Throughput: {len(timings_ms) / (sum(timings_ms) / 1000):.1f} rows/s")
+    if batch_seconds is not None:
+        print(f"search_many: {batch_seconds * 1000 / len(queries):.1f} ms/row, "
+              f"{len(queries) / batch_seconds:.1f} rows/s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
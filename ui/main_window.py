@@ -4,6 +4,7 @@
 """
 import os
 import pandas as pd
+from datetime import datetime
 from pathlib import Path
 import subprocess
 import sys
@@ -13,12 +14,12 @@ from PyQt5.QtWidgets import (
     QProgressBar, QHeaderView, QAbstractItemView,
     QShortcut, QApplication
 )
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QColor, QKeySequence
 # Менеджери
-from ui.managers import FileManager, SearchManager, ProcessingManager, UIStateManager
+from ui.managers import FileManager, SearchManager, ProcessingManager, UIStateManager, AutosaveManager
 from ui.styles import AppStyles
 
 # UI компоненти
@@ -38,7 +39,7 @@ import config
 
 class CacheLoaderThread(QThread):
     """Фоновий потік для завантаження magistral cache"""
-    finished = pyqtSignal(list)
+    finished = pyqtSignal(object)  # Список або ліниве представлення записів сховища
     progress = pyqtSignal(str)
     
     def __init__(self, search_manager):
@@ -137,6 +138,7 @@ class MainWindow(QMainWindow):
             self.undo_manager
         )
         self.ui_state = UIStateManager()
+        self.autosave_manager = AutosaveManager(self.file_manager.excel_handler)
         self.logger = Logger()
         self.sort_state = {}
         self.current_sort_column = None
@@ -169,6 +171,7 @@ class MainWindow(QMainWindow):
         # Start cache loading after the first UI paint, so opening files and
         # column mapping stay responsive immediately after launch.
         QTimer.singleShot(1000, self._start_background_cache_loading)
+        self.autosave_manager.start()
         
         self.logger.info("GUI ініціалізовано")
     
@@ -489,6 +492,7 @@ class MainWindow(QMainWindow):
             self._cache_loaded = True
             self.status_bar.setText(f"✅ Довідник завантажено ({len(records):,} записів). Готово!")
             self.logger.info("=== КІНЕЦЬ ФОНОВОГО ЗАВАНТАЖЕННЯ ===")
+            self._warm_up_regions()  # Файл могли відкрити до завантаження довідника
         else:
             self.logger.error("Не вдалося завантажити magistral cache")
             self.status_bar.setText("⚠️ Помилка завантаження довідника")
@@ -611,6 +615,7 @@ class MainWindow(QMainWindow):
         
         success = self.file_manager.load_file(file_path)
         if success:
+            self._offer_autosave_recovery(file_path)
             self.ui_state.set_file_loaded(file_path)
             self._display_table()
             
@@ -622,10 +627,17 @@ class MainWindow(QMainWindow):
                 # ✅ ЕСЛИ MAPPING УЖЕ НАЛАШТОВАНО - ІНІЦІАЛІЗУЄМО СТАРИЙ ІНДЕКС
                 self.file_manager._initialize_old_index_column()
                 self._display_table()  # Оновлюємо таблицю щоб показати нову колонку
+                self._warm_up_regions()
         else:
             # ❌ ЯКЩО ФАЙЛ НЕ ЗАВАНТАЖЕНО
             QMessageBox.critical(self, "Помилка", "Не вдалося завантажити файл")
     
+    def _warm_up_regions(self):
+        """Фоново відкриває дані довідника для областей з колонки області файлу"""
+        regions = self.file_manager.excel_handler.get_unique_field_values('region')
+        if regions:
+            self.search_manager.warm_up_regions(regions)
+    
     def save_file(self):
         """Збереження файлу через FileManager"""
         save_old_index = self.top_panel.is_save_old_index_checked()
@@ -636,6 +648,7 @@ class MainWindow(QMainWindow):
         )
         
         if success:
+            self.autosave_manager.mark_saved()
             self.ui_state.set_file_saved()
             QMessageBox.information(self, "Успіх", "Файл успішно збережено!")
         else:
@@ -657,12 +670,35 @@ class MainWindow(QMainWindow):
         
         if success:
             saved_path = self.file_manager.current_file or file_path
+            self.autosave_manager.mark_saved()
             self.ui_state.set_file_loaded(saved_path)
             self.ui_state.set_file_saved()
             QMessageBox.information(self, "Успіх", "Файл успішно збережено!")
         else:
             QMessageBox.critical(self, "Помилка", "Не вдалося зберегти файл")
     
+    def _offer_autosave_recovery(self, file_path: str):
+        """Пропонує відновити незбережені зміни з автозбереження"""
+        recovery = self.autosave_manager.find_recovery(file_path)
+        if not recovery:
+            return
+        
+        saved_at = datetime.fromtimestamp(recovery['saved_at']).strftime('%d.%m.%Y %H:%M')
+        reply = QMessageBox.question(
+            self,
+            "Відновлення змін",
+            f"Знайдено автозбереження від {saved_at}: {len(recovery['changes'])} незбережених змін.\n\n"
+            "Відновити їх?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        
+        if reply == QMessageBox.Yes:
+            restored = self.file_manager.excel_handler.restore_changes(recovery['changes'])
+            self.logger.info(f"♻️ Відновлено змін з автозбереження: {restored}")
+            self.status_bar.setText(f"♻️ Відновлено змін: {restored}")
+        else:
+            self.autosave_manager.discard(file_path)
+    
     def configure_columns(self):
         """Налаштування відповідності стовпців"""
         if self.file_manager.excel_handler.df is None or self.file_manager.excel_handler.df.empty:
@@ -696,6 +732,7 @@ class MainWindow(QMainWindow):
                 
                 # ✅ ОНОВЛЮЄМО ТАБЛИЦЮ
                 self._display_table()
+                self._warm_up_regions()
             
                 
                 self.logger.info(f"✅ Mapping налаштовано: {mapping}")
@@ -768,7 +805,7 @@ class MainWindow(QMainWindow):
             })
             
             # ЗАПИСУЄМО В DATAFRAME
-            self.file_manager.excel_handler.df.iloc[self.current_row, idx_col] = index
+            self.file_manager.excel_handler.set_cell(self.current_row, idx_col, index)
             
             # ОНОВЛЮЄМО ТАБЛИЦЮ
             item = self.table_panel.table.item(self.current_row, idx_col)
@@ -897,111 +934,50 @@ class MainWindow(QMainWindow):
         
         # 🛑 ПОКАЗУЄМО КНОПКУ СТОП
         self.stop_btn.setVisible(True)
-        self._stop_requested = False
         
         df = self.file_manager.excel_handler.df
-        total_rows = len(df)
-        
-        stats = {
-            'total': total_rows - start_row,
-            'auto_applied': 0,
-            'manual_required': 0,
-            'not_found': 0,
-            'skipped': 0,
-            'errors': 0
-        }
         
-        try:
-            for idx in range(start_row, total_rows):
-                self.current_row = idx
-                self._focus_processing_row(idx)
-                
-                # 🛑 ПЕРЕВІРКА ЗУПИНКИ
-                if self._stop_requested:
-                    self.logger.info("🛑 Автоматична обробка зупинена користувачем")
-                    self.status_bar.setText("🛑 Зупинено користувачем")
-                    break
-                
-                if stats['total'] > 0:
-                    progress_pct = int((idx - start_row) / stats['total'] * 100)
-                    self.progress_bar.setValue(progress_pct)
-                
-                progress_pct = int((idx - start_row) / stats['total'] * 100) if stats['total'] > 0 else 0
-                self.status_bar.setText(f"⏳ Обробка {idx - start_row + 1}/{stats['total']} ({progress_pct}%)...")
-                QApplication.processEvents()
-                
-                try:
-                    address = self.file_manager.excel_handler.get_address_from_row(idx)
-                    
-                    if not address or address.is_empty():
-                        stats['skipped'] += 1
-                        continue
-                    
-                    # ✅ ПРАВИЛЬНИЙ ФОРМАТ
-                    results = self.search_manager.search_with_auto(address, auto_apply=False)
-                    
-                    
-                    if results['mode'] == 'auto' and results.get('auto_result'):
-                        auto_result = results['auto_result']
-                        auto_index = self.processing_manager._determine_index(auto_result)
-                        auto_confidence = auto_result.get('confidence', 0)
-                        
-                        # ✅ ПЕРЕВІРЯЄМО МІНІМАЛЬНУ ТОЧНІСТЬ
-                        if auto_confidence >= min_confidence and auto_index:
-                            # Записуємо індекс напряму в DataFrame
-                            mapping = self.file_manager.excel_handler.column_mapping
-                            if mapping and 'index' in mapping:
-                                idx_col = mapping['index'][0]
-                                self.file_manager.excel_handler.df.iloc[idx, idx_col] = auto_index
-                                
-                                # Оновлюємо таблицю
-                                item = self.table_panel.table.item(idx, idx_col)
-                                if item:
-                                    item.setText(auto_index)
-                                    item.setForeground(QColor(76, 175, 80))
-                                    font = item.font()
-                                    font.setBold(True)
-                                    item.setFont(font)
-                            
-                            stats['auto_applied'] += 1
-                            
-                            self.logger.info(f"✅ Рядок {idx + 1}: Автопідстановка [{auto_index}] - {auto_confidence}%")
-                        elif auto_confidence >= min_confidence:
-                            stats['manual_required'] += 1
-                            self.logger.info(f"⚠️ Рядок {idx + 1}: Автопідстановка без індексу")
-                        else:
-                            stats['manual_required'] += 1
-                            self.logger.info(f"⚠️ Рядок {idx + 1}: Низька точність ({auto_confidence}% < {min_confidence}%)")
-                    
-                    elif results['mode'] == 'manual':
-                        stats['manual_required'] += 1
-                        self.logger.info(f"⚠️ Рядок {idx + 1}: Потребує ручного вибору ({len(results['manual_results'])} варіантів)")
-                    
-                    else:
-                        stats['not_found'] += 1
-                        self.logger.info(f"❌ Рядок {idx + 1}: Не знайдено")
-                    
-                except Exception as e:
-                    self.logger.error(f"❌ Помилка рядка {idx + 1}: {str(e)}")
-                    stats['errors'] += 1
-            
-            self._show_processing_statistics(stats)
-            
-        except Exception as e:
-            self.logger.error(f"❌ Критична помилка: {str(e)}")
-            QMessageBox.critical(self, "Помилка", f"Помилка обробки:\n{e}")
+        # Пошук іде у фоновому потоці, таблиця оновлюється пакетами за таймером
+        self.processing_manager.on_progress_update = self._on_processing_progress
+        self.processing_manager.on_row_processed = self._on_row_processed
+        started = self.processing_manager.start_background_processing(
+            start_row, len(df),
+            search_rows=self.search_manager.search_rows_with_auto,
+            min_confidence=min_confidence,
+            skip_processed=False,
+            on_finished=self._on_auto_processing_finished
+        )
+        if not started:
+            QMessageBox.warning(self, "Помилка", "Не вдалося запустити обробку (перевірте налаштування колонок)")
+            self._on_auto_processing_finished(None)
+    
+    def _on_processing_progress(self, current: int, total: int):
+        """Прогрес фонової обробки (викликається пакетно, не частіше таймера)"""
+        progress_pct = int(current / total * 100) if total > 0 else 0
+        self.progress_bar.setValue(progress_pct)
+        self.status_bar.setText(f"⏳ Обробка {current}/{total} ({progress_pct}%)...")
+        self.current_row = current - 1
+        self._focus_processing_row(current - 1)
+    
+    def _on_auto_processing_finished(self, stats: Optional[Dict]):
+        """Завершення фонової автоматичної обробки"""
+        self.progress_bar.setVisible(False)
+        self.stop_btn.setVisible(False)  # Ховаємо кнопку стоп
+        self.table_panel.auto_process_btn.setEnabled(True)
+        self.table_panel.semi_auto_btn.setEnabled(True)
         
-        finally:
-            self.progress_bar.setVisible(False)
-            self.stop_btn.setVisible(False)  # Ховаємо кнопку стоп
-            self.table_panel.auto_process_btn.setEnabled(True)
-            self.table_panel.semi_auto_btn.setEnabled(True)
-            # ✅ НЕ вивантажуймо всю таблицю!
-            # Лише оновлюємо розміри
+        if stats is None:
+            return
+        
+        if self.processing_manager.is_stopped:
+            self.logger.info("🛑 Автоматична обробка зупинена користувачем")
+            self.status_bar.setText("🛑 Зупинено користувачем")
+        
+        self._show_processing_statistics(stats)
             
     def stop_auto_processing(self):
         """Зупиняє автоматичну обробку"""
-        self._stop_requested = True
+        self.processing_manager.stop_processing()
         self.status_bar.setText("🛑 Зупинка...")
         self.logger.info("🛑 Отримано запит на зупинку...")
 
@@ -1049,7 +1025,8 @@ class MainWindow(QMainWindow):
             f"⚠️ Ручний вибір: {stats['manual_required']}\n"
             f"❌ Не знайдено: {stats['not_found']}\n"
             f"🔄 Пропущено: {stats['skipped']}\n"
-            f"🔥 Помилки: {stats['errors']}\n\n"
+            f"🔥 Помилки: {stats['errors']}\n"
+            f"♻️ Повтори адрес (без пошуку): {stats.get('searches_saved', 0)}\n\n"
             f"⏱️ Ефективність: {efficiency:.1f}%"
         )
         
@@ -1065,7 +1042,6 @@ class MainWindow(QMainWindow):
         progress = int(current / total * 100)
         self.progress_bar.setValue(progress)
         self.status_bar.setText(f"Обробка: {current} / {total}")
-        QApplication.processEvents()
 
     def on_row_auto_processed(self, row_idx: int, index: str, mode: str):
         """Колбек після обробки рядка"""
@@ -1095,22 +1071,24 @@ class MainWindow(QMainWindow):
         self.processing_manager.on_row_processed = self.on_row_auto_processed
         self.processing_manager.on_semi_auto_pause = self.on_semi_auto_pause
         
-        try:
-            stats = self.processing_manager.start_semi_auto_processing(
-                0, total_rows,
-                search_func=lambda addr, auto: self.search_manager.search_with_auto(addr, auto_apply=True)
-            )
-            if not self.processing_manager.semi_auto_waiting:
-                self.show_processing_stats(stats)
-                self.progress_bar.setVisible(False)
-                self.table_panel.semi_auto_btn.setEnabled(True)
-                self.table_panel.auto_process_btn.setEnabled(True)
-        except Exception as e:
-            self.logger.error(f"Помилка: {e}")
-            QMessageBox.critical(self, "Помилка", str(e))
-            self.progress_bar.setVisible(False)
-            self.table_panel.semi_auto_btn.setEnabled(True)
-            self.table_panel.auto_process_btn.setEnabled(True)
+        started = self.processing_manager.start_background_processing(
+            0, total_rows,
+            search_rows=self.search_manager.search_rows_with_auto,
+            semi_auto=True,
+            on_finished=self._on_semi_auto_finished
+        )
+        if not started:
+            QMessageBox.critical(self, "Помилка", "Не вдалося запустити обробку (перевірте налаштування колонок)")
+            self._on_semi_auto_finished(None)
+    
+    def _on_semi_auto_finished(self, stats: Optional[Dict]):
+        """Завершення фонової напівавтоматичної обробки"""
+        self.ui_state.set_processing_state(False)
+        if stats is not None:
+            self.show_processing_stats(stats)
+        self.progress_bar.setVisible(False)
+        self.table_panel.semi_auto_btn.setEnabled(True)
+        self.table_panel.auto_process_btn.setEnabled(True)
 
 
     def on_semi_auto_pause(self, row_idx: int, results: List[Dict]):
@@ -1139,16 +1117,7 @@ class MainWindow(QMainWindow):
 
     def continue_semi_auto(self):
         """Продовжує напівавтоматичну обробку після паузи"""
-        stats = self.processing_manager.continue_semi_auto(
-            search_func=lambda addr, auto: self.search_manager.search_with_auto(addr, auto_apply=True)
-        )
-        
-        if not self.processing_manager.semi_auto_waiting:
-            self.ui_state.set_processing_state(False)
-            self.show_processing_stats(stats)
-            self.progress_bar.setVisible(False)
-            self.table_panel.semi_auto_btn.setEnabled(True)
-            self.table_panel.auto_process_btn.setEnabled(True)
+        self._continue_semi_auto()
     
     def stop_processing(self):
         """Зупинка обробки"""
@@ -1175,7 +1144,7 @@ class MainWindow(QMainWindow):
                 old_index = old_values.get('index', '')
                 
                 # ЗАПИСУЄМО СТАРИЙ ІНДЕКС В DATAFRAME
-                self.file_manager.excel_handler.df.iloc[row_idx, idx_col] = old_index
+                self.file_manager.excel_handler.set_cell(row_idx, idx_col, old_index)
                 
                 # ✅ ОНОВЛЮЄМО КЛІТИНКУ В ТАБЛИЦІ
                 item = self.table_panel.table.item(row_idx, idx_col)
@@ -1221,7 +1190,7 @@ class MainWindow(QMainWindow):
                 new_index = new_values.get('index', '')
                 
                 # ЗАПИСУЄМО НОВИЙ ІНДЕКС В DATAFRAME
-                self.file_manager.excel_handler.df.iloc[row_idx, idx_col] = new_index
+                self.file_manager.excel_handler.set_cell(row_idx, idx_col, new_index)
                 
                 # ✅ ОНОВЛЮЄМО КЛІТИНКУ В ТАБЛИЦІ
                 item = self.table_panel.table.item(row_idx, idx_col)
@@ -1444,7 +1413,7 @@ class MainWindow(QMainWindow):
                 
                 if city_col is not None and parsed['city']:
                     old_city = df.iloc[visual_row, city_col] if pd.notna(df.iloc[visual_row, city_col]) else ""
-                    df.iloc[visual_row, city_col] = parsed['city']
+                    self.file_manager.excel_handler.set_cell(visual_row, city_col, parsed['city'])
                     city_item = self.table_panel.table.item(visual_row, city_col)
                     if city_item:
                         city_item.setText(parsed['city'])
@@ -1452,14 +1421,14 @@ class MainWindow(QMainWindow):
                     updated = True
                 
                 if parsed['street']:
-                    df.iloc[visual_row, street_col] = parsed['street']
+                    self.file_manager.excel_handler.set_cell(visual_row, street_col, parsed['street'])
                     street_item.setText(parsed['street'])
                     print(f"   📝 Вулиця: → '{parsed['street']}'")
                     updated = True
                 
                 if building_col is not None and parsed['building']:
                     old_building = df.iloc[visual_row, building_col] if pd.notna(df.iloc[visual_row, building_col]) else ""
-                    df.iloc[visual_row, building_col] = parsed['building']
+                    self.file_manager.excel_handler.set_cell(visual_row, building_col, parsed['building'])
                     building_item = self.table_panel.table.item(visual_row, building_col)
                     if building_item:
                         building_item.setText(parsed['building'])
@@ -1499,16 +1468,8 @@ class MainWindow(QMainWindow):
             )
             
     def _continue_semi_auto(self):
-        """Продовжує напівавтоматичну обробку після паузи"""
-        stats = self.processing_manager.continue_semi_auto(
-            search_func=lambda addr, auto: self.search_manager.search_with_auto(addr, auto_apply=True)
-        )
-        
-        if not self.processing_manager.semi_auto_waiting:
-            self._show_processing_statistics(stats)
-            self.progress_bar.setVisible(False)
-            self.table_panel.semi_auto_btn.setEnabled(True)
-            self.table_panel.auto_process_btn.setEnabled(True)
+        """Продовжує напівавтоматичну обробку після паузи (у фоновому потоці)"""
+        self.processing_manager.continue_background_processing()
 
     
     def set_index_star(self):
@@ -1666,7 +1627,7 @@ class MainWindow(QMainWindow):
         new_value = item.text()
         
         # Оновлюємо DataFrame
-        self.file_manager.excel_handler.df.iloc[row, col] = str(new_value)
+        self.file_manager.excel_handler.set_cell(row, col, str(new_value))
         
         self.logger.debug(f"Комірка змінена: row={row}, col={col}, value={new_value}")
         
@@ -1781,7 +1742,8 @@ class MainWindow(QMainWindow):
             f"⚠️ Ручний вибір: {stats['manual_required']}\\n"
             f"❌ Не знайдено: {stats['not_found']}\\n"
             f"⏭️ Пропущено: {stats['skipped']}\\n"
-            f"🔥 Помилки: {stats['errors']}\\n\\n"
+            f"🔥 Помилки: {stats['errors']}\\n"
+            f"♻️ Повтори адрес (без пошуку): {stats.get('searches_saved', 0)}\\n\\n"
             f"Ефективність: {eff}%"
         )
         QMessageBox.information(self, "Статистика", msg)
@@ -1809,4 +1771,10 @@ class MainWindow(QMainWindow):
             sizes = right_splitter.sizes()
             SettingsManager.set_splitter_sizes('right_panel', sizes)
         
+        # Зупиняємо процеси паралельного пошуку
+        self.search_manager.shutdown()
+        
+        # Останній знімок незбережених змін
+        self.autosave_manager.shutdown()
+        
         event.accept()
@@ -9,10 +9,12 @@ from .file_manager import FileManager
 from .search_manager import SearchManager
 from .processing_manager import ProcessingManager
 from .ui_state_manager import UIStateManager
+from .autosave_manager import AutosaveManager
 
 __all__ = [
     'FileManager',
     'SearchManager',
     'ProcessingManager',
-    'UIStateManager'
+    'UIStateManager',
+    'AutosaveManager'
 ]
@@ -0,0 +1,180 @@
+"""
+AutosaveManager - фонове автозбереження незбережених змін
+
+Відповідає за:
+- Періодичний знімок журналу змін ExcelHandler (лише змінені клітинки)
+- Запис знімка у файл поруч із кешем у фоновому потоці (tmp + атомарна заміна)
+- Пошук автозбереження для відкритого файлу та його видалення після збереження
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from PyQt5.QtCore import QObject, QTimer
+
+import config
+from handlers.excel_handler import ExcelHandler
+from utils.logger import Logger
+
+
+def autosave_path(source_path: str) -> str:
+    """Файл автозбереження для вихідного Excel файлу"""
+    key = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()
+    return os.path.join(config.AUTOSAVE_DIR, f"{key}.json")
+
+
+def _source_stamp(source_path: str) -> Dict:
+    stat = os.stat(source_path)
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+class AutosaveManager(QObject):
+    """Менеджер автозбереження змін"""
+
+    def __init__(self, excel_handler: ExcelHandler):
+        """
+        Args:
+            excel_handler: Обробник Excel, журнал якого зберігається
+        """
+        super().__init__()
+        self.excel_handler = excel_handler
+        self.logger = Logger()
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave")
+        self._pending: Optional[Future] = None
+        self._saved_state = None  # (файл, change_count, к-сть змін) останнього знімка
+        self._last_path: Optional[str] = None
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.autosave_now)
+
+    def start(self):
+        """Запускає періодичне автозбереження (config.AUTOSAVE_INTERVAL)"""
+        if config.AUTOSAVE_ENABLED:
+            self._timer.start(int(config.AUTOSAVE_INTERVAL * 1000))
+
+    def autosave_now(self) -> Optional[Future]:
+        """
+        Знімає копію журналу змін і передає запис у фоновий потік
+
+        Returns:
+            Future запису або None, якщо писати нічого
+        """
+        handler = self.excel_handler
+        source_path = handler.file_path
+        if handler.df is None or not source_path:
+            return None
+
+        state = (source_path, handler.change_count, len(handler.dirty_cells))
+        if state == self._saved_state:
+            return None
+        if self._pending is not None and not self._pending.done():
+            return None  # Попередній запис ще триває - спробуємо на наступному тіку
+
+        target = autosave_path(source_path)
+        if self._last_path != target:
+            self._last_path = None  # Відкрито інший файл - автозбереження попереднього лишається для відновлення
+
+        if not handler.dirty_cells and self._last_path is None:
+            # Нічого не писали - не чіпаємо автозбереження попереднього сеансу
+            self._saved_state = state
+            return None
+
+        payload = None
+        if handler.dirty_cells:
+            try:
+                payload = {
+                    'source': os.path.abspath(source_path),
+                    **_source_stamp(source_path),
+                    'saved_at': time.time(),
+                    'changes': handler.dirty_snapshot(),
+                }
+            except OSError as e:
+                self.logger.warning(f"⚠️ Автозбереження пропущено: {e}")
+                return None
+
+        self._saved_state = state
+        self._last_path = target if payload else None
+        self._pending = self._executor.submit(self._write, target, payload)
+        return self._pending
+
+    def _write(self, target: str, payload: Optional[Dict]):
+        """Запис у фоновому потоці: tmp файл і атомарна заміна попереднього автозбереження"""
+        if payload is None:
+            self._remove(target)  # Усі зміни збережено або скасовано
+            return
+
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = f"{target}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, target)
+            self.logger.debug(f"Автозбережено змін: {len(payload['changes'])}")
+        except OSError as e:
+            self.logger.error(f"❌ Помилка автозбереження: {e}")
+
+    def find_recovery(self, source_path: str) -> Optional[Dict]:
+        """
+        Автозбереження для щойно відкритого файлу
+
+        Returns:
+            Дані автозбереження або None. Якщо файл змінився після
+            автозбереження - воно застаріле і видаляється.
+        """
+        path = autosave_path(source_path)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            stamp = _source_stamp(source_path)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"⚠️ Не вдалося прочитати автозбереження: {e}")
+            return None
+
+        if {key: data.get(key) for key in stamp} != stamp or not data.get('changes'):
+            self.logger.info("Автозбереження застаріле (файл змінено) - видаляємо")
+            self.discard(source_path)
+            return None
+        return data
+
+    def discard(self, source_path: str):
+        """Видаляє автозбереження файлу (відмова від відновлення)"""
+        self.wait()
+        path = autosave_path(source_path)
+        self._remove(path)
+        if self._last_path == path:
+            self._last_path = None
+
+    def mark_saved(self):
+        """Файл збережено вручну - поточне автозбереження більше не потрібне"""
+        self.wait()
+        if self._last_path:
+            self._remove(self._last_path)
+            self._last_path = None
+        handler = self.excel_handler
+        self._saved_state = (handler.file_path, handler.change_count, len(handler.dirty_cells))
+
+    def _remove(self, path: str):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            self.logger.warning(f"⚠️ Не вдалося видалити автозбереження: {e}")
+
+    def wait(self):
+        """Чекає завершення поточного запису"""
+        if self._pending is not None:
+            self._pending.result()
+
+    def shutdown(self):
+        """Останній знімок перед закриттям і зупинка потоку"""
+        self._timer.stop()
+        self.autosave_now()
+        self._executor.shutdown(wait=True)
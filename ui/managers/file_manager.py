@@ -10,6 +10,8 @@ FileManager - управління операціями з Excel файлами
 
 import os
 from typing import Optional
+
+import pandas as pd
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
 
 from handlers.excel_handler import ExcelHandler
@@ -192,26 +194,18 @@ class FileManager:
                     self.logger.warning("⚠️ Немає _original_row_index, зберігаємо як є")
                     df_to_save = filtered_df.copy()
                 else:
-                    # 3. Оновлюємо дані в оригіналі
-                    # Нам цікаві тільки колонки, які ми змінювали (адреса, індекс)
-                    # Тобто ті, що є в filtered_df (крім _original_row_index)
-                    
-                    cols_to_update = [c for c in filtered_df.columns if c != '_original_row_index']
-                    
-                    # Створюємо мапу змін: {original_index: {col: value}}
-                    # Це швидше ніж iterrows
-                    
-                    # Перетворюємо filtered_df в словник для швидкості
-                    # index -> {col: val}
-                    # Але index у filtered_df може бути змінений сортуванням, тому використовуємо _original_row_index
-                    
-                    for _, row in filtered_df.iterrows():
-                        orig_idx = int(row['_original_row_index'])
-                        
-                        if orig_idx in df_to_save.index:
-                            for col in cols_to_update:
-                                val = row[col]
-                                df_to_save.at[orig_idx, col] = val
+                    # 3. Переносимо в оригінал лише змінені клітинки з журналу
+                    for (orig_idx, col), val in self.excel_handler.dirty_cells.items():
+                        if col in df_to_save.columns and orig_idx in df_to_save.index:
+                            df_to_save.at[orig_idx, col] = val
+
+                    # "Старий індекс" - віртуальна колонка, її беремо цілком
+                    if save_old_index and 'Старий індекс' in filtered_df.columns:
+                        df_to_save['Старий індекс'] = pd.Series(
+                            filtered_df['Старий індекс'].tolist(),
+                            index=self.excel_handler.original_row_numbers(filtered_df),
+                        )
+                        df_to_save['Старий індекс'] = df_to_save['Старий індекс'].fillna('')
                     
                     self.logger.info("✅ Дані успішно об'єднані з оригіналом")
             
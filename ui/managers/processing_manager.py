@@ -6,19 +6,22 @@ ProcessingManager - управління автоматичною обробко
 - Напівавтоматичну обробку (з підтвердженням)
 - Застосування індексів за правилами
 - Управління прогресом обробки
+- Фонову обробку (ProcessingWorker) з пакетним оновленням UI за таймером
 """
 
-import re
-from typing import Dict, List, Optional, Callable
-from PyQt5.QtWidgets import QApplication
+from typing import Dict, Iterator, List, Optional, Callable, Tuple
+from PyQt5.QtCore import QObject, QTimer, pyqtSlot
 
-from handlers.excel_handler import ExcelHandler
+import config
+from handlers.excel_handler import ExcelHandler, RowSnapshot
 from models.address import Address
+from ui.managers.processing_worker import ProcessingWorker
+from utils.index_rules import determine_index
 from utils.logger import Logger
 from utils.undo_manager import UndoManager
 
 
-class ProcessingManager:
+class ProcessingManager(QObject):
     """Менеджер для автоматичної обробки рядків з жорсткими критеріями"""
     
     def __init__(self, excel_handler: ExcelHandler, undo_manager: UndoManager):
@@ -29,6 +32,7 @@ class ProcessingManager:
             excel_handler: Обробник Excel файлів
             undo_manager: Менеджер відміни дій
         """
+        super().__init__()
         self.excel_handler = excel_handler
         self.undo_manager = undo_manager
         self.logger = Logger()
@@ -45,7 +49,8 @@ class ProcessingManager:
             'manual_required': 0,
             'not_found': 0,
             'skipped': 0,
-            'errors': 0
+            'errors': 0,
+            'searches_saved': 0
         }
         
         # Параметри обробки
@@ -55,264 +60,202 @@ class ProcessingManager:
         self.on_progress_update: Optional[Callable[[int, int], None]] = None
         self.on_row_processed: Optional[Callable[[int, str, str], None]] = None  # row, index, mode
         self.on_semi_auto_pause: Optional[Callable[[int, List[Dict]], None]] = None
+        
+        # Фонова обробка: результати потоку накопичуються і застосовуються за таймером
+        self._worker: Optional[ProcessingWorker] = None
+        self._background: Optional[Dict] = None
+        self._pending_updates: List[Tuple[str, int, object]] = []
+        self._update_timer = QTimer(self)
+        self._update_timer.setInterval(config.PROCESSING_UI_UPDATE_MS)
+        self._update_timer.timeout.connect(self._flush_updates)
     
-    def start_auto_processing(
+    def start_background_processing(
         self,
         start_row: int,
         total_rows: int,
-        search_func: Callable[[Address, bool], Dict]  # Змінено! Тепер повертає Dict
-    ) -> Dict[str, int]:
+        search_rows: Callable,
+        semi_auto: bool = False,
+        min_confidence: int = 0,
+        skip_processed: bool = True,
+        on_finished: Optional[Callable[[Dict[str, int]], None]] = None
+    ) -> bool:
         """
-        Запускає ЖОРСТКУ автоматичну обробку
+        Запускає авто- або напівавтоматичну обробку у фоновому потоці
         
-        НОВІ ПРАВИЛА:
-        - Застосовується ТІЛЬКИ якщо є ОДИН результат ≥98%
-        - Будинок має ТОЧНО співпадати
-        - Індекс співпадає (якщо заданий)
+        Пошук іде в ProcessingWorker, а індекси, статистика та колбеки
+        (on_row_processed, on_progress_update, on_semi_auto_pause)
+        застосовуються в GUI-потоці пакетами раз на config.PROCESSING_UI_UPDATE_MS.
         
         Args:
             start_row: Початковий рядок
             total_rows: Загальна кількість рядків
-            search_func: Функція пошуку (має бути search_manager.search_with_auto)
+            search_rows: Пакетна функція пошуку (search_manager.search_rows_with_auto)
+            semi_auto: Зупинятись на рядках, що потребують ручного вибору
+            min_confidence: Мінімальна точність автопідстановки, %
+            skip_processed: Пропускати рядки, де індекс вже змінено
+            on_finished: Виклик зі статистикою після завершення або зупинки
             
         Returns:
-            Словник зі статистикою: {
-                'total': N,
-                'auto_applied': X,
-                'manual_required': Y,
-                'not_found': Z,
-                'skipped': M
-            }
+            True якщо обробку запущено
         """
-        self.is_processing = True
-        self.is_stopped = False
-        self.current_row = start_row
+        if self._worker is not None and self._worker.isRunning():
+            self.logger.error("Обробка вже виконується")
+            return False
         
-        # Скидаємо статистику
-        self.stats = {
-            'total': total_rows - start_row,
-            'auto_applied': 0,
-            'manual_required': 0,
-            'not_found': 0,
-            'skipped': 0,
-            'errors': 0
+        self._reset_stats(total_rows - start_row)
+        self._background = {
+            'total_rows': total_rows,
+            'search_rows': search_rows,
+            'semi_auto': semi_auto,
+            'min_confidence': min_confidence,
+            'skip_processed': skip_processed,
+            'on_finished': on_finished,
         }
-        
-        mapping = self.excel_handler.column_mapping
-        if not mapping or 'index' not in mapping:
-            self.logger.error("Column mapping не налаштовано")
-            return self.stats
-        
-        idx_col = mapping['index'][0]
-        old_index_col_idx = self._get_old_index_column_idx()
-        
-        self.logger.info("=" * 80)
-        self.logger.info("🚀 ПОЧАТОК АВТОМАТИЧНОЇ ОБРОБКИ")
-        self.logger.info(f"   Рядків: {start_row} - {total_rows}")
-        self.logger.info("=" * 80)
-        
-        for row_idx in range(start_row, total_rows):
-            QApplication.processEvents()
-            
-            if self.is_stopped:
-                self.logger.info("⏸️  Обробку зупинено користувачем")
-                break
-            
-            # Оновлюємо прогрес
-            if self.on_progress_update:
-                self.on_progress_update(row_idx + 1, total_rows)
-            
-            # Перевіряємо чи вже проставлено
-            if self._is_row_already_processed(row_idx, idx_col, old_index_col_idx):
-                self.stats['skipped'] += 1
-                continue
-            
-            try:
-                # Отримуємо адресу
-                address = self.excel_handler.get_address_from_row(row_idx)
-                
-                # НОВИЙ ПОШУК з жорсткими критеріями
-                result = search_func(address, auto_apply=True)  # auto_apply=True!
-                
-                if result['mode'] == 'auto' and result['applied']:
-                    # ✅ АВТОПІДСТАНОВКА УСПІШНА
-                    auto_result = result['auto_result']
-                    index = self._determine_index(auto_result)
-                    
-                    if index:
-                        self._apply_index_to_row(row_idx, index, idx_col)
-                        self.stats['auto_applied'] += 1
-                        
-                        if self.on_row_processed:
-                            self.on_row_processed(row_idx, index, 'auto')
-                        
-                        self.logger.debug(
-                            f"✅ Рядок {row_idx}: AUTO -> [{index}] "
-                            f"{auto_result['city']}, {auto_result['street']}, {auto_result['building']}"
-                        )
-                
-                elif result['mode'] == 'manual':
-                    # ⚠️ ПОТРІБЕН РУЧНИЙ ВИБІР
-                    self.stats['manual_required'] += 1
-                    
-                    self.logger.debug(
-                        f"⚠️  Рядок {row_idx}: MANUAL (знайдено {result['total_found']} варіантів) - "
-                        f"{address.city}, {address.street}, {address.building}"
-                    )
-                
-                else:
-                    # ❌ НІЧОГО НЕ ЗНАЙДЕНО
-                    self.stats['not_found'] += 1
-                    
-                    self.logger.debug(
-                        f"❌ Рядок {row_idx}: NOT_FOUND - "
-                        f"{address.city}, {address.street}, {address.building}"
-                    )
-                        
-            except Exception as e:
-                self.logger.error(f"🔥 Помилка обробки рядка {row_idx}: {e}")
-                self.stats['errors'] += 1
-                continue
-        
-        self.is_processing = False
-        
-        # Підсумкова статистика
-        self._log_final_stats()
-        
-        return self.stats
+        return self._start_worker(start_row)
     
-    def start_semi_auto_processing(
-        self,
-        start_row: int,
-        total_rows: int,
-        search_func: Callable[[Address, bool], Dict]
-    ) -> Dict[str, int]:
+    def continue_background_processing(self) -> bool:
         """
-        Запускає напівавтоматичну обробку (з паузами на ручний вибір)
-        
-        ЛОГІКА:
-        - Якщо є автопідстановка (1 результат ≥98%) - застосовує автоматично
-        - Якщо потрібен ручний вибір - ЗУПИНЯЄТЬСЯ і чекає вибору
+        Продовжує фонову напівавтоматичну обробку після ручного вибору
         
-        Args:
-            start_row: Початковий рядок
-            total_rows: Загальна кількість рядків
-            search_func: Функція пошуку
-            
         Returns:
-            Словник зі статистикою
+            True якщо обробку продовжено
         """
+        if not self.semi_auto_waiting or self._background is None:
+            return False
+        
+        self.semi_auto_waiting = False
+        return self._start_worker(self.current_row + 1)
+    
+    def _start_worker(self, start_row: int) -> bool:
+        """Запускає ProcessingWorker з рядка start_row"""
+        mapping = self.excel_handler.column_mapping
+        if not mapping or 'index' not in mapping:
+            self.logger.error("Column mapping не налаштовано")
+            return False
+        
         self.is_processing = True
         self.is_stopped = False
         self.semi_auto_waiting = False
         self.current_row = start_row
+        self._pending_updates = []
         
-        # Скидаємо статистику якщо це новий запуск
-        if start_row == 0 or not hasattr(self, 'stats'):
-            self.stats = {
-                'total': total_rows - start_row,
-                'auto_applied': 0,
-                'manual_required': 0,
-                'not_found': 0,
-                'skipped': 0,
-                'errors': 0
-            }
-        
-        mapping = self.excel_handler.column_mapping
-        if not mapping or 'index' not in mapping:
-            return self.stats
-        
+        background = self._background
         idx_col = mapping['index'][0]
-        old_index_col_idx = self._get_old_index_column_idx()
-        
-        self.logger.info("🔄 Напівавтоматична обробка...")
-        
-        for row_idx in range(start_row, total_rows):
-            QApplication.processEvents()
-            
-            if self.is_stopped:
-                break
-            
-            if self.on_progress_update:
-                self.on_progress_update(row_idx + 1, total_rows)
-            
-            if self._is_row_already_processed(row_idx, idx_col, old_index_col_idx):
-                self.stats['skipped'] += 1
+        old_index_col_idx = self._get_old_index_column_idx() if background['skip_processed'] else None
+        # Один векторний знімок на всю обробку (продовження після паузи бере решту
+        # того ж знімка); адреси з нього будує вже потік, DataFrame він не читає
+        if background.get('snapshot') is None:
+            extra_columns = [old_index_col_idx] if old_index_col_idx is not None else []
+            background['snapshot'] = self.excel_handler.snapshot_rows(
+                start_row, background['total_rows'], extra_columns
+            )
+        self._worker = ProcessingWorker(
+            self._iter_rows(background['snapshot'], start_row, idx_col, old_index_col_idx),
+            background['search_rows'],
+            pause_on_manual=background['semi_auto'],
+        )
+        self._worker.row_searched.connect(self._queue_row_searched)
+        self._worker.row_skipped.connect(self._queue_row_skipped)
+        self._worker.failed.connect(self._on_worker_failed)
+        self._worker.finished.connect(self._on_worker_finished)
+        self._update_timer.start()
+        self._worker.start()
+        return True
+    
+    def _iter_rows(
+        self,
+        snapshot: RowSnapshot,
+        start_row: int,
+        idx_col: int,
+        old_index_col_idx: Optional[int]
+    ) -> Iterator[Tuple[int, Optional[Address], Optional[str]]]:
+        """Рядки для ProcessingWorker зі знімка: (рядок, адреса, причина пропуску або None)"""
+        for row_idx in range(start_row, snapshot.end_row):
+            if self._is_row_already_processed(snapshot, row_idx, idx_col, old_index_col_idx):
+                yield row_idx, None, 'skipped'
                 continue
             
             try:
-                address = self.excel_handler.get_address_from_row(row_idx)
-                result = search_func(address, auto_apply=True)
-                
-                if result['mode'] == 'auto' and result['applied']:
-                    # Автопідстановка
-                    auto_result = result['auto_result']
-                    index = self._determine_index(auto_result)
-                    
-                    if index:
-                        self._apply_index_to_row(row_idx, index, idx_col)
-                        self.stats['auto_applied'] += 1
-                        
-                        if self.on_row_processed:
-                            self.on_row_processed(row_idx, index, 'auto')
-                
-                else:
-                    # ПАУЗА для ручного вибору
-                    self.semi_auto_waiting = True
-                    self.current_row = row_idx
-                    
-                    if result['mode'] == 'manual':
-                        self.stats['manual_required'] += 1
-                    else:
-                        self.stats['not_found'] += 1
-                    
-                    if self.on_semi_auto_pause:
-                        # Передаємо ручні результати
-                        manual_results = result.get('manual_results', [])
-                        self.on_semi_auto_pause(row_idx, manual_results)
-                    
-                    # ЗУПИНЯЄМОСЬ і чекаємо вибору користувача
-                    return self.stats
-                    
+                address = snapshot.address(row_idx)
             except Exception as e:
-                self.logger.error(f"Помилка обробки рядка {row_idx}: {e}")
-                self.stats['errors'] += 1
+                self.logger.error(f"🔥 Помилка обробки рядка {row_idx}: {e}")
+                yield row_idx, None, 'errors'
                 continue
+            
+            if not address or address.is_empty():
+                yield row_idx, None, 'skipped'
+                continue
+            
+            yield row_idx, address, None
+    
+    @pyqtSlot(int, object)
+    def _queue_row_searched(self, row_idx: int, result: Dict):
+        self._pending_updates.append(('searched', row_idx, result))
+    
+    @pyqtSlot(int, str)
+    def _queue_row_skipped(self, row_idx: int, stats_key: str):
+        self._pending_updates.append(('skipped', row_idx, stats_key))
+    
+    @pyqtSlot(str)
+    def _on_worker_failed(self, message: str):
+        self.logger.error(f"🔥 Помилка фонової обробки: {message}")
+        self.stats['errors'] += 1
+    
+    @pyqtSlot()
+    def _flush_updates(self):
+        """Застосовує накопичені результати потоку одним пакетом"""
+        pending, self._pending_updates = self._pending_updates, []
+        if not pending or self.is_stopped or self.semi_auto_waiting:
+            return
+        
+        background = self._background
+        idx_col = self.excel_handler.column_mapping['index'][0]
+        last_row = None
+        
+        for kind, row_idx, payload in pending:
+            last_row = row_idx
+            if kind == 'skipped':
+                self.stats[payload] += 1
+                continue
+            
+            if payload.get('deduplicated'):
+                self.stats['searches_saved'] += 1
+            applied = self._handle_search_result(row_idx, payload, idx_col, background['min_confidence'])
+            if not applied and background['semi_auto']:
+                self._worker.stop()
+                self._pause_semi_auto(row_idx, payload)
+                break
         
-        self.is_processing = False
-        self._log_final_stats()
-        
-        return self.stats
+        if self.on_progress_update and last_row is not None and not self.semi_auto_waiting:
+            self.on_progress_update(last_row + 1, background['total_rows'])
     
-    def continue_semi_auto(
-        self, 
-        search_func: Callable[[Address, bool], Dict]
-    ) -> Dict[str, int]:
-        """
-        Продовжує напівавтоматичну обробку після ручного вибору
+    @pyqtSlot()
+    def _on_worker_finished(self):
+        """Завершення потоку: дозастосовує результати і звітує"""
+        self._flush_updates()
+        self._update_timer.stop()
+        self._worker = None
         
-        Args:
-            search_func: Функція пошуку
-            
-        Returns:
-            Словник зі статистикою
-        """
-        if not self.semi_auto_waiting:
-            return self.stats
+        if self.semi_auto_waiting:
+            return
         
-        self.semi_auto_waiting = False
-        next_row = self.current_row + 1
+        self.is_processing = False
+        if self.is_stopped:
+            self.logger.info("⏸️  Обробку зупинено користувачем")
+        self._log_final_stats()
         
-        total_rows = len(self.excel_handler.df)
-        return self.start_semi_auto_processing(
-            next_row, total_rows, search_func
-        )
+        on_finished = self._background['on_finished'] if self._background else None
+        self._background = None
+        if on_finished:
+            on_finished(self.stats)
     
     def stop_processing(self):
         """Зупиняє обробку"""
         self.is_stopped = True
         self.semi_auto_waiting = False
         self.is_processing = False
+        if self._worker is not None:
+            self._worker.stop()
         self.logger.info("⏹️  Обробку зупинено")
     
     def apply_index(self, row_idx: int, index: str) -> bool:
@@ -344,7 +287,7 @@ class ProcessingManager:
             })
             
             # Застосовуємо новий індекс
-            self.excel_handler.df.iloc[row_idx, idx_col] = index
+            self.excel_handler.set_cell(row_idx, idx_col, index)
             
             if self.on_row_processed:
                 self.on_row_processed(row_idx, index, 'manual')
@@ -355,29 +298,92 @@ class ProcessingManager:
             self.logger.error(f"Помилка застосування індексу: {e}")
             return False
     
-    def _determine_index(self, result: Dict) -> str:
+    def _reset_stats(self, total: int):
+        """Скидає статистику перед новим запуском"""
+        self.stats = {
+            'total': total,
+            'auto_applied': 0,
+            'manual_required': 0,
+            'not_found': 0,
+            'skipped': 0,
+            'errors': 0,
+            'searches_saved': 0  # Рядки з повтором адреси, що не шукались окремо
+        }
+    
+    def _handle_search_result(
+        self,
+        row_idx: int,
+        result: Dict,
+        idx_col: int,
+        min_confidence: int = 0
+    ) -> bool:
         """
-        Визначає індекс за правилами обробки
+        Застосовує відповідь search_with_auto до рядка та оновлює статистику
         
         Args:
-            result: Результат пошуку
+            row_idx: Номер рядка
+            result: Відповідь search_with_auto (auto_apply=True)
+            idx_col: Номер колонки індексу
+            min_confidence: Мінімальна точність автопідстановки, %
             
         Returns:
-            Індекс або '*' для спеціальних випадків
+            True якщо індекс проставлено автоматично
         """
-        not_working = result.get('not_working', '')
+        if result['mode'] == 'auto' and result['applied']:
+            # ✅ АВТОПІДСТАНОВКА
+            auto_result = result['auto_result']
+            index = self._determine_index(auto_result)
+            confidence = auto_result.get('confidence', 0)
+            
+            if index and confidence >= min_confidence:
+                self._apply_index_to_row(row_idx, index, idx_col)
+                self.stats['auto_applied'] += 1
+                
+                if self.on_row_processed:
+                    self.on_row_processed(row_idx, index, 'auto')
+                
+                self.logger.debug(
+                    f"✅ Рядок {row_idx}: AUTO -> [{index}] "
+                    f"{auto_result['city']}, {auto_result['street']}, {auto_result['building']}"
+                )
+                return True
+            
+            # Без індексу або нижче порогу точності - на ручний вибір
+            self.stats['manual_required'] += 1
+            self.logger.debug(f"⚠️  Рядок {row_idx}: AUTO без індексу або точність {confidence}% < {min_confidence}%")
         
-        # Тимчасово не функціонує (але не ВПЗ)
-        if 'Тимчасово не функціонує' in not_working and 'ВПЗ' not in not_working:
-            return '*'
+        elif result['mode'] == 'manual':
+            # ⚠️ ПОТРІБЕН РУЧНИЙ ВИБІР
+            self.stats['manual_required'] += 1
+            self.logger.debug(f"⚠️  Рядок {row_idx}: MANUAL (знайдено {result['total_found']} варіантів)")
         
-        # ВПЗ - шукаємо індекс у тексті
-        if 'ВПЗ' in not_working:
-            match = re.search(r'(\d{5})', not_working)
-            return match.group(1) if match else '*'
+        else:
+            # ❌ НІЧОГО НЕ ЗНАЙДЕНО
+            self.stats['not_found'] += 1
+            self.logger.debug(f"❌ Рядок {row_idx}: NOT_FOUND")
         
-        # Звичайний індекс
-        return result.get('index', '')
+        return False
+    
+    def _pause_semi_auto(self, row_idx: int, result: Dict):
+        """Пауза напівавтоматичної обробки для ручного вибору"""
+        self.semi_auto_waiting = True
+        self.current_row = row_idx
+        
+        if self.on_semi_auto_pause:
+            # Передаємо ручні результати
+            self.on_semi_auto_pause(row_idx, result.get('manual_results', []))
+    
+    def _determine_index(self, result: Dict) -> str:
+        """
+        Визначає індекс за правилами обробки (utils.index_rules.determine_index)
+        
+        Args:
+            result: Результат пошуку
+            
+        Returns:
+            Індекс або '*' для спеціальних випадків
+        """
+        return determine_index(result)
     
     def _apply_index_to_row(self, row_idx: int, index: str, idx_col: int):
         """
@@ -388,10 +394,11 @@ class ProcessingManager:
             index: Індекс
             idx_col: Номер колонки індексу
         """
-        self.excel_handler.df.iloc[row_idx, idx_col] = index
+        self.excel_handler.set_cell(row_idx, idx_col, index)
     
     def _is_row_already_processed(
-        self, 
+        self,
+        snapshot: RowSnapshot,
         row_idx: int, 
         idx_col: int, 
         old_index_col_idx: Optional[int]
@@ -400,6 +407,7 @@ class ProcessingManager:
         Перевіряє чи рядок вже оброблено
         
         Args:
+            snapshot: Знімок рядків обробки
             row_idx: Номер рядка
             idx_col: Колонка індексу
             old_index_col_idx: Колонка старого індексу
@@ -411,8 +419,8 @@ class ProcessingManager:
             return False
         
         try:
-            current_index = str(self.excel_handler.df.iloc[row_idx, idx_col]).strip()
-            old_index = str(self.excel_handler.df.iloc[row_idx, old_index_col_idx]).strip()
+            current_index = str(snapshot.value(row_idx, idx_col)).strip()
+            old_index = str(snapshot.value(row_idx, old_index_col_idx)).strip()
             
             # Нормалізуємо
             if current_index in ['', 'nan', 'None']:
@@ -450,4 +458,5 @@ class ProcessingManager:
         self.logger.info(f"❌ Не знайдено:        {self.stats['not_found']}")
         self.logger.info(f"⏭️  Пропущено:          {self.stats['skipped']}")
         self.logger.info(f"🔥 Помилки:            {self.stats['errors']}")
+        self.logger.info(f"♻️  Повтори адрес:      {self.stats.get('searches_saved', 0)} (пошуків заощаджено)")
         self.logger.info("=" * 80 + "\n")
@@ -0,0 +1,78 @@
+"""
+ProcessingWorker - пошук рядків автоматичної обробки у фоновому потоці
+
+Потік будує адреси з RowSnapshot (знімка колонок, знятого в GUI-потоці)
+і шукає їх; DataFrame і таблицю змінює ProcessingManager у GUI-потоці,
+отримуючи результати сигналами.
+"""
+
+from typing import Callable, Iterable, Optional, Tuple
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from models.address import Address
+
+
+class ProcessingWorker(QThread):
+    """Фоновий пошук рядків для авто- та напівавтоматичної обробки"""
+
+    row_searched = pyqtSignal(int, object)  # рядок, відповідь search_with_auto
+    row_skipped = pyqtSignal(int, str)      # рядок, ключ статистики ('skipped' / 'errors')
+    failed = pyqtSignal(str)
+
+    def __init__(
+        self,
+        rows: Iterable[Tuple[int, Optional[Address], Optional[str]]],
+        search_rows: Callable,
+        pause_on_manual: bool = False,
+    ):
+        """
+        Args:
+            rows: (рядок, адреса, причина пропуску або None) зі знімка; читається у фоновому потоці
+            search_rows: SearchManager.search_rows_with_auto
+            pause_on_manual: Зупинитись після першого рядка без автопідстановки
+                (напівавтомат - рядки шукаються по одному, без пулу процесів)
+        """
+        super().__init__()
+        self.rows = rows
+        self.search_rows = search_rows
+        self.pause_on_manual = pause_on_manual
+        self._stop_requested = False
+
+    def stop(self):
+        """Запит на зупинку (поточний пошук рядка завершиться)"""
+        self._stop_requested = True
+
+    def is_stop_requested(self) -> bool:
+        return self._stop_requested
+
+    def run(self):
+        """Виконується у фоновому потоці"""
+        searched_rows = []
+
+        def addresses():
+            for row_idx, address, skip_reason in self.rows:
+                if self._stop_requested:
+                    return
+                if skip_reason:
+                    self.row_skipped.emit(row_idx, skip_reason)
+                    continue
+                searched_rows.append(row_idx)
+                yield address
+
+        try:
+            if self.pause_on_manual:
+                results = self.search_rows(addresses(), auto_apply=True, parallel=False)
+            else:
+                results = self.search_rows(
+                    list(addresses()), auto_apply=True, should_stop=self.is_stop_requested
+                )
+
+            for position, response in results:
+                if self._stop_requested:
+                    break
+                self.row_searched.emit(searched_rows[position], response)
+                if self.pause_on_manual and not (response['mode'] == 'auto' and response['applied']):
+                    break
+        except Exception as e:
+            self.failed.emit(str(e))
@@ -10,11 +10,15 @@ SearchManager - управління пошуком адрес
 
 import os
 import json
+import threading
+from collections import Counter, OrderedDict
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from search.hybrid_search import HybridSearch
+from search.parallel_search import ParallelSearchEngine
 from models.address import Address
+from utils.cache_manager import CacheManager
 from utils.logger import Logger
 import config
 
@@ -22,12 +26,18 @@ import config
 class SearchManager:
     """Менеджер для пошуку адрес з автоматичною та ручною підстановкою"""
     
+    parallel_engine: Optional[ParallelSearchEngine] = None  # Пул процесів, створюється за потреби
+    result_cache: Optional[CacheManager] = None  # Збережені результати пошуку (SQLite)
+    log_queries = True  # Писати запити і результати в logs/search_queries.jsonl
+    
     def __init__(self):
         """Ініціалізація SearchManager"""
         self.logger = Logger()
         self.search_engine: Optional[HybridSearch] = None
         self.last_results: List[Dict] = []
         self.last_search_response: Optional[Dict] = None  # Повна відповідь з search_with_confidence
+        self.parallel_engine = None
+        self.result_cache = CacheManager()
         self._initialize_search_engine()
     
     def _initialize_search_engine(self):
@@ -101,40 +111,277 @@ class SearchManager:
             # Логуємо запит
             self._log_search_request(address)
             
-            # Виконуємо пошук з рівнями впевненості
-            result = self.search_engine.search_with_confidence(address, max_results)
+            self._preprocess_address(address)
             
-            # Формуємо відповідь
-            response = {
-                'mode': result['search_mode'],
-                'auto_result': result['auto'],
-                'manual_results': result['manual'],
-                'total_found': result['total_found'],
-                'applied': False
-            }
+            # Виконуємо пошук з рівнями впевненості (спершу - кеш результатів)
+            cache_key = self._result_cache_key(address, max_results)
+            result = self.result_cache.get(cache_key) if cache_key else None
+            if result is None:
+                result = self.search_engine.search_with_confidence(address, max_results)
+                if cache_key:
+                    self.result_cache.set(cache_key, result)
+                    self.result_cache.flush()
             
-            # Логуємо результати
-            self._log_search_results_detailed(address, result)
-            
-            # Автоматична підстановка якщо дозволено
-            if auto_apply and result['search_mode'] == 'auto':
-                response['applied'] = True
-                self._log_auto_applied(address, result['auto'])
-                self.logger.info(
-                    f"✅ Автопідстановка: [{result['auto']['index']}] "
-                    f"{result['auto']['city']}, {result['auto']['street']}, {result['auto']['building']}"
-                )
+            response = self._build_auto_response(address, result, auto_apply)
             
-            # Зберігаємо результати
+            # Зберігаємо результати; пакетний пошук іде з фонового потоку і їх не змінює
             self.last_results = result['manual']
             self.last_search_response = response
-            
             return response
             
         except Exception as e:
             self.logger.error(f"Помилка пошуку: {e}")
             return self._empty_response(error=str(e))
     
+    def _build_auto_response(self, address: Address, result: Dict, auto_apply: bool) -> Dict:
+        """
+        Формує відповідь search_with_auto з результату search_with_confidence
+        
+        Args:
+            address: Оригінальна адреса запиту
+            result: Результат search_with_confidence
+            auto_apply: Чи застосовувати автопідстановку автоматично
+        """
+        response = {
+            'mode': result['search_mode'],
+            'auto_result': result['auto'],
+            'manual_results': result['manual'],
+            'total_found': result['total_found'],
+            'applied': False
+        }
+        
+        # Логуємо результати
+        self._log_search_results_detailed(address, result)
+        
+        # Автоматична підстановка якщо дозволено
+        if auto_apply and result['search_mode'] == 'auto':
+            response['applied'] = True
+            self._log_auto_applied(address, result['auto'])
+            self.logger.info(
+                f"✅ Автопідстановка: [{result['auto']['index']}] "
+                f"{result['auto']['city']}, {result['auto']['street']}, {result['auto']['building']}"
+            )
+        
+        return response
+    
+    def search_rows_with_auto(
+        self,
+        addresses: Iterable[Address],
+        max_results: int = 20,
+        auto_apply: bool = False,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        parallel: bool = True,
+    ) -> Iterator[Tuple[int, Dict]]:
+        """
+        Пакетний search_with_auto для автообробки
+        
+        Адреси проходять ту саму попередню обробку (на місці), що й у
+        search_with_auto, до дедуплікації та кешу результатів.
+        Однакові адреси (Address.search_key) шукаються один раз, а результат
+        розсилається всім таким рядкам з позначкою 'deduplicated': True.
+        Від config.PARALLEL_MIN_ROWS різних адрес пошук іде в пулі процесів
+        (config.MAX_WORKERS), інакше - послідовно. Результати завжди
+        повертаються в порядку addresses; перерваний цикл скасовує решту.
+        
+        Args:
+            addresses: Адреси для пошуку (при parallel=False - будь-який
+                ітератор, що читається по одному рядку)
+            max_results: Максимальна кількість результатів для ручного вибору
+            auto_apply: Чи застосовувати автопідстановку автоматично
+            on_progress: Виклик (готово, всього) під час очікування пулу
+            should_stop: Перевірка запиту на зупинку під час очікування пулу
+            parallel: Дозволити пул процесів
+            
+        Yields:
+            (позиція в addresses, відповідь як у search_with_auto)
+        """
+        try:
+            if parallel:
+                yield from self._search_rows_distinct(
+                    list(addresses), max_results, auto_apply, on_progress, should_stop
+                )
+            else:
+                yield from self._search_rows_sequential(addresses, max_results, auto_apply)
+        finally:
+            # Нові результати - на диск одним пакетом
+            if self.result_cache:
+                self.result_cache.flush()
+    
+    def _search_rows_distinct(
+        self,
+        addresses: List[Address],
+        max_results: int,
+        auto_apply: bool,
+        on_progress: Optional[Callable[[int, int], None]],
+        should_stop: Optional[Callable[[], bool]]
+    ) -> Iterator[Tuple[int, Dict]]:
+        """Пакетний пошук: кожна різна адреса - з кешу результатів, пулу процесів або послідовно"""
+        for address in addresses:
+            self._preprocess_address(address)
+        keys = [address.search_key() for address in addresses]
+        remaining = Counter(keys)
+        first_positions = []  # Позиція першої появи кожної різної адреси
+        seen = set()
+        for position, key in enumerate(keys):
+            if key not in seen:
+                seen.add(key)
+                first_positions.append(position)
+        distinct = [addresses[position] for position in first_positions]
+        
+        saved = len(addresses) - len(distinct)
+        if saved:
+            self.logger.info(f"Дедуплікація: {len(distinct)} різних адрес на {len(addresses)} рядків")
+        
+        # Спершу - збережені результати, шукаємо лише решту
+        cache_keys = [self._result_cache_key(address, max_results) for address in distinct]
+        cached_results = {}
+        for distinct_index, cache_key in enumerate(cache_keys):
+            cached = self.result_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                cached_results[distinct_index] = cached
+        missing = [index for index in range(len(distinct)) if index not in cached_results]
+        if cached_results:
+            self.logger.info(f"Кеш результатів: {len(cached_results)} з {len(distinct)} адрес")
+        
+        engine = None
+        if len(missing) >= config.PARALLEL_MIN_ROWS:
+            engine = self._get_parallel_engine()
+        
+        if engine is None:
+            searched = (self._search_uncached(distinct[index], max_results) for index in missing)
+        else:
+            self.logger.info(f"Паралельний пошук {len(missing)} адрес, процесів: {engine.max_workers}")
+            searched = (
+                result for _, result in engine.search_many(
+                    [distinct[index] for index in missing], max_results,
+                    on_progress=on_progress, should_stop=should_stop
+                )
+            )
+        
+        def raw_results():
+            for distinct_index in range(len(distinct)):
+                if distinct_index in cached_results:
+                    yield distinct_index, cached_results.pop(distinct_index)
+                    continue
+                result = next(searched, None)
+                if result is None:
+                    return
+                if cache_keys[distinct_index] and 'error' not in result:
+                    self.result_cache.set(cache_keys[distinct_index], result)
+                yield distinct_index, result
+        
+        # Результат тримаємо, доки не роздано останньому рядку з тією ж адресою
+        results_by_key: Dict[tuple, Dict] = {}
+        position = 0
+        for distinct_index, result in raw_results():
+            results_by_key[keys[first_positions[distinct_index]]] = result
+            next_first = distinct_index + 1
+            limit = first_positions[next_first] if next_first < len(first_positions) else len(addresses)
+            
+            while position < limit:
+                key = keys[position]
+                response = self._response_from_result(addresses[position], results_by_key[key], auto_apply)
+                # У проміжку до наступної нової адреси лише перший рядок шукався сам
+                if position != first_positions[distinct_index]:
+                    response['deduplicated'] = True
+                remaining[key] -= 1
+                if not remaining[key]:
+                    del results_by_key[key]
+                yield position, response
+                position += 1
+    
+    def _search_rows_sequential(
+        self,
+        addresses: Iterable[Address],
+        max_results: int,
+        auto_apply: bool
+    ) -> Iterator[Tuple[int, Dict]]:
+        """Послідовний пакетний пошук з пам'яттю останніх config.DEDUP_MAX_ENTRIES адрес"""
+        results_by_key: "OrderedDict[tuple, Dict]" = OrderedDict()
+        for position, address in enumerate(addresses):
+            self._preprocess_address(address)
+            key = address.search_key()
+            result = results_by_key.get(key)
+            deduplicated = result is not None
+            if deduplicated:
+                results_by_key.move_to_end(key)
+            else:
+                result = self._search_raw(address, max_results)
+                results_by_key[key] = result
+                if len(results_by_key) > config.DEDUP_MAX_ENTRIES:
+                    results_by_key.popitem(last=False)
+            
+            response = self._response_from_result(address, result, auto_apply)
+            if deduplicated:
+                response['deduplicated'] = True
+            yield position, response
+    
+    def _preprocess_address(self, address: Address):
+        """
+        Попередня обробка search_with_confidence - до кешу результатів
+
+        Ключ кешу береться з уже розібраної адреси, тож у кожної адреси один
+        запис, а влучання в кеш змінює адресу так само, як сам пошук.
+        """
+        preprocess = getattr(self.search_engine, 'preprocess_address', None)
+        if callable(preprocess):
+            preprocess(address)
+    
+    def _result_cache_key(self, address: Address, max_results: int) -> Optional[str]:
+        """Ключ кешу результатів (None якщо кеш вимкнено)"""
+        if not self.result_cache or not self.result_cache.enabled:
+            return None
+        return f"{self.result_cache.generate_key(address.to_dict())}:{max_results}"
+    
+    def _search_raw(self, address: Address, max_results: int) -> Dict:
+        """search_with_confidence через кеш результатів; помилка - {'error': текст}"""
+        cache_key = self._result_cache_key(address, max_results)
+        if cache_key:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        result = self._search_uncached(address, max_results)
+        if cache_key and 'error' not in result:
+            self.result_cache.set(cache_key, result)
+        return result
+    
+    def _search_uncached(self, address: Address, max_results: int) -> Dict:
+        """search_with_confidence; помилка повертається як {'error': текст}"""
+        if not self.search_engine:
+            return {'error': "Пошуковий движок не ініціалізовано"}
+        try:
+            return self.search_engine.search_with_confidence(address, max_results)
+        except Exception as e:
+            return {'error': str(e)}
+    
+    def _response_from_result(self, address: Address, result: Dict, auto_apply: bool) -> Dict:
+        """Відповідь search_with_auto з результату пакетного пошуку (з логуванням)"""
+        self._log_search_request(address)
+        if 'error' in result:
+            self.logger.error(f"Помилка пошуку: {result['error']}")
+            return self._empty_response(error=result['error'])
+        return self._build_auto_response(address, result, auto_apply)
+    
+    def _get_parallel_engine(self) -> Optional[ParallelSearchEngine]:
+        """Пул процесів пошуку (None якщо config.MAX_WORKERS <= 1)"""
+        if not self.search_engine or config.MAX_WORKERS <= 1:
+            return None
+        if self.parallel_engine is None:
+            # Процеси пулу відкривають готове сховище, а не перебудовують кеш кожен окремо
+            self.search_engine._ensure_loaded()
+            self.parallel_engine = ParallelSearchEngine(max_workers=config.MAX_WORKERS)
+        return self.parallel_engine
+    
+    def shutdown(self):
+        """Зупиняє пул процесів пошуку і записує кеш результатів"""
+        if self.parallel_engine is not None:
+            self.parallel_engine.close()
+        self.parallel_engine = None
+        if self.result_cache:
+            self.result_cache.flush()
+    
     def get_auto_result_only(self, address: Address) -> Optional[Dict]:
         """
         Отримати ТІЛЬКИ результат для автопідстановки
@@ -179,6 +426,29 @@ class SearchManager:
 
         return self.search_engine.magistral_records
     
+    def warm_up_regions(self, regions: List[str]) -> Optional[threading.Thread]:
+        """
+        Фоново відкриває дані областей щойно відкритого файлу (config.MAGISTRAL_REGION_WARMUP)
+
+        Returns:
+            Потік прогріву або None, якщо прогрівати нічого
+        """
+        preload = getattr(self.search_engine, 'preload_regions', None)
+        if not config.MAGISTRAL_REGION_WARMUP or not regions or not callable(preload):
+            return None
+
+        def warm_up():
+            try:
+                loaded = preload(regions)
+                if loaded:
+                    self.logger.info(f"Прогріто областей довідника: {loaded}")
+            except Exception as e:
+                self.logger.error(f"Помилка прогріву областей: {e}")
+
+        thread = threading.Thread(target=warm_up, name="region-warmup", daemon=True)
+        thread.start()
+        return thread
+    
     def refresh_cache(self, force_reload: bool = True):
         """
         Оновлює кеш magistral.csv
@@ -190,7 +460,13 @@ class SearchManager:
             if self.search_engine and hasattr(self.search_engine, 'loader'):
                 records = self.search_engine.loader.load(force_reload=force_reload)
                 self.search_engine.magistral_records = records
+                if hasattr(self.search_engine, 'similarity'):
+                    self.search_engine.similarity.clear_cache()
                 self.search_engine._is_loaded = True
+                # Процеси пулу тримають старі індекси, а кеш - старі результати
+                self.shutdown()
+                if self.result_cache:
+                    self.result_cache.refresh_fingerprint()
                 self.logger.info("Кеш magistral.csv оновлено")
         except Exception as e:
             self.logger.error(f"Помилка оновлення кешу: {e}")
@@ -203,6 +479,9 @@ class SearchManager:
         Args:
             address: Адреса для логування
         """
+        if not self.log_queries:
+            return
+        
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'type': 'search_request',
@@ -259,6 +538,9 @@ class SearchManager:
             address: Оригінальна адреса запиту
             result: Результат з search_with_confidence
         """
+        if not self.log_queries:
+            return
+        
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'type': 'search_results_v2',
@@ -312,6 +594,9 @@ class SearchManager:
             address: Оригінальна адреса
             auto_result: Результат що був застосований
         """
+        if not self.log_queries:
+            return
+        
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'type': 'auto_applied',
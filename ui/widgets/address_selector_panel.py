@@ -2,6 +2,8 @@
 Панель підбору адреси - ВИПРАВЛЕНА ВЕРСІЯ
 ВИПРАВЛЕНО: кеш ukrposhta_v2.pkl.xz тепер створюється правильно
 """
+import threading
+
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
     QLineEdit, QPushButton, QFormLayout, QCompleter, QComboBox, 
@@ -28,6 +30,7 @@ class AddressSelectorPanel(QWidget):
         self.cascade_font_size = 12
         
         self.ukr_index = UkrposhtaIndex()
+        self._ukr_index_thread = None
         self.all_streets_cache = []
         
         self.init_ui()
@@ -299,10 +302,8 @@ class AddressSelectorPanel(QWidget):
         if cache_loaded:
             print("✅ UkrposhtaIndex завантажено з кешу")
         else:
-            # Якщо кешу немає - будуємо (це довго ~2 хв)
-            print("⏳ Побудова індексу Укрпошти (це займе ~2 хв)...")
-            self.ukr_index.build(magistral_records)
-            print("✅ Індекс побудовано і збережено")
+            # Кешу немає або він застарів - будуємо у фоні (це довго ~2 хв)
+            self._rebuild_ukr_index_in_background(magistral_records)
         
         # Для лівої панелі - ЦЕЙ КОД МАЄ ВИКОНУВАТИСЯ ЗАВЖДИ!
         cities_with_districts = {}
@@ -344,7 +345,22 @@ class AddressSelectorPanel(QWidget):
 
         # The compact Ukrposhta index is enough for the cascade city/street search.
         # Avoid rebuilding completer lists on startup; that work freezes the UI.
-        self.ukr_index.load()
+        if not self.ukr_index.load():
+            self._rebuild_ukr_index_in_background(magistral_records)
+
+    def _rebuild_ukr_index_in_background(self, magistral_records):
+        """Будує індекс Укрпошти у фоновому потоці; форма підхоплює його після заміни"""
+        if self._ukr_index_thread is not None and self._ukr_index_thread.is_alive():
+            return
+
+        print("⏳ Побудова індексу Укрпошти у фоні...")
+        self._ukr_index_thread = threading.Thread(
+            target=self.ukr_index.build,
+            args=(magistral_records,),
+            name="ukrposhta-index",
+            daemon=True,
+        )
+        self._ukr_index_thread.start()
     
     # ==================== КАСКАДНА ФОРМА (УКРПОШТА) ====================
     
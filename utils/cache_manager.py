@@ -1,124 +1,320 @@
 """
 Менеджер кешування результатів пошуку
+
+Результати зберігаються в SQLite (config.SEARCH_CACHE_PATH) за ключем повної
+адреси. Кожен запис позначений відбитком довідника та версій програми,
+формату кешу й правил нормалізації - після оновлення magistral.csv, аліасів
+вулиць або версії старі результати не повертаються. Записи накопичуються
+в пам'яті й пишуться пакетами, а застарілі (config.CACHE_EXPIRY_DAYS)
+видаляються періодичним прибиранням. Поруч лежить маніфест (utils.cache_manifest): якщо при старті
+відбиток чи джерела змінилися, результати інших відбитків видаляються у
+фоні, а не перед першим пошуком.
 """
+import hashlib
 import json
 import os
-import hashlib
-from datetime import datetime
+import sqlite3
+import threading
+import time
 from typing import Dict, Optional
+
 import config
+from search.magistral_loader import MagistralLoader
+from search.normalizer import TextNormalizer
+from utils.cache_manifest import stale_reason, write_manifest
+from utils.logger import Logger
+
+CLEANUP_BATCH_SIZE = 5000  # Рядків за транзакцію фонового прибирання
+
+# Збільшується при зміні пошуку чи оцінки кандидатів, що змінює збережені результати
+RESULTS_VERSION = 1
+
+
+def reference_fingerprint() -> str:
+    """
+    Відбиток даних і правил, від яких залежить результат пошуку
+
+    Враховує версії (config.APP_VERSION, RESULTS_VERSION,
+    MagistralLoader.CACHE_VERSION, TextNormalizer.RULES_VERSION), розмір і
+    час зміни magistral.csv та SQLite-кешу класифікатора і вміст аліасів вулиць.
+    """
+    digest = hashlib.sha1()
+    versions = (config.APP_VERSION, RESULTS_VERSION, MagistralLoader.CACHE_VERSION, TextNormalizer.RULES_VERSION)
+    digest.update(repr(versions).encode('utf-8'))
+
+    for path in (config.MAGISTRAL_CSV_PATH, config.UKRPOSHTA_CLASSIFIER_SQLITE_PATH):
+        try:
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+        except OSError:
+            digest.update(f"{path}:missing".encode('utf-8'))
+
+    try:
+        with open(config.STREET_ALIASES_PATH, 'rb') as f:
+            digest.update(f.read())
+    except OSError:
+        digest.update(f"{config.STREET_ALIASES_PATH}:missing".encode('utf-8'))
+
+    return digest.hexdigest()
 
 
 class CacheManager:
     """Менеджер для кешування результатів пошуку"""
-    
-    def __init__(self):
-        self.cache_file = config.SEARCH_CACHE_PATH
-        self.cache: Dict[str, Dict] = {}
+
+    def __init__(self, cache_file: str = None, fingerprint: str = None):
+        """
+        Args:
+            cache_file: Шлях до SQLite файлу (None - config.SEARCH_CACHE_PATH)
+            fingerprint: Відбиток довідника (None - reference_fingerprint())
+        """
+        self.cache_file = cache_file or config.SEARCH_CACHE_PATH
         self.enabled = config.ENABLE_SEARCH_CACHE
-        
+        self.logger = Logger()
+        self.fingerprint = ""
+
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pending: Dict[str, str] = {}  # Ще не записані результати (JSON)
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._cleanup_thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
         if self.enabled:
-            self._load_cache()
-    
+            self._open(fingerprint)
+
     def generate_key(self, address_data: Dict) -> str:
         """
         Генерує унікальний ключ для адреси
-        
+
         Args:
-            address_data: Словник з даними адреси
-            
+            address_data: Словник з даними адреси (як Address.to_dict())
+
         Returns:
-            MD5 хеш ключ
+            SHA1 хеш ключ
         """
-        # Створюємо нормалізований рядок
-        key_parts = []
-        for field in ['city', 'street', 'region', 'district']:
-            value = str(address_data.get(field, '')).lower().strip()
-            if value:
-                key_parts.append(value)
-        
+        # Усі поля, що впливають на пошук, у фіксованому порядку - порожні теж
+        key_parts = [
+            " ".join(str(address_data.get(field) or '').split()).lower()
+            for field in ['region', 'district', 'city', 'street', 'building', 'index']
+        ]
         key_string = '|'.join(key_parts)
-        
-        # MD5 хеш
-        return hashlib.md5(key_string.encode('utf-8')).hexdigest()
-    
+
+        return hashlib.sha1(key_string.encode('utf-8')).hexdigest()
+
     def get(self, key: str) -> Optional[Dict]:
         """
         Отримує результат з кешу
-        
+
         Args:
             key: Ключ кешу
-            
+
         Returns:
             Результат або None
         """
         if not self.enabled:
             return None
-        
-        if key not in self.cache:
-            return None
-        
-        cached_item = self.cache[key]
-        
-        # Перевіряємо чи не застарів
-        if config.CACHE_EXPIRY_DAYS > 0:
-            cached_date = datetime.fromisoformat(cached_item.get('cached_at', '2000-01-01'))
-            age_days = (datetime.now() - cached_date).days
-            
-            if age_days > config.CACHE_EXPIRY_DAYS:
-                # Видаляємо застарілий
-                del self.cache[key]
-                self._save_cache()
+
+        with self._lock:
+            payload = self._pending.get(key)
+            if payload is None:
+                row = self._connection.execute(
+                    "SELECT result, cached_at FROM results WHERE key = ? AND fingerprint = ?",
+                    (key, self.fingerprint)
+                ).fetchone()
+                if row is not None and not self._is_expired(row[1]):
+                    payload = row[0]
+
+            if payload is None:
+                self.misses += 1
                 return None
-        
-        return cached_item.get('result')
-    
+            self.hits += 1
+
+        return json.loads(payload)
+
     def set(self, key: str, result: Dict):
         """
-        Зберігає результат в кеш
-        
+        Зберігає результат в кеш (запис на диск - пакетом)
+
         Args:
             key: Ключ
             result: Результат для збереження
         """
         if not self.enabled:
             return
-        
-        self.cache[key] = {
-            'result': result,
-            'cached_at': datetime.now().isoformat()
-        }
-        
-        self._save_cache()
-    
+
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            self._pending[key] = payload
+            should_flush = len(self._pending) >= config.SEARCH_CACHE_BATCH_SIZE
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Записує накопичені результати однією транзакцією"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if self._pending:
+                now = time.time()
+                try:
+                    with self._connection:
+                        self._connection.executemany(
+                            "INSERT OR REPLACE INTO results (key, fingerprint, cached_at, result) VALUES (?, ?, ?, ?)",
+                            [(key, self.fingerprint, now, payload) for key, payload in self._pending.items()]
+                        )
+                    self._pending.clear()
+                except sqlite3.Error as e:
+                    self.logger.error(f"⚠️ Помилка збереження кешу: {e}")
+
+            if time.time() - self._last_sweep >= config.SEARCH_CACHE_SWEEP_INTERVAL:
+                self._sweep()
+
     def clear(self):
         """Очищає весь кеш"""
-        self.cache.clear()
-        self._save_cache()
-    
-    def _load_cache(self):
-        """Завантажує кеш з файлу"""
-        if not os.path.exists(self.cache_file):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._pending.clear()
+            with self._connection:
+                self._connection.execute("DELETE FROM results")
+
+    def refresh_fingerprint(self, fingerprint: str = None):
+        """
+        Перераховує відбиток після оновлення довідника
+
+        Результати зі старим відбитком видаляються.
+        """
+        if not self.enabled:
             return
-        
+
+        with self._lock:
+            self._pending.clear()
+            self.fingerprint = fingerprint or reference_fingerprint()
+            self._sweep()
+            self._write_manifest()
+
+    def close(self):
+        """Записує накопичене і закриває файл"""
+        if not self.enabled or self._connection is None:
+            return
+
+        self.wait_for_cleanup()
+        self.flush()
+        with self._lock:
+            self._connection.close()
+            self._connection = None
+            self.enabled = False
+
+    def _open(self, fingerprint: Optional[str]):
+        """Відкриває SQLite файл і прибирає застарілі записи"""
         try:
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                self.cache = json.load(f)
-        except Exception as e:
-            print(f"⚠️ Помилка завантаження кешу: {e}")
-            self.cache = {}
-    
-    def _save_cache(self):
-        """Зберігає кеш в файл"""
+            self._connection = sqlite3.connect(self.cache_file, check_same_thread=False)
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                    "cached_at REAL NOT NULL, result TEXT NOT NULL)"
+                )
+                self._connection.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_results_cached_at ON results (cached_at)"
+                )
+            self.fingerprint = fingerprint or reference_fingerprint()
+            # Прострочені записи прибере перший flush через SEARCH_CACHE_SWEEP_INTERVAL
+            self._last_sweep = time.time()
+        except sqlite3.Error as e:
+            self.logger.error(f"⚠️ Помилка відкриття кешу пошуку: {e}")
+            self._connection = None
+            self.enabled = False
+            return
+
+        reason = stale_reason(self.cache_file, self._manifest_sources(), self._manifest_version())
+        if reason:
+            self.logger.info(f"Кеш пошуку застарів ({reason}) - прибирання у фоні")
+            self._start_cleanup()
+
+    @staticmethod
+    def _manifest_sources():
+        return [config.MAGISTRAL_CSV_PATH, config.UKRPOSHTA_CLASSIFIER_SQLITE_PATH, config.STREET_ALIASES_PATH]
+
+    def _manifest_version(self) -> Dict:
+        return {'fingerprint': self.fingerprint, 'normalizer': TextNormalizer.RULES_VERSION}
+
+    def _write_manifest(self):
+        write_manifest(self.cache_file, self._manifest_sources(), self._manifest_version())
+
+    def _start_cleanup(self):
+        """
+        Видаляє результати інших відбитків у фоновому потоці
+
+        Окреме з'єднання і невеликі транзакції: пошук і запис нових
+        результатів не чекають, поки прибирання пройде всю таблицю.
+        """
+        fingerprint = self.fingerprint
+
+        def cleanup():
+            try:
+                connection = sqlite3.connect(self.cache_file, timeout=30)
+                try:
+                    while self.fingerprint == fingerprint:
+                        with connection:
+                            deleted = connection.execute(
+                                "DELETE FROM results WHERE rowid IN "
+                                "(SELECT rowid FROM results WHERE fingerprint != ? LIMIT ?)",
+                                (fingerprint, CLEANUP_BATCH_SIZE)
+                            ).rowcount
+                        if deleted < CLEANUP_BATCH_SIZE:
+                            break
+                finally:
+                    connection.close()
+            except sqlite3.Error as e:
+                self.logger.error(f"⚠️ Помилка прибирання кешу: {e}")
+                return
+
+            if self.fingerprint == fingerprint:
+                self._write_manifest()
+
+        self._cleanup_thread = threading.Thread(target=cleanup, name="search-cache-cleanup", daemon=True)
+        self._cleanup_thread.start()
+
+    def wait_for_cleanup(self):
+        """Чекає завершення фонового прибирання"""
+        if self._cleanup_thread is not None:
+            self._cleanup_thread.join()
+
+    def _is_expired(self, cached_at: float) -> bool:
+        if config.CACHE_EXPIRY_DAYS <= 0:
+            return False
+        return time.time() - cached_at > config.CACHE_EXPIRY_DAYS * 86400
+
+    def _sweep(self):
+        """Видаляє записи з іншим відбитком або старші за CACHE_EXPIRY_DAYS (під self._lock)"""
+        self._last_sweep = time.time()
         try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cache, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"⚠️ Помилка збереження кешу: {e}")
-    
+            with self._connection:
+                self._connection.execute("DELETE FROM results WHERE fingerprint != ?", (self.fingerprint,))
+                if config.CACHE_EXPIRY_DAYS > 0:
+                    self._connection.execute(
+                        "DELETE FROM results WHERE cached_at < ?",
+                        (self._last_sweep - config.CACHE_EXPIRY_DAYS * 86400,)
+                    )
+        except sqlite3.Error as e:
+            self.logger.error(f"⚠️ Помилка прибирання кешу: {e}")
+
     def get_statistics(self) -> Dict:
         """Повертає статистику кешу"""
+        total_entries = 0
+        if self.enabled:
+            with self._lock:
+                total_entries = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                total_entries += len(self._pending)
+
         return {
-            'total_entries': len(self.cache),
-            'enabled': self.enabled
+            'total_entries': total_entries,
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses
         }
@@ -0,0 +1,139 @@
+"""
+Маніфести похідних кешів
+
+Поруч із кожним кешем (pickle magistral, бінарне сховище, ukrposhta_v2.pkl,
+кеш результатів пошуку) лежить <кеш>.manifest.json: версія формату кешу,
+версія правил нормалізації та підпис кожного джерела - розмір, час зміни
+і SHA1 вмісту.
+
+Перевірка при старті - лише stat джерел. Вміст хешується тільки коли розмір
+збігся, а час зміни ні (файл перезаписали тим самим вмістом) - тоді кеш
+лишається дійсним, а в маніфест записується новий час.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+from utils.logger import Logger
+
+MANIFEST_SUFFIX = '.manifest.json'
+_HASH_CHUNK = 1024 * 1024
+
+
+def manifest_path(cache_path: str) -> str:
+    return f"{cache_path}{MANIFEST_SUFFIX}"
+
+
+def _file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path: str, known: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Підпис файлу (None, якщо файлу немає)
+
+    Args:
+        path: Файл джерела
+        known: Попередній підпис - його хеш береться без читання файлу,
+            якщо розмір і час зміни не змінилися
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    signature = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if known and known.get('size') == stat.st_size and known.get('mtime_ns') == stat.st_mtime_ns:
+        signature['sha1'] = known.get('sha1')
+    else:
+        signature['sha1'] = _file_sha1(path)
+    return signature
+
+
+def _read(cache_path: str) -> Optional[Dict]:
+    try:
+        with open(manifest_path(cache_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def write_manifest(cache_path: str, sources: Iterable[str], version: Dict) -> Dict:
+    """
+    Записує маніфест щойно побудованого кешу
+
+    Args:
+        cache_path: Файл кешу
+        sources: Файли, з яких кеш побудовано
+        version: Версії формату кешу та правил, напр. {'cache': 6, 'normalizer': 1}
+    """
+    previous = (_read(cache_path) or {}).get('sources', {})
+    manifest = {
+        'version': version,
+        'sources': {
+            os.path.abspath(path): file_signature(path, previous.get(os.path.abspath(path)))
+            for path in sources
+        },
+    }
+
+    target = manifest_path(cache_path)
+    tmp_path = f"{target}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, target)
+    except OSError as e:
+        Logger().warning(f"⚠️ Не вдалося записати маніфест кешу {cache_path}: {e}")
+    return manifest
+
+
+def stale_reason(cache_path: str, sources: Iterable[str], version: Dict) -> Optional[str]:
+    """
+    Чому кеш застарів (None - кеш дійсний)
+
+    Args:
+        cache_path: Файл кешу
+        sources: Файли, з яких кеш побудовано
+        version: Поточні версії формату кешу та правил
+    """
+    if not os.path.exists(cache_path):
+        return "кешу немає"
+
+    manifest = _read(cache_path)
+    if manifest is None:
+        return "немає маніфесту"
+    if manifest.get('version') != version:
+        return f"змінилася версія ({manifest.get('version')} -> {version})"
+
+    recorded = manifest.get('sources', {})
+    sources = [os.path.abspath(path) for path in sources]
+    if set(recorded) != set(sources):
+        return "змінився перелік джерел"
+
+    refreshed = False
+    for path in sources:
+        known = recorded[path]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            if known is None:
+                continue
+            return f"джерело зникло: {path}"
+
+        if known is None or known.get('size') != stat.st_size:
+            return f"змінилося джерело: {path}"
+        if known.get('mtime_ns') != stat.st_mtime_ns:
+            # Той самий розмір - звіряємо вміст
+            if _file_sha1(path) != known.get('sha1'):
+                return f"змінилося джерело: {path}"
+            refreshed = True
+
+    if refreshed:
+        write_manifest(cache_path, sources, version)
+    return None
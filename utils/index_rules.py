@@ -0,0 +1,48 @@
+"""
+Правила вибору індексу для підстановки
+
+Спільні для обробки в UI (ProcessingManager) та пакетного tools/batch_match.py.
+"""
+import re
+from typing import Dict
+
+
+def determine_index(result: Dict) -> str:
+    """
+    Визначає індекс за правилами обробки
+
+    Args:
+        result: Результат пошуку
+
+    Returns:
+        Індекс або '*' для спеціальних випадків
+    """
+    not_working = result.get('not_working', '')
+
+    # Тимчасово не функціонує (але не ВПЗ)
+    if 'Тимчасово не функціонує' in not_working and 'ВПЗ' not in not_working:
+        return '*'
+
+    # ВПЗ - шукаємо індекс у тексті
+    if 'ВПЗ' in not_working:
+        match = re.search(r'(\d{5})', not_working)
+        return match.group(1) if match else '*'
+
+    # Звичайний індекс
+    return result.get('index', '')
+
+
+def auto_index(response: Dict, min_confidence: int = 0) -> str:
+    """
+    Індекс автопідстановки з відповіді search_with_auto (auto_apply=True)
+
+    Returns:
+        Індекс або '' якщо рядок потребує ручного вибору
+    """
+    if response['mode'] != 'auto' or not response.get('applied'):
+        return ''
+
+    auto_result = response['auto_result']
+    if auto_result.get('confidence', 0) < min_confidence:
+        return ''
+    return determine_index(auto_result)
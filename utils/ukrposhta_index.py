@@ -5,9 +5,16 @@ import os
 import pickle
 from collections import defaultdict
 
+import config
+from search.normalizer import TextNormalizer
+from utils.cache_manifest import stale_reason, write_manifest
+
 
 class UkrposhtaIndex:
     """Індекс для швидкого пошуку по базі Укрпошти"""
+
+    # Збільшується при зміні формату індексу в кеші
+    INDEX_VERSION = 2
     
     def __init__(self):
         self.city_by_prefix = {}
@@ -23,6 +30,10 @@ class UkrposhtaIndex:
         self.magistral_cache = magistral_records
         
         cities_data = defaultdict(lambda: {'streets': set(), 'display': None})
+        # Новий індекс будується окремо і підміняє старий наприкінці -
+        # побудова може йти у фоновому потоці, поки форма користується старим
+        city_by_prefix = {}
+        city_data = {}
         
         for record in magistral_records:
             city_raw = getattr(record, 'city', None)
@@ -71,18 +82,20 @@ class UkrposhtaIndex:
                     for i in range(3, min(len(name_variant) + 1, 8)):
                         prefix = name_variant[:i].lower()
                         
-                        if prefix not in self.city_by_prefix:
-                            self.city_by_prefix[prefix] = []
+                        if prefix not in city_by_prefix:
+                            city_by_prefix[prefix] = []
                         
-                        if city_full not in self.city_by_prefix[prefix]:
-                            self.city_by_prefix[prefix].append(city_full)
+                        if city_full not in city_by_prefix[prefix]:
+                            city_by_prefix[prefix].append(city_full)
             
             # Зберігаємо дані міста
-            self.city_data[city_full] = {
+            city_data[city_full] = {
                 'streets': list(data['streets']),
                 'display': data['display']
             }
         
+        self.city_by_prefix = city_by_prefix
+        self.city_data = city_data
         print(f"✅ Індекс побудовано. Префіксів: {len(self.city_by_prefix)}")
         
         # Зберігаємо в кеш
@@ -100,6 +113,7 @@ class UkrposhtaIndex:
             # Зберігаємо БЕЗ компресії - швидше в 30+ разів
             with open(self.cache_file, 'wb') as f:
                 pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            write_manifest(self.cache_file, self._cache_sources(), self._cache_version())
             
             print(f"💾 Індекс Укрпошти збережено в {self.cache_file}")
     
@@ -119,6 +133,13 @@ class UkrposhtaIndex:
             if not os.path.exists(self.cache_file):
                 print("⚠️ Кеш індексу Укрпошти не знайдено")
                 return False
+
+            # Без magistral.csv перебудувати нема з чого - лишаємо наявний кеш
+            if os.path.exists(config.MAGISTRAL_CSV_PATH):
+                reason = stale_reason(self.cache_file, self._cache_sources(), self._cache_version())
+                if reason:
+                    print(f"⚠️ Кеш індексу Укрпошти застарів: {reason}")
+                    return False
             
             try:
                 with open(self.cache_file, 'rb') as f:
@@ -141,6 +162,13 @@ class UkrposhtaIndex:
                     pass
                 return False
     
+    @staticmethod
+    def _cache_sources():
+        return [config.MAGISTRAL_CSV_PATH]
+
+    def _cache_version(self):
+        return {'index': self.INDEX_VERSION, 'normalizer': TextNormalizer.RULES_VERSION}
+
     def search_cities(self, query):
         """Шукає міста - МІСТА ПЕРШИМИ"""
         if len(query) < 3: